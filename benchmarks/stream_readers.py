@@ -0,0 +1,106 @@
+"""
+Compares the pipe readers in src.stream.
+
+Spawns N child processes that each write a fixed number of lines to stdout,
+reads them back with each reader and reports lines/sec and the CPU time
+this process spent doing it.
+
+Usage:
+    python benchmarks/stream_readers.py [--lines <n>] [--streams <n>...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from src.stream import stream, multiplexer  # noqa: E402
+
+CHILD = "import sys\nfor i in range({}): sys.stdout.write('line %d of a fake JVM log\\n' % i)\n"
+
+
+def spawn(count, lines):
+    return [
+        subprocess.Popen(
+            [sys.executable, "-c", CHILD.format(lines)],
+            stdout=subprocess.PIPE,
+            universal_newlines=True) for _ in range(count)
+    ]
+
+
+def read_with(cls):
+    """
+    Returns a benchmark body that polls every pipe with readline(),
+    the way objects.spec_run used to.
+    """
+
+    def _read(procs):
+        readers = [cls(p.stdout) for p in procs]
+        total = 0
+        while any(p.poll() is None for p in procs):
+            for r in readers:
+                if r.readline() != '':
+                    total += 1
+        # drain whatever arrived between the last poll and the exit
+        for r in readers:
+            while r.readline() != '':
+                total += 1
+        for r in readers:
+            r.close()
+        return total
+
+    return _read
+
+
+def read_multiplexed(procs):
+    total = [0]
+
+    def _count(line):
+        total[0] += 1
+
+    mux = multiplexer()
+    for p in procs:
+        mux.register(p.stdout, _count)
+    while mux.active():
+        mux.poll(1)
+    mux.close()
+    return total[0]
+
+
+readers = [
+    ("thread per stream", read_with(stream)),
+    ("multiplexer", read_multiplexed),
+]
+
+
+def bench(name, body, count, lines):
+    procs = spawn(count, lines)
+    wall, cpu = time.perf_counter(), time.process_time()
+    total = body(procs)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    for p in procs:
+        p.wait()
+    if total != count * lines:
+        print("  {}: only read {} of {} lines".format(name, total,
+                                                      count * lines))
+    print("  {:<18} {:>12.0f} lines/s {:>8.2f}s cpu".format(
+        name, total / wall, cpu))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument(
+        "--streams", type=int, nargs="+", default=[10, 50, 200])
+    args = parser.parse_args()
+
+    for count in args.streams:
+        print("{} streams, {} lines each:".format(count, args.lines))
+        for name, body in readers:
+            bench(name, body, count, args.lines)
+
+
+if __name__ == "__main__":
+    main()
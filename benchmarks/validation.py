@@ -0,0 +1,94 @@
+"""
+Compares validating a generated configuration with the schema library to
+the compiled schemas in src.validate.
+
+Builds a configuration of N runs over the templates of example_config.json,
+then times validating it the way src.validate.validate and
+src.run_generator.RunGenerator used to (every run and every template a run
+refers to through the schema library, duplicate tags listed with
+list.count) against validate() and RunGenerator as they are now.
+
+Usage:
+    python benchmarks/validation.py [--runs <n>...] [--slow-limit <n>]
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from src.run_generator import RunGenerator  # noqa: E402
+from src.validate import (  # noqa: E402
+    validate, SpectateConfig, TemplateDataSchema, RunConfigSchema)
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir,
+                       "example_config.json")
+
+
+def config(count):
+    with open(EXAMPLE) as f:
+        example = json.loads(f.read())
+    runs = []
+    for i in range(count):
+        run = copy.deepcopy(example["RunList"][i % len(example["RunList"])])
+        run["tag"] = "run-{}".format(i)
+        runs.append(run)
+    example["RunList"] = runs
+    return example
+
+
+def schema_library(c):
+    d = SpectateConfig.validate(c)
+    tags = [run["tag"] for run in d["RunList"] if "tag" in run]
+    if len(set(tags)) != len(tags):
+        [t for t in tags if tags.count(t) > 1]
+    for run in c["RunList"]:
+        run = RunConfigSchema.validate(run)
+        TemplateDataSchema.validate(c["TemplateData"][run["template_type"]])
+
+
+def compiled(c):
+    validate(c)
+    RunGenerator(**c)
+
+
+validators = [
+    ("schema library", schema_library),
+    ("compiled", compiled),
+]
+
+
+def bench(name, body, c):
+    wall = time.perf_counter()
+    body(c)
+    wall = time.perf_counter() - wall
+    print("  {:<16} {:>10.3f}s {:>12.0f} runs/s".format(
+        name, wall, len(c["RunList"]) / wall))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--runs", type=int, nargs="+", default=[100, 10000, 100000])
+    parser.add_argument(
+        "--slow-limit",
+        type=int,
+        default=100000,
+        help="skip the schema library above this many runs")
+    args = parser.parse_args()
+
+    for count in args.runs:
+        c = config(count)
+        print("{} runs:".format(count))
+        for name, body in validators:
+            if body is schema_library and count > args.slow_limit:
+                print("  {:<16} skipped".format(name))
+                continue
+            bench(name, body, c)
+
+
+if __name__ == "__main__":
+    main()
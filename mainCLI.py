@@ -7,12 +7,22 @@ Usage:
     mainCLI.py dialogue [options]
     mainCLI.py script [options] <script> [ARG ...]
     mainCLI.py scripts [options]
+    mainCLI.py export [options] <out> <results>...
+    mainCLI.py aggregate [options] <catalog> [<csv>]
+    mainCLI.py compare [options] <catalog> <results>...
+    mainCLI.py autotune [options] <config> <journal> [<tag>]
     mainCLI.py (-h | --help)
     mainCLI.py --version
 
 Options:
     --level=<log-level>       Set the logging level. Uses python.logging's names for the different leves. [default: INFO]
     --dry-run                 Sets whether or not to do all configured runs as "dry runs". [default: False]
+    --engine=<engine>         How to execute the JVMs of each run, either "pool" or "asyncio". [default: pool]
+    --parallel=<runs>         How many runs to execute at the same time, each on its own CPUs and controller port. [default: 1]
+    --admission=<policy>      What to do with a run that needs more memory or CPUs than the host has: "refuse", "shrink", "queue" or "off". [default: off]
+    --reuse                   Skip runs identical (by fingerprint) to an earlier run of the config, or to a completed run in the results catalog. [default: False]
+    --budget=<runs>           The most runs autotune executes. [default: 20]
+    --target=<metric>         What autotune maximizes, "max_jops" or "critical_jops". [default: max_jops]
 """
 # library imports
 import json
@@ -31,6 +41,13 @@ import dialogue
 from src import validate
 from src import run_generator
 from src import benchmark_run
+from src import scheduler
+from src import export
+from src import aggregate
+from src import compare
+from src import autotune
+from src import fingerprint
+from src.catalog import Catalog
 
 log = logging.getLogger(__name__)
 
@@ -109,10 +126,30 @@ def do_run(arguments):
     with open(arguments['<config>'], 'r') as f:
         args = json.loads(f.read())
     rs = run_generator.RunGenerator(**args)
-    for r in rs.runs:
-        s = benchmark_run.SpecJBBRun(**r)
+    parallel = int(arguments['--parallel'])
+    dedup = fingerprint.Deduplicator(arguments['--reuse'])
+    if parallel <= 1:
+        for r in rs.runs:
+            s = benchmark_run.SpecJBBRun(**r)
+            if dedup.skip(s):
+                continue
+
+            s.run(arguments['--dry-run'], arguments['--engine'],
+                  admission=arguments['--admission'])
+    else:
+        def jobs():
+            # runs are only built as the scheduler gets to them
+            for r in rs.runs:
+                s = benchmark_run.SpecJBBRun(**r)
+                if dedup.skip(s):
+                    continue
+                yield (s.run_id,
+                       lambda slot, s=s: s.run(arguments['--dry-run'], arguments['--engine'], slot, arguments['--admission']),
+                       s.cpus)
 
-        s.run(arguments['--dry-run'])
+        scheduler.RunScheduler(parallel).run(jobs())
+    for line in dedup.report():
+        log.info(line)
 
 
 def do_script(arguments):
@@ -128,6 +165,81 @@ def do_scripts(arguments):
     ])
 
 
+def do_export(arguments):
+    """
+    Export the runs of one or more results directories in a columnar layout, see src.export.
+    """
+    count = export.export(arguments['<results>'], arguments['<out>'], log.info)
+    log.info("exported {} runs to {}".format(count, arguments['<out>']))
+
+
+def do_aggregate(arguments):
+    """
+    Aggregate the repeated runs of each configuration in a results catalog, see src.aggregate.
+    """
+    with Catalog(arguments['<catalog>']) as c:
+        aggregates = aggregate.aggregate(c)
+    for a in aggregates:
+        stats = a.stats["max_jops"]
+        log.info("{} {}: {} runs, max-jOPS {:.0f} +/- {:.0f} (CV {:.2%}), CI [{:.0f}, {:.0f}]{}".format(
+            a.key, " ".join(a.tags), len(a.runs), stats.mean, stats.stdev,
+            stats.cv, stats.ci_low, stats.ci_high,
+            ", needs {} runs: {}".format(a.repeats, a.needs_more)
+            if a.needs_more else ""))
+    if arguments['<csv>']:
+        aggregate.write_csv(aggregates, arguments['<csv>'])
+
+
+def do_compare(arguments):
+    """
+    Compare the runs of one or more results directories to the baselines of their configurations
+    in a results catalog, see src.compare. Fails if any metric regressed.
+    """
+    with Catalog(arguments['<catalog>']) as c:
+        comparisons = compare.compare(c, arguments['<results>'])
+    if not comparisons:
+        log.warning("no runs of {} in {}".format(
+            ", ".join(arguments['<results>']), arguments['<catalog>']))
+    for comparison in comparisons:
+        log.info(compare.describe(comparison))
+    return 1 if any(c.regression for c in comparisons) else 0
+
+
+def do_autotune(arguments):
+    """
+    Tune the tier worker counts of a run in a configuration (the first one with tiers, or the one tagged <tag>),
+    see src.autotune. Trials are kept in <journal>, running it again resumes the search.
+    """
+    with open(arguments['<config>'], 'r') as f:
+        args = json.loads(f.read())
+    templates = args["TemplateData"]
+    for run in args["RunList"]:
+        if arguments['<tag>'] is not None and run.get("tag") != arguments['<tag>']:
+            continue
+        try:
+            autotune.tier_args(templates[run["template_type"]])
+        except Exception:
+            continue
+        break
+    else:
+        log.error("no run to tune in {}".format(arguments['<config>']))
+        return 1
+
+    tuner = autotune.Autotuner(
+        templates,
+        run,
+        arguments['<journal>'],
+        target=arguments['--target'],
+        budget=int(arguments['--budget']),
+        execute=lambda r: autotune.execute_run(r, arguments['--dry-run'], arguments['--engine'], arguments['--admission']))
+    best = tuner.tune()
+    if best is None:
+        log.error("no trial succeeded")
+        return 1
+    log.info("best tiers {} ({}): max-jOPS {}, critical-jOPS {}".format(
+        best.tiers, best.tag, best.max_jops, best.critical_jops))
+
+
 def do_compliant(arguments):
     with open(arguments['<config>'], 'r') as f:
         args = json.loads(f.read())
@@ -150,6 +262,10 @@ do = {
     'dialogue': do_dialogue,
     'script': do_script,
     'scripts': do_scripts,
+    'export': do_export,
+    'aggregate': do_aggregate,
+    'compare': do_compare,
+    'autotune': do_autotune,
 }
 
 if __name__ == "__main__":
@@ -1,4 +1,3 @@
-import copy
 import datetime
 import json
 import multiprocessing
@@ -6,10 +5,19 @@ import os
 import shlex
 import shutil
 import signal
+import threading
 import time
+from collections.abc import Mapping
 from subprocess import Popen, PIPE, STDOUT
+from types import MappingProxyType
 
-from src.stream import stream
+from src.admission import AdmissionController, AdmissionPolicies, HostResources, JvmSet, RunDemand, parse_jvm_options
+from src.launch import launch_scheduler
+from src.scheduler import RunScheduler
+from src.stream import multiplexer
+from src.supervisor import ProcessSupervisor
+from src.validate import AbortPolicySchema
+from src import affinity, catalog, fingerprint, rollup, rt_monitor, topology
 
 
 class spec_config:
@@ -28,12 +36,13 @@ class spec_config:
         else:
             self.type = "spec_config"
 
-    def run(self, outhandle, errhandle):
+    def run(self, outhandle, errhandle, parallel=1):
         """
 
         :param path: The path to a directory containing specjbb.jar
         :param outhandle: A function to handle std output
         :param errhandle: A function to handle std error
+        :param parallel: How many runs to execute at the same time, each on its own CPUs and controller port
         :return:
         """
         if not self.runs:
@@ -51,53 +60,76 @@ class spec_config:
             datetime.datetime.fromtimestamp(
                 time.time()).strftime('+%y-%m-%d_%H%M%S'))
         os.makedirs(result_dir)
-        for r in self.runs:
-            result = r._run(jar_file, result_dir, outhandle, errhandle)
+        if int(parallel) > 1:
+            result = self._run_parallel(jar_file, result_dir, outhandle,
+                                        errhandle, int(parallel))
             if result != 0:
                 return result
+        else:
+            for r in self.runs:
+                result = r._run(jar_file, result_dir, outhandle, errhandle)
+                # an aborted run has freed the machine for the next one
+                if result != 0 and result != 6:
+                    return result
         self._rollup(result_dir, outhandle)
         return 0
 
+    def _run_parallel(self, jar_file: str, result_dir: str, outhandle,
+                      errhandle, parallel: int):
+        """
+        Called internally only.  Executes the runs 'parallel' at a time with a RunScheduler.
+        Output from each run is prefixed with its tag, and handed to the handlers one line at a time.
+        :return: The first non-zero result of a run, or 0
+        """
+        lock = threading.Lock()
+
+        def _prefixed(handle, tag):
+
+            def _handle(msg):
+                with lock:
+                    handle("[{}] {}".format(tag, msg))
+
+            return _handle
+
+        sched = RunScheduler(parallel)
+        for r in self.runs:
+            sched.submit(
+                r.tag,
+                lambda slot, r=r: r._run(jar_file, result_dir,
+                                         _prefixed(outhandle, r.tag),
+                                         _prefixed(errhandle, r.tag), slot),
+                r.cpus)
+        orig_sig = signal.getsignal(signal.SIGINT)
+        signal.signal(signal.SIGINT, spec_run._signal_handler)
+        try:
+            results = sched.run()
+        finally:
+            signal.signal(signal.SIGINT, orig_sig)
+        for result in results:
+            if result is None:
+                return -1
+            if result != 0 and result != 6:
+                return result
+        return 0
+
     def set_spec_dir(self, path):
         for r in self.runs:
             r.spec_dir = path
 
     def _rollup(self, path: str, outhandle):
         """
+        Analyzes every run directory in 'path' in parallel, see src.rollup
         :param path: Path to a directory containing directories of results
         :return: The path to the result .csv file
         """
         if not os.path.exists(path):
             raise FileNotFoundError(path)
-        rollscript = os.path.abspath(os.path.join(__file__, os.pardir))
-        rollscript = os.path.join(rollscript, "scripts", "Rollup.pl")
-        if not os.path.exists(rollscript):
-            raise FileNotFoundError(rollscript)
-        perlbin = '/usr/bin/perl'
-        if not os.path.exists(perlbin):
-            perlbin = '/bin/perl'
-            if not os.path.exists(perlbin):
-                return
         outhandle(os.linesep)
         outhandle(os.linesep)
         outhandle("Starting analysis on {}...".format(path))
         outhandle(os.linesep)
-        p = Popen(
-            shlex.split("{} {} {}".format(perlbin, rollscript, path)),
-            cwd=path,
-            stdout=PIPE,
-            stderr=STDOUT,
-            universal_newlines=True)
-        outstream = stream(p.stdout)
-        while p.poll() is None:
-            o = outstream.readline()
-            if o != '':
-                outhandle(o)
-        p.wait()
-        resname, resext = os.path.splitext(os.path.basename(path))
-        resname += ".csv"
-        result = os.path.join(
-            os.path.abspath(os.path.join(path, os.pardir)), resname)
+        result = rollup.rollup(path, outhandle)
+        outhandle("Results written to {}".format(result))
         return result
 
     def _tojson(self):
@@ -225,6 +257,11 @@ class spec_decoder(json.JSONDecoder):
 
 class spec_run:
     _running = False
+    # number of runs executing right now (see spec_config._run_parallel)
+    _active = 0
+    _active_lock = threading.Lock()
+    # how long (in seconds) to block waiting for JVM output before checking for cancellation
+    _poll_interval = 0.5
 
     def __init__(self, fromjson=None):
         if fromjson is None:
@@ -242,6 +279,14 @@ class spec_run:
             self.skip_report = False
             self.ignore_kit_validation = False
             self.spec_dir = ""
+            self.log_capture = 'tee'
+            self.launch_wave_size = 0
+            self.launch_max_pending = 0
+            self.cpus = 0
+            self.admission = 'off'
+            self.binding = 'node'
+            self.memory_policy = 'local'
+            self.abort_policy = {}
         else:
             self.jdk = fromjson.get('jdk', "/usr/bin/java")
             self.jvm_options = fromjson.get(
@@ -259,6 +304,18 @@ class spec_run:
             self.ignore_kit_validation = fromjson.get('ignore_kit_validation',
                                                       False)
             self.spec_dir = fromjson.get('spec_dir', "")
+            self.log_capture = fromjson.get('log_capture', 'tee')
+            self.launch_wave_size = fromjson.get('launch_wave_size', 0)
+            self.launch_max_pending = fromjson.get('launch_max_pending', 0)
+            self.cpus = fromjson.get('cpus', 0)
+            self.admission = fromjson.get('admission', 'off')
+            self.binding = fromjson.get('binding', 'node')
+            self.memory_policy = fromjson.get('memory_policy', 'local')
+            self.abort_policy = fromjson.get('abort_policy', {})
+        # the RunSlot (CPUs and controller port) of the current run, if any
+        self._slot = None
+        # the ProcessSupervisor of the current run's JVMs and collectors
+        self._supervisor = None
 
     def set_runtype(self, arg: str):
         """Ensure that arg is a valid runtype before setting the runtype"""
@@ -293,6 +350,31 @@ class spec_run:
             return "Skip report generation at the end of run"
         if arg == "ignore_kit_validation":
             return "Ignore kit validation"
+        if arg == "log_capture":
+            return "How JVM output reaches its log files.  (tee = read by SPECtate, written to the log and displayed.  " \
+                   "direct = written straight to the log by the JVM, and displayed by following the log)"
+        if arg == "launch_wave_size":
+            return "How many backends/injectors to start at once, after the controller is ready (0 = start them all with the controller)"
+        if arg == "launch_max_pending":
+            return "How many started backends/injectors may be waiting to attach to the controller at once (0 = no limit)"
+        if arg == "cpus":
+            return "How many CPUs this run needs when runs execute in parallel (0 = an equal share)"
+        if arg == "admission":
+            return "What to do when the JVMs of this run need more memory or CPUs than the host has.  " \
+                   "(refuse = don't start the run.  shrink = start it with fewer groups.  " \
+                   "queue = wait until enough memory is free.  off = always start it)"
+        if arg == "binding":
+            return "How the groups of a multi run are bound to CPUs.  (numactl = run each group under numactl on its node.  " \
+                   "node = pin each group to the CPUs of its node.  " \
+                   "core = pin each group's backend and injectors to their own cores)"
+        if arg == "memory_policy":
+            return "Where the memory of bound groups comes from, with node or core binding.  (local = the node first touching it.  " \
+                   "preferred = the group's node, while it has free memory.  bind = only the group's node)"
+        if arg == "abort_policy":
+            return "When to abort a run while its RT curve is being built (empty = never).  " \
+                   "(low_percent, max_low_failures = abort after that many steps failed below that % of the high bound.  " \
+                   "baseline, min_fraction = abort when a step fails or max-jOPS settles below that fraction of the baseline max-jOPS, " \
+                   "a baseline of 'catalog' is the median of the last runs with this tag)"
         return "Unknown option"
 
     def _set_known_arg(self, key: str, value):
@@ -335,7 +417,15 @@ class spec_run:
             "skip_report": self.skip_report,
             "ignore_kit_validation": self.ignore_kit_validation,
             "props": self.properties._tojson(),
-            "spec_dir": self.spec_dir
+            "spec_dir": self.spec_dir,
+            "log_capture": self.log_capture,
+            "launch_wave_size": self.launch_wave_size,
+            "launch_max_pending": self.launch_max_pending,
+            "cpus": self.cpus,
+            "admission": self.admission,
+            "binding": self.binding,
+            "memory_policy": self.memory_policy,
+            "abort_policy": self.abort_policy
         }
 
     def _totateconfig(self):
@@ -365,16 +455,20 @@ class spec_run:
              jar_file="",
              result_path="",
              handle_out=_defHandle,
-             handle_err=_defHandle):
+             handle_err=_defHandle,
+             slot=None):
         """
         Runs with the current settings.  Auto detects runtype, writes the config file, and executes all required processes
         :param path: The path to a directory containing 'specjbb2015.jar'
         :param handle: An output handler.  Will receive byte encoded strings?
                     If left blank, all output will be 'printed'
+        :param slot: The src.scheduler.RunSlot to run in, when runs execute in parallel
         :return: 0 -> All runs completed successfully
                  2 -> Failed to located 'specjbb2015.jar' in the path
                  3 -> Java executable not found
                  4 -> Failed to ping the host controller
+                 5 -> The run doesn't fit on this host (see 'admission')
+                 6 -> The run was aborted by its abort policy (see 'abort_policy')
                 -1 -> An error ocurred executing specjbb
         """
         if not os.path.exists(self.jdk):
@@ -393,15 +487,53 @@ class spec_run:
             'distributed_sut': self._distributed_sut,
             'multi': self._run_multi
         }
-        orig_sig = signal.getsignal(signal.SIGINT)
-        spec_run._running = True
-        signal.signal(signal.SIGINT, spec_run._signal_handler)
-
-        ret = switch[self.run_type](jar_file, result_path, handle_out,
-                                    handle_err)
+        # signal handlers can only be installed from the main thread,
+        # parallel runs rely on the one spec_config installed
+        main = threading.current_thread() is threading.main_thread()
+        if main:
+            orig_sig = signal.getsignal(signal.SIGINT)
+            signal.signal(signal.SIGINT, spec_run._signal_handler)
+        with spec_run._active_lock:
+            if spec_run._active == 0:
+                spec_run._running = True
+            spec_run._active += 1
+        self._slot = slot
+        self._supervisor = ProcessSupervisor()
+        group_count = self.properties.root['specjbb.group.count'].value
+        controller, decision = None, None
 
-        signal.signal(signal.SIGINT, orig_sig)
-        spec_run._running = False
+        try:
+            controller = self._admission()
+            if controller.policy != "off":
+                # the JVM options are only read when there's something to decide
+                demand = self._demand()
+                decision = controller.admit(demand,
+                                            lambda: not spec_run._running)
+                if not decision.admit:
+                    handle_err("Run '{}' refused: {}".format(
+                        self.tag, decision.reason))
+                    return 5
+                if decision.groups != demand.groups:
+                    handle_out("Run '{}' shrunk: {}".format(
+                        self.tag, decision.reason))
+                    self.properties.set('specjbb.group.count',
+                                        decision.groups)
+            ret = switch[self.run_type](jar_file, result_path, handle_out,
+                                        handle_err)
+        finally:
+            # nothing this run started may outlive it
+            self._supervisor.stop()
+            self._supervisor = None
+            if controller is not None:
+                controller.release(decision)
+            self.properties.root['specjbb.group.count'].value = group_count
+            self._slot = None
+            if main:
+                signal.signal(signal.SIGINT, orig_sig)
+            with spec_run._active_lock:
+                spec_run._active -= 1
+                if spec_run._active == 0:
+                    spec_run._running = False
         return ret
 
     def _run_composite(self, jar: str, result_parent: str, handle_out,
@@ -409,8 +541,13 @@ class spec_run:
         """Called internally only by this.run()"""
         cmd = '{} {} -jar {} -m COMPOSITE {}'.format(self.jdk, self.jvm_options,
                                                      jar, self._spec_opts())
+        policy = self._abort_policy(result_parent)
+        aborted = False
 
         for x in range(int(self.num_runs)):
+            # a cancellation (Ctrl+C) stops the repetitions left too
+            if not spec_run._running:
+                break
             result_dir = self._prerun(result_parent)
             handle_out(os.linesep)
             handle_out(os.linesep)
@@ -418,44 +555,39 @@ class spec_run:
             handle_out('Using command: "{}"'.format(cmd))
             handle_out(os.linesep)
             handle_out(os.linesep)
-            data = self._start_data_collection(result_dir, handle_out)
-            errout = open(os.path.join(result_dir, 'composite.out'), 'w')
-            stdout = open(os.path.join(result_dir, 'composite.log'), 'w')
-            p = Popen(
-                shlex.split(cmd),
-                cwd=result_dir,
-                stdout=PIPE,
-                stderr=PIPE,
-                universal_newlines=True)
-            spec_run._running = True
-            errstream = stream(p.stderr)
-            outstream = stream(p.stdout)
-            while spec_run._running and p.poll() is None:
-                e = errstream.readline()
-                if e != '':
-                    errout.write(e)
-                    handle_err(e)
-                o = outstream.readline()
-                if o != '':
-                    stdout.write(o)
-                    handle_out(o)
-            errout.close()
-            errstream.close()
-            stdout.close()
-            outstream.close()
-            if spec_run._running:
+            self._start_data_collection(result_dir, handle_out)
+            mux = multiplexer()
+            monitor = rt_monitor.RtMonitor(policy)
+            p, logs = self._launch(cmd, result_dir, mux,
+                                   os.path.join(result_dir, 'composite.log'),
+                                   os.path.join(result_dir, 'composite.out'),
+                                   spec_run._follow(monitor, handle_out),
+                                   handle_err)
+            while (spec_run._running and monitor.abort is None
+                   and p.poll() is None):
+                mux.poll(spec_run._poll_interval)
+            mux.poll(0)
+            mux.close()
+            for f in logs:
+                f.close()
+            if monitor.abort is not None:
+                exitcode = self._report_abort(monitor, handle_out)
+            elif spec_run._running:
                 exitcode = p.wait()
             else:
                 handle_out(os.linesep)
                 handle_out(os.linesep)
                 handle_out("Canceling benchmark...")
                 exitcode = 0
-                p.kill()
-            for pf in data:
-                pf.kill()
-            if exitcode != 0 and spec_run._running:
+            stopped = self._stop_all(handle_err)
+            if spec_run._running:
+                self._record(result_dir, exitcode, handle_err)
+            if monitor.abort is not None and stopped:
+                aborted = True
+                continue
+            if not stopped or (exitcode != 0 and spec_run._running):
                 return -1
-        return 0
+        return 6 if aborted else 0
 
     def _run_distributed_ctrl_txl(self, jar: str, result_parent: str,
                                   handle_out, handle_err):
@@ -485,80 +617,53 @@ class spec_run:
         cmd = '{} {} -jar {} -m DISTCONTROLLER {}'.format(
             self.jdk, self.jvm_options, jar, opts)
         tx_procs = []
-        cont_std = open(os.path.join(result_dir, 'controller.log'), 'w')
-        cont_err = open(os.path.join(result_dir, 'controller.out'), 'w')
-        controller = Popen(
-            shlex.split(cmd),
-            cwd=result_dir,
-            stdout=PIPE,
-            stderr=PIPE,
-            universal_newlines=True)
-        data = self._start_data_collection(result_dir, handle_out)
+        mux = multiplexer()
+        sched = self._scheduler()
+        monitor = rt_monitor.RtMonitor(self._abort_policy(result_parent))
+        controller, cont_logs = self._launch(
+            cmd, result_dir, mux, os.path.join(result_dir, 'controller.log'),
+            os.path.join(result_dir, 'controller.out'),
+            spec_run._follow(monitor, spec_run._watch(sched, handle_out)),
+            handle_err)
+        self._start_data_collection(result_dir, handle_out)
         for g in range(int(self.properties.root['specjbb.group.count'].value)):
             for j in range(
                     int(self.properties.root['specjbb.txi.pergroup.count']
                         .value)):
                 ti_name = "{}Group{}.TxInjector.txiJVM{}".format(
                     result_dir, g, j)
-                cmd = '{} {} -jar {} -m TXINJECTOR -G={}'.format(
-                    self.jdk, self.jvm_options, jar, tx_opts, g)
-                p = Popen(
-                    shlex.split(cmd),
-                    cwd=result_dir,
-                    stdout=PIPE,
-                    stderr=PIPE,
-                    universal_newlines=True)
-                tx_procs.append([
-                    p,
-                    open(
-                        os.path.join(result_dir, '{}.log'.format(ti_name)),
-                        'w'),
-                    open(
-                        os.path.join(result_dir, '{}.out'.format(ti_name)),
-                        'w'),
-                    stream(p.stderr),
-                    stream(p.stdout)
-                ])
-        spec_run._running = True
-        errstream = stream(controller.stderr)
-        outstream = stream(controller.stdout)
-        while spec_run._running and controller.poll() is None:
-            e = errstream.readline()
-            if e != '':
-                cont_err.write(e)
-                handle_err(e)
-            o = outstream.readline()
-            if o != '':
-                cont_std.write(o)
-                handle_out(o)
-            for p in tx_procs:
-                if p[0].poll() is None:
-                    e = p[3].readline()
-                    if e != '':
-                        p[2].write(e)
-                        handle_err(e)
-                    o = p[4].readline()
-                    if o != '':
-                        p[1].write(o)
-                        handle_out(o)
-        cont_err.close()
-        cont_std.close()
-        if spec_run._running:
+                cmd = '{} {} -jar {} -m TXINJECTOR -G={} -J=txiJVM{} {}'.format(
+                    self.jdk, self.jvm_options, jar, g, j, tx_opts)
+                sched.add(
+                    "{}.TxInjector.txiJVM{}".format(g, j),
+                    self._agent_starter(tx_procs, cmd, result_dir, mux,
+                                        ti_name, handle_out, handle_err))
+        while (spec_run._running and monitor.abort is None
+               and controller.poll() is None):
+            sched.tick()
+            mux.poll(spec_run._poll_interval)
+        mux.poll(0)
+        mux.close()
+        for f in cont_logs:
+            f.close()
+        self._launch_report(sched, result_dir, handle_out)
+        if monitor.abort is not None:
+            exitcode = self._report_abort(monitor, handle_out)
+        elif spec_run._running:
             exitcode = controller.wait()
         else:
             handle_out(os.linesep)
             handle_out("Ending benchmark...")
             exitcode = 0
-            controller.kill()
-        for p in tx_procs:
-            p[3].close()
-            p[4].close()
-            p[0].kill()
-            p[1].close()
-            p[2].close()
-        for pf in data:
-            pf.kill()
-        if exitcode != 0 and spec_run._running:
+        stopped = self._stop_all(handle_err)
+        for p, logs in tx_procs:
+            for f in logs:
+                f.close()
+        if spec_run._running:
+            self._record(result_dir, exitcode, handle_err)
+        if stopped and monitor.abort is not None:
+            return 6
+        if not stopped or (exitcode != 0 and spec_run._running):
             return -1
         return 0
 
@@ -585,189 +690,363 @@ class spec_run:
         opts = self._tx_opts()
         procs = []
         result_dir = self._prerun(result_parent)
-        data = self._start_data_collection(result_dir, handle_out)
+        self._start_data_collection(result_dir, handle_out)
+        mux = multiplexer()
         for g in range(int(self.properties.root['specjbb.group.count'].value)):
             be_name = 'beJVM Group{}.Backend.beJVM.log'.format(g)
             cmd = '{} {} -jar {} -m BACKEND {} -G={} -J=beJVM'.format(
                 self.jdk, self.jvm_options, jar, opts, g)
-            p = Popen(
-                shlex.split(cmd),
-                cwd=result_dir,
-                stdout=PIPE,
-                stderr=STDOUT,
-                universal_newlines=True)
-            procs.append([
-                p,
-                open(os.path.join(result_dir, be_name), 'w'),
-                stream(p.stdout)
-            ])
-
-        spec_run._running = True
+            procs.append(
+                self._launch(cmd, result_dir, mux,
+                             os.path.join(result_dir, be_name), None,
+                             handle_out, handle_err))
+
         while spec_run._running:
-            for p in procs:
-                if p[0].poll() is None:
-                    o = p[2].readline()
-                    if o != '':
-                        handle_out(o)
-                        p[1].write(o)
-        for p in procs:
-            p[2].close()
-            p[0].kill()
-            p[1].close()
-        for pf in data:
-            pf.kill()
+            mux.poll(spec_run._poll_interval)
+        mux.close()
+        stopped = self._stop_all(handle_err)
+        for p, logs in procs:
+            for f in logs:
+                f.close()
         # Each process will continue until manually terminated with ctrl c.
-        return 0
+        return 0 if stopped else -1
 
     def _run_multi(self, jar: str, result_parent: str, handle_out, handle_err):
         """Called internally only by this.run()"""
 
         opts = self._spec_opts()
         tx_opts = self._tx_opts()
-        has_numa = self._check_numa() and self.numa_nodes > 1
-        numa_cmd = 'numactl --cpunodebind={} --localalloc'
+        plan = self._binding_plan()
+        policy = self._abort_policy(result_parent)
+        aborted = False
         for x in range(int(self.num_runs)):
+            # a cancellation (Ctrl+C) stops the repetitions left too
+            if not spec_run._running:
+                break
             handle_out(os.linesep)
             result_dir = self._prerun(result_parent)
             handle_out("Starting run {} of {} in {}...".format(
                 x + 1, self.num_runs, result_dir))
             handle_out(os.linesep)
+            if plan is not None:
+                for line in affinity.describe(plan):
+                    handle_out(line)
             handle_out(os.linesep)
 
-            cont_std = open(os.path.join(result_dir, 'controller.log'), 'w')
-            cont_err = open(os.path.join(result_dir, 'controller.out'), 'w')
+            mux = multiplexer()
+            sched = self._scheduler()
+            monitor = rt_monitor.RtMonitor(policy)
             cmd = '{} {} -jar {} -m MULTICONTROLLER {}'.format(
                 self.jdk, self.jvm_options, jar, opts)
-            controller = Popen(
-                shlex.split(cmd),
-                cwd=result_dir,
-                stdout=PIPE,
-                stderr=PIPE,
-                universal_newlines=True)
+            controller, cont_logs = self._launch(
+                cmd, result_dir, mux,
+                os.path.join(result_dir, 'controller.log'),
+                os.path.join(result_dir, 'controller.out'),
+                spec_run._follow(
+                    monitor,
+                    spec_run._watch(sched, handle_out, "Controller: {}")),
+                handle_err)
             tx_procs = []
             be_procs = []
-            data = self._start_data_collection(result_dir, handle_out)
+            self._start_data_collection(result_dir, handle_out)
             for g in range(
                     int(self.properties.root['specjbb.group.count'].value)):
-                numa = numa_cmd.format((g - 1) % 4)
+                java = self.jdk
+                tx_bind = be_bind = None
+                if plan is not None and self.binding == 'numactl':
+                    java = '{} {}'.format(' '.join(plan[g].numactl()), java)
+                elif plan is not None:
+                    tx_bind, be_bind = plan[g].injectors, plan[g].backend
                 for j in range(self.properties.root[
                         'specjbb.txi.pergroup.count'].value):
                     ti_name = "Group{}.TxInjector.txiJVM{}".format(g, j)
-                    if has_numa:
-                        cmd = '{} {} {} -jar {} -m TXINJECTOR -G={} -J=txiJVM{} {}'.format(
-                            numa, self.jdk, self.jvm_options, jar, g, j,
-                            tx_opts)
-                    else:
-                        cmd = '{} {} -jar {} -m TXINJECTOR -G={} -J=txiJVM{} {}'.format(
-                            self.jdk, self.jvm_options, jar, g, j, tx_opts)
-                    handle_out('Using command: "{}"'.format(cmd))
-                    p = Popen(
-                        shlex.split(cmd),
-                        cwd=result_dir,
-                        stdout=PIPE,
-                        stderr=PIPE,
-                        universal_newlines=True)
-                    tx_procs.append([
-                        p,
-                        open(
-                            os.path.join(result_dir, '{}.log'.format(ti_name)),
-                            'w'),
-                        open(
-                            os.path.join(result_dir, '{}.out'.format(ti_name)),
-                            'w'),
-                        stream(p.stderr),
-                        stream(p.stdout)
-                    ])
+                    cmd = '{} {} -jar {} -m TXINJECTOR -G={} -J=txiJVM{} {}'.format(
+                        java, self.jvm_options, jar, g, j, tx_opts)
+                    sched.add(
+                        "{}.TxInjector.txiJVM{}".format(g, j),
+                        self._agent_starter(tx_procs, cmd, result_dir, mux,
+                                            ti_name, handle_out, handle_err,
+                                            "TX: {}", tx_bind))
                 be_name = "Group{}.Backend.beJVM".format(g)
-                if has_numa:
-                    cmd = '{} {} {} -jar {} -m BACKEND {} -G={} -J=beJVM'.format(
-                        numa, self.jdk, self.jvm_options, jar, tx_opts, g)
-                else:
-                    cmd = '{} {} -jar {} -m BACKEND {} -G={} -J=beJVM'.format(
-                        self.jdk, self.jvm_options, jar, tx_opts, g)
-                handle_out('Using command: "{}"'.format(cmd))
-                p = Popen(
-                    shlex.split(cmd),
-                    cwd=result_dir,
-                    stdout=PIPE,
-                    stderr=PIPE,
-                    universal_newlines=True)
-                be_procs.append([
-                    p,
-                    open(
-                        os.path.join(result_dir, '{}.log'.format(be_name)),
-                        'w'),
-                    open(
-                        os.path.join(result_dir, '{}.out'.format(be_name)),
-                        'w'),
-                    stream(p.stderr),
-                    stream(p.stdout)
-                ])
-
-            spec_run._running = True
-            errstream = stream(controller.stderr)
-            outstream = stream(controller.stdout)
-            while spec_run._running and controller.poll() is None:
-                e = errstream.readline()
-                if e != '':
-                    cont_err.write(e)
-                    handle_err(e)
-                o = outstream.readline()
-                if o != '':
-                    cont_std.write(o)
-                    handle_out("Controller: {}".format(o))
-                for p in tx_procs:
-                    if not spec_run._running:
-                        break
-                    if p[0].poll() is None:
-                        e = p[3].readline()
-                        if e != '':
-                            p[2].write(e)
-                            handle_err(e)
-                        o = p[4].readline()
-                        if o != '':
-                            p[1].write(o)
-                            handle_out("TX: {}".format(o))
-                for p in be_procs:
-                    if not spec_run._running:
-                        break
-                    if p[0].poll() is None:
-                        e = p[3].readline()
-                        if e != '':
-                            p[2].write(e)
-                            handle_err(e)
-                        o = p[4].readline()
-                        if o != '':
-                            p[1].write(o)
+                cmd = '{} {} -jar {} -m BACKEND {} -G={} -J=beJVM'.format(
+                    java, self.jvm_options, jar, tx_opts, g)
+                # backend output isn't displayed, only logged
+                sched.add(
+                    "{}.Backend.beJVM".format(g),
+                    self._agent_starter(be_procs, cmd, result_dir, mux,
+                                        be_name, handle_out, handle_err, None,
+                                        be_bind))
+
+            while (spec_run._running and monitor.abort is None
+                   and controller.poll() is None):
+                sched.tick()
+                mux.poll(spec_run._poll_interval)
+            mux.poll(0)
+            mux.close()
             handle_out(os.linesep)
             handle_out("Benchmark {} of {} ended.".format(x + 1, self.num_runs))
-            cont_err.close()
-            cont_std.close()
-            if spec_run._running:
+            for f in cont_logs:
+                f.close()
+            self._launch_report(sched, result_dir, handle_out)
+            if monitor.abort is not None:
+                exitcode = self._report_abort(monitor, handle_out)
+            elif spec_run._running:
                 exitcode = controller.wait()
             else:
                 handle_out(os.linesep)
                 handle_out("Canceling benchmark...")
                 handle_out(os.linesep)
                 exitcode = 0
-                controller.kill()
-            for p in tx_procs:
-                p[3].close()
-                p[4].close()
-                p[0].kill()
-                p[1].close()
-                p[2].close()
-            for p in be_procs:
-                p[3].close()
-                p[4].close()
-                p[0].kill()
-                p[1].close()
-                p[2].close()
-            for pf in data:
-                pf.kill()
-            if exitcode != 0 and spec_run._running:
+            # the next run starts once every JVM and collector of this one is gone
+            stopped = self._stop_all(handle_err)
+            for p, logs in tx_procs + be_procs:
+                for f in logs:
+                    f.close()
+            if spec_run._running:
+                self._record(result_dir, exitcode, handle_err)
+            if monitor.abort is not None and stopped:
+                aborted = True
+                continue
+            if not stopped or (exitcode != 0 and spec_run._running):
                 return -1
-        return 0
+        return 6 if aborted else 0
+
+    def _demand(self):
+        """Called internally only.  Returns the RunDemand of the JVMs this run starts on this host"""
+        footprint = parse_jvm_options(self.jvm_options)
+        groups = int(self.properties.root['specjbb.group.count'].value)
+        injectors = int(
+            self.properties.root['specjbb.txi.pergroup.count'].value)
+        controller = JvmSet('controller', 1, footprint)
+        txi = JvmSet('txinjector', injectors, footprint, per_group=True)
+        backend = JvmSet('backend', 1, footprint, per_group=True)
+        if self.run_type == 'composite':
+            return RunDemand([JvmSet('composite', 1, footprint)])
+        if self.run_type == 'distributed_ctrl_txl':
+            return RunDemand([controller, txi], groups)
+        if self.run_type == 'distributed_sut':
+            return RunDemand([backend], groups)
+        return RunDemand([controller, txi, backend], groups)
+
+    def _admission(self):
+        """Called internally only.  Returns the AdmissionController of this run's admission policy, see src.admission"""
+        cpus = len(self._slot.cpus) if self._slot and self._slot.cpus else None
+        return AdmissionController(
+            self.admission,
+            read_host=lambda: HostResources.read(cpus=cpus),
+            own_cpus=cpus is not None)
+
+    def _scheduler(self):
+        """Called internally only.  Returns a launch_scheduler using this run's launch settings"""
+        return launch_scheduler(
+            wave_size=int(self.launch_wave_size),
+            max_pending=int(self.launch_max_pending))
+
+    def _agent_starter(self,
+                       procs: list,
+                       cmd: str,
+                       result_dir: str,
+                       mux,
+                       name: str,
+                       handle_out,
+                       handle_err,
+                       fmt="{}",
+                       binding=None):
+        """
+        Called internally only.  Returns a function that starts the agent JVM 'cmd' (see _launch),
+        logging to '<name>.log' and '<name>.out', and appends it to 'procs'.
+        :param fmt: Format for the agent's stdout lines, or None to not display them
+        :param binding: The affinity.Binding to start the agent with, if any
+        """
+
+        display = handle_out if fmt is not None else None
+
+        def _start():
+            handle_out('Using command: "{}"'.format(cmd))
+            procs.append(
+                self._launch(cmd, result_dir, mux,
+                             os.path.join(result_dir, '{}.log'.format(name)),
+                             os.path.join(result_dir, '{}.out'.format(name)),
+                             display, handle_err, fmt or "{}", binding))
+
+        return _start
+
+    @staticmethod
+    def _watch(sched, handle, fmt="{}"):
+        """
+        Called internally only.  Returns a line handler for controller output that feeds 'sched'
+        and then passes the line (formatted with 'fmt') to 'handle'.
+        """
+
+        def _line(line):
+            sched.controller_line(line)
+            handle(fmt.format(line))
+
+        return _line
+
+    @staticmethod
+    def _follow(monitor, handle):
+        """
+        Called internally only.  Returns a line handler for controller output that feeds 'monitor'
+        (a src.rt_monitor.RtMonitor) and then passes the line on to 'handle'.
+        """
+
+        def _line(line):
+            monitor.line(line)
+            handle(line)
+
+        return _line
+
+    def _abort_policy(self, result_parent: str):
+        """
+        Called internally only.  Returns the src.rt_monitor.AbortPolicy of this run, or None without one.
+        A 'catalog' baseline comes from earlier runs with this tag in the results catalog.
+        """
+        return rt_monitor.policy(
+            self.abort_policy, self._catalog_path(result_parent), tag=self.tag)
+
+    @staticmethod
+    def _report_abort(monitor, handle_out):
+        """Called internally only.  Displays why the run is being aborted, returns the exit code to record for it"""
+        handle_out(os.linesep)
+        handle_out("Aborting benchmark: {}".format(monitor.abort))
+        handle_out("RT curve: {}".format(monitor.status()))
+        handle_out(os.linesep)
+        return -1
+
+    def _launch_report(self, sched, result_dir: str, handle_out):
+        """Called internally only.  Saves each agent's time to handshake, and displays a summary"""
+        if not sched.agents:
+            return
+        sched.write_report(os.path.join(result_dir, 'handshake.csv'))
+        times = [a.handshake_time() for a in sched.agents]
+        attached = [t for t in times if t is not None]
+        handle_out(os.linesep)
+        if attached:
+            handle_out(
+                "{} of {} agents attached in {} waves, time to handshake: min {:.1f}s, max {:.1f}s".
+                format(
+                    len(attached), len(times), sched.waves(), min(attached),
+                    max(attached)))
+        else:
+            handle_out("No agent handshakes were seen in the controller output")
+
+    def _launch(self,
+                cmd: str,
+                result_dir: str,
+                mux,
+                log_path: str,
+                err_path,
+                handle_out,
+                handle_err,
+                fmt="{}",
+                binding=None):
+        """
+        Called internally only.  Starts 'cmd' in 'result_dir', capturing its stdout to 'log_path' and
+        its stderr to 'err_path' (or into 'log_path' as well, if 'err_path' is None).
+        With log_capture 'tee' every line passes through 'mux' on its way to the file,
+        with 'direct' the JVM writes the files itself and 'mux' tails them for display.
+        :param handle_out: Handler for stdout lines (formatted with 'fmt'), or None to not display them
+        :param binding: An affinity.Binding applied to the child before it runs 'cmd'.
+                        Defaults to pinning it to the CPUs of the run's slot, if it has one.
+        The process is started in its own process group, tracked by the run's ProcessSupervisor.
+        :return: The Popen object, and a list of files to close once it's done
+        """
+        preexec = binding
+        if preexec is None and self._slot is not None:
+            preexec = self._slot.preexec_fn()
+        if self.log_capture == 'direct':
+            out = open(log_path, 'w')
+            err = open(err_path, 'w') if err_path else STDOUT
+            try:
+                p = Popen(
+                    shlex.split(cmd),
+                    cwd=result_dir,
+                    stdout=out,
+                    stderr=err,
+                    preexec_fn=preexec,
+                    **ProcessSupervisor.popen_kw())
+            finally:
+                # the JVM has its own copies of these now
+                out.close()
+                if err_path:
+                    err.close()
+            self._track(p)
+            if handle_out is not None:
+                mux.follow(log_path, lambda line: handle_out(fmt.format(line)))
+            if err_path:
+                mux.follow(err_path, handle_err)
+            return p, []
+
+        p = Popen(
+            shlex.split(cmd),
+            cwd=result_dir,
+            stdout=PIPE,
+            stderr=PIPE if err_path else STDOUT,
+            universal_newlines=True,
+            preexec_fn=preexec,
+            **ProcessSupervisor.popen_kw())
+        self._track(p)
+        logs = [open(log_path, 'w')]
+        mux.register(p.stdout, spec_run._tee(logs[0], handle_out, fmt))
+        if err_path:
+            logs.append(open(err_path, 'w'))
+            mux.register(p.stderr, spec_run._tee(logs[1], handle_err))
+        return p, logs
+
+    def _record(self, result_dir: str, exitcode, handle_err):
+        """
+        Called internally only.  Records a finished run in the results catalog (see src.catalog),
+        which is kept in the directory holding the results trees.
+        """
+        path = self._catalog_path(os.path.join(result_dir, os.pardir))
+        # the props the run set, like SpecJBBRun.record, so both record a configuration under the same key
+        props = {p.prop: p.value for p in self.properties.get_modified()}
+        cpus = None
+        if self._slot is not None:
+            props['specjbb.controller.port'] = self._slot.port
+            cpus = self._slot.cpus
+        topo = {
+            'groups': self.properties.root['specjbb.group.count'].value,
+            'numa_nodes': self.numa_nodes,
+            'binding': self.binding,
+            'cpus': cpus
+        }
+        try:
+            with catalog.Catalog(path) as c:
+                c.record(
+                    os.path.abspath(result_dir), self.tag, self.run_type,
+                    fingerprint.jdk_version(self.jdk), self.jvm_options,
+                    props, topo, exitcode, rollup.analyze_run(result_dir),
+                    java=self.jdk)
+        except Exception as e:
+            handle_err("Failed to record the run in {}: {}".format(path, e))
+
+    @staticmethod
+    def _catalog_path(result_parent: str):
+        """Called internally only.  The results catalog is kept in the directory holding the results trees"""
+        return os.path.normpath(
+            os.path.join(result_parent, os.pardir, catalog.DEFAULT_NAME))
+
+    def _track(self, p):
+        """Called internally only.  Hands 'p' to the run's ProcessSupervisor, if it has one"""
+        if self._supervisor is not None:
+            self._supervisor.adopt(p)
+        return p
+
+    def _stop_all(self, handle_err):
+        """
+        Called internally only.  Stops every JVM and collector of the run, process group by process group
+        (SIGTERM, then SIGKILL), see src.supervisor.
+        :return: True if none of them is left running
+        """
+        if self._supervisor is None:
+            return True
+        left = self._supervisor.stop()
+        if left:
+            handle_err("ERROR: processes {} could not be stopped".format(
+                [p.pid for p in left]))
+        return not left
 
     def _prerun(self, path: str):
         """
@@ -779,11 +1058,22 @@ class spec_run:
             path,
             datetime.datetime.fromtimestamp(
                 time.time()).strftime('+%y-%m-%d_%H%M%S'), self.tag)
-        os.makedirs(result_dir)
+        # runs executing in parallel may start within the same second
+        base, n = result_dir, 1
+        while True:
+            try:
+                os.makedirs(result_dir)
+                break
+            except FileExistsError:
+                result_dir = "{}-{}".format(base, n)
+                n += 1
         if not os.path.exists("{}/config".format(result_dir)):
             os.makedirs("{}/config".format(result_dir))
+        overrides = {}
+        if self._slot is not None:
+            overrides['specjbb.controller.port'] = self._slot.port
         self.properties.writeconfig(
-            "{}/config/specjbb2015.props".format(result_dir))
+            "{}/config/specjbb2015.props".format(result_dir), overrides)
         templates = os.path.abspath(os.path.join(__file__, os.pardir))
         templateC = os.path.join(templates, "scripts", "template-C.raw")
         templateD = os.path.join(templates, "scripts", "template-D.raw")
@@ -797,6 +1087,10 @@ class spec_run:
         return result_dir
 
     def _start_data_collection(self, results_dir: str, handle):
+        """
+        Called internally only.  Starts the 'data_collection' commands in 'results_dir',
+        each in its own process group, tracked by the run's ProcessSupervisor.
+        """
         procs = []
         cmds = self.data_collection.split(";")
         for c in cmds:
@@ -810,13 +1104,15 @@ class spec_run:
                         os.path.join(results_dir, "{}.log".format(shcmd[0])),
                         'w')
                     procs.append(
-                        Popen(
-                            shcmd,
-                            cwd=results_dir,
-                            stdout=stdout,
-                            stderr=STDOUT,
-                            close_fds=True,
-                            universal_newlines=True))
+                        self._track(
+                            Popen(
+                                shcmd,
+                                cwd=results_dir,
+                                stdout=stdout,
+                                stderr=STDOUT,
+                                close_fds=True,
+                                universal_newlines=True,
+                                **ProcessSupervisor.popen_kw())))
                 else:
                     handle(
                         "Failed to start data collection: '{}', command does not exit".
@@ -844,11 +1140,38 @@ class spec_run:
         return opts
 
     def _check_numa(self):
-        p = Popen(shlex.split('which numactl'), stdout=PIPE)
-        o, e = p.communicate()
-        result = len(o) > 0
-        p.wait()
-        return result
+        return topology.numactl_available()
+
+    def _binding_plan(self):
+        """
+        Called internally only.  Returns the affinity.affinity_plan spreading this run's groups
+        across (up to 'numa_nodes') NUMA nodes, or None when the groups shouldn't be bound.
+        'core' binding also applies inside a single node.
+        """
+        topo = topology.topology()
+        if self.binding != 'core' and (int(self.numa_nodes) <= 1
+                                       or len(topo.usable()) <= 1):
+            return None
+        if self.binding == 'numactl' and not self._check_numa():
+            return None
+        groups = int(self.properties.root['specjbb.group.count'].value)
+        cpus = self._slot.cpus if self._slot is not None else None
+        return affinity.affinity_plan(topo, groups, self.numa_nodes,
+                                      self.binding, self.memory_policy, cpus)
+
+    @staticmethod
+    def _tee(f, handle, fmt="{}"):
+        """
+        Called internally only.  Returns a line handler that writes each line to 'f'
+        and then passes it (formatted with 'fmt') to 'handle', if one is given.
+        """
+
+        def _write(line):
+            f.write(line)
+            if handle is not None:
+                handle(fmt.format(line))
+
+        return _write
 
     @staticmethod
     def _signal_handler(signum, frame):
@@ -858,6 +1181,12 @@ class spec_run:
 
 
 class propitem:
+    """
+    A SPECjbb property: its name, default value, description and validators.
+    The propitems of 'defaults' are shared by every run, each run's values are kept by its 'props'.
+    """
+    __slots__ = ('prop', 'def_value', 'desc', 'input_validator',
+                 'value_validator', 'valid_opts', 'help_text', 'value')
 
     def __init__(self,
                  prop,
@@ -908,6 +1237,14 @@ known_args = [
 
 run_types = ['composite', 'distributed_ctrl_txl', 'distributed_sut', 'multi']
 
+log_captures = ['tee', 'direct']
+
+admission_policies = AdmissionPolicies
+
+binding_modes = affinity.BindingModes
+
+memory_policies = affinity.MemoryPolicies
+
 loglevels = ['SEVERE', 'WARNING', 'INFO', 'CONFIG', 'FINE', 'FINER', 'FINEST']
 
 con_types = [
@@ -930,6 +1267,16 @@ def default_validator(x):
     return True
 
 
+def parse_abort_policy(text):
+    """
+    Parses an abort_policy typed in as JSON, see src.validate.AbortPolicySchema (empty text is no policy).
+    Raises an Exception if it isn't a valid abort_policy.
+    """
+    if not text.strip():
+        return {}
+    return AbortPolicySchema.validate(json.loads(text))
+
+
 defaults = [
     propitem('specjbb.controller.type', 'HBIR_RT',
              'Controls phases being controlled by Controller.',
@@ -1207,6 +1554,62 @@ defaults = [
         help_text=must_be_positive)
 ]
 
+# the propitems of 'defaults' by property, shared by every 'props' and never changed
+default_props = MappingProxyType({a.prop: a for a in defaults})
+# the position of each property in 'defaults'
+_default_order = {a.prop: i for i, a in enumerate(defaults)}
+
+
+class propview:
+    """
+    Called internally only.  A propitem of 'defaults' as one 'props' sees it: its value is read from,
+    and written to, the overrides of that props, so the shared propitem never changes.
+    """
+    __slots__ = ('item', 'overrides')
+
+    def __init__(self, item, overrides):
+        self.item = item
+        self.overrides = overrides
+
+    def __getattr__(self, name):
+        # prop, def_value, desc, the validators, valid_opts and help_text
+        if name.startswith('__') or name in propview.__slots__:
+            raise AttributeError(name)
+        return getattr(self.item, name)
+
+    @property
+    def value(self):
+        return self.overrides.get(self.item.prop, self.item.def_value)
+
+    @value.setter
+    def value(self, value):
+        if value == self.item.def_value:
+            self.overrides.pop(self.item.prop, None)
+        else:
+            self.overrides[self.item.prop] = value
+
+    _write = propitem._write
+    set = propitem.set
+    reset = propitem.reset
+    _totateconfig = propitem._totateconfig
+    _tojson = propitem._tojson
+
+
+class proptable(Mapping):
+    """Called internally only.  The propviews of one 'props' by property, made when they're asked for"""
+
+    def __init__(self, overrides):
+        self.overrides = overrides
+
+    def __getitem__(self, key):
+        return propview(default_props[key], self.overrides)
+
+    def __iter__(self):
+        return iter(default_props)
+
+    def __len__(self):
+        return len(default_props)
+
 
 def type_convert(obj):
     if obj == 'True' or obj == 'true' or obj == 'T' or obj == 't': return True
@@ -1224,9 +1627,15 @@ def type_convert(obj):
 
 
 class props:
+    """
+    The SPECjbb properties of a run: the shared 'defaults', and the values that differ from them.
+    root maps every property to a propview of it, for reading and setting its value.
+    """
 
     def __init__(self, fromjson=None):
-        self.root = {a.prop: copy.deepcopy(a) for a in defaults}
+        # property => value, of the properties that differ from their defaults
+        self.overrides = {}
+        self.root = proptable(self.overrides)
         if not fromjson is None:
             for p in fromjson.get('modified', []):
                 self.set(p['prop'], p['value'])
@@ -1245,25 +1654,32 @@ class props:
                     raise TypeError
 
     def get_all(self):
-        """Returns a list of 'propitem's"""
+        """Returns a list of 'propitem's (propviews)"""
         return list(self.root.values())
 
     def get_modified(self):
-        """Returns a list of modified 'propitem's"""
+        """Returns a list of modified 'propitem's (propviews), in the order of 'defaults'"""
         return [
-            x for x in list(self.root.values())
-            if isinstance(x, propitem) and x.value != x.def_value
+            self.root[prop]
+            for prop in sorted(self.overrides, key=_default_order.get)
         ]
 
-    def writeconfig(self, path: str):
-        """Called internally only before running any 'spec_run'"""
+    def writeconfig(self, path: str, overrides=None):
+        """
+        Called internally only before running any 'spec_run'
+        :param overrides: A dictionary of property => value written instead of the configured values
+        """
+        overrides = overrides or {}
         with open(path, 'w') as f:
             f.write("#SPECjbb config")
             f.write(os.linesep)
             for p in self.get_modified():
-                if isinstance(p, propitem):
+                if p.prop not in overrides:
                     p._write(f)
                     f.write(os.linesep)
+            for prop, value in overrides.items():
+                f.write("{} = {}".format(prop, value))
+                f.write(os.linesep)
 
     def _tojson(self):
         """Called internally only.  Returns dictionary of json values"""
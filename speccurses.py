@@ -312,6 +312,36 @@ def draw_edit_run(stdscr, runinfo):
                 value = select_from(stdscr, xoffset + startx, cury,
                                     getattr(runinfo, name), run_types, _resize)
                 setattr(runinfo, name, value)
+            elif name == 'log_capture':
+                value = select_from(stdscr, xoffset + startx, cury,
+                                    getattr(runinfo, name),
+                                    objects.log_captures, _resize)
+                setattr(runinfo, name, value)
+            elif name == 'admission':
+                value = select_from(stdscr, xoffset + startx, cury,
+                                    getattr(runinfo, name),
+                                    objects.admission_policies, _resize)
+                setattr(runinfo, name, value)
+            elif name == 'binding':
+                value = select_from(stdscr, xoffset + startx, cury,
+                                    getattr(runinfo, name),
+                                    objects.binding_modes, _resize)
+                setattr(runinfo, name, value)
+            elif name == 'memory_policy':
+                value = select_from(stdscr, xoffset + startx, cury,
+                                    getattr(runinfo, name),
+                                    objects.memory_policies, _resize)
+                setattr(runinfo, name, value)
+            elif name == 'abort_policy':
+                # a dict, edited as JSON
+                value = input_text(stdscr, xoffset + startx, cury,
+                                   json.dumps(getattr(runinfo, name) or {}),
+                                   lambda x: True, _resize)
+                try:
+                    setattr(runinfo, name, objects.parse_abort_policy(value))
+                except Exception as e:
+                    draw_show_message(
+                        stdscr, "Invalid abort policy, not saved: {}".format(e))
             elif name == 'properties':
                 draw_edit_props(stdscr, runinfo.properties.get_all())
             elif name == 'jdk':
@@ -321,7 +351,8 @@ def draw_edit_run(stdscr, runinfo):
                 if not os.path.exists(value):
                     draw_show_message(stdscr, "Warning: jdk path not found")
                 setattr(runinfo, name, value)
-            elif name == 'num_runs' or name == 'numa_nodes':
+            elif name in ('num_runs', 'numa_nodes', 'launch_wave_size',
+                          'launch_max_pending', 'cpus'):
                 value = input_text(stdscr, xoffset + startx, cury,
                                    getattr(runinfo,
                                            name), objects.number_validator,
@@ -652,6 +683,12 @@ def run_config(stdscr):
             stdscr,
             "An error occured running the benchmark. Press any key to continue")
         return stdscr.getch()
+    if result == 5:
+        draw_status_bar(
+            stdscr,
+            "A run didn't fit on this host and was refused. Press any key to continue"
+        )
+        return stdscr.getch()
     draw_status_bar(stdscr,
                     "All runs have been completed - Press any key to continue")
     return stdscr.getch()
@@ -0,0 +1,408 @@
+"""
+This module decides whether a run fits on this host before any of its JVMs
+are started. The heap and GC thread flags of each JVM are parsed from its
+options, multiplied by the number of JVMs the run starts locally, and
+compared with the memory available (/proc/meminfo) and the online CPUs.
+
+Depending on the policy a run that doesn't fit is refused, shrunk to the
+number of groups that do fit, or queued until enough memory is free.
+
+The JVMs of an admitted run take a while to allocate their heaps, so runs
+executing in parallel reserve what they were admitted with until they
+finish (see Reservations), and later runs only get what's left.
+"""
+import logging
+import os
+import re
+import shlex
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+"""
+These are the admission policies:
+    - refuse: a run that doesn't fit isn't started
+    - shrink: the group count of a run that doesn't fit is lowered until it does
+    - queue: the run waits until enough memory is available
+    - off: runs are always started (the default)
+"""
+AdmissionPolicies = [
+    "refuse",
+    "shrink",
+    "queue",
+    "off",
+]
+
+# memory every JVM uses outside of its heap (metaspace, code cache, thread stacks...)
+JVM_OVERHEAD = 256 * 2**20
+# fraction of the available memory runs may use
+HEADROOM = 0.9
+
+_UNITS = {
+    '': 1,
+    'k': 2**10,
+    'm': 2**20,
+    'g': 2**30,
+    't': 2**40,
+}
+
+
+def parse_size(value):
+    """
+    Parses a JVM memory size ('29g', '512m', '1024k', '1073741824').
+    :return: The size in bytes
+    """
+    m = re.match(r'^(\d+)([kmgt]?)$', str(value).strip().lower())
+    if not m:
+        raise Exception("unrecognized memory size '{}'".format(value))
+    return int(m.group(1)) * _UNITS[m.group(2)]
+
+
+class JvmFootprint:
+    """
+    The resources one JVM is expected to use.
+
+    heap: the most heap (in bytes) the JVM may use, or None if it wasn't set
+    gc_threads: the GC threads the JVM was given, or None if it wasn't set
+    """
+
+    def __init__(self, heap=None, gc_threads=None):
+        self.heap = heap
+        self.gc_threads = gc_threads
+
+    def memory(self, host):
+        """
+        Bytes this JVM may use on 'host'. Without heap flags the JVM's initial heap
+        (1/64 of memory) is counted, as its heap only grows when it's needed.
+        """
+        heap = self.heap if self.heap is not None else host.total // 64
+        return heap + JVM_OVERHEAD
+
+    def __repr__(self):
+        return "JvmFootprint(heap={}, gc_threads={})".format(
+            self.heap, self.gc_threads)
+
+
+def parse_jvm_options(options):
+    """
+    Reads the heap and GC thread flags from JVM options.
+    :param options: The options as a string, or a list of arguments
+    :return: A JvmFootprint
+    """
+    if isinstance(options, str):
+        options = shlex.split(options)
+    heap = None
+    parallel = None
+    concurrent = None
+    for opt in options:
+        if opt.startswith('-Xmx') or opt.startswith('-Xms'):
+            size = parse_size(opt[4:])
+            heap = size if heap is None else max(heap, size)
+        elif opt.startswith('-XX:MaxHeapSize='):
+            size = parse_size(opt.split('=', 1)[1])
+            heap = size if heap is None else max(heap, size)
+        elif opt.startswith('-XX:ParallelGCThreads='):
+            parallel = int(opt.split('=', 1)[1])
+        elif opt.startswith('-XX:ConcGCThreads='):
+            concurrent = int(opt.split('=', 1)[1])
+    threads = None
+    if parallel is not None or concurrent is not None:
+        threads = (parallel or 0) + (concurrent or 0)
+    return JvmFootprint(heap, threads)
+
+
+class HostResources:
+    """
+    The memory (in bytes) and CPUs of this host.
+
+    total: MemTotal
+    available: MemAvailable (what can be used without swapping)
+    cpus: the CPUs runs may use
+    """
+
+    def __init__(self, total, available, cpus):
+        self.total = total
+        self.available = available
+        self.cpus = cpus
+
+    @staticmethod
+    def read(meminfo='/proc/meminfo', cpus=None):
+        """
+        Reads this host's resources.
+        :param cpus: The number of CPUs runs may use. Defaults to the CPUs this process may run on.
+        """
+        values = {}
+        with open(meminfo) as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                fields = rest.split()
+                if fields:
+                    values[name] = int(fields[0]) * _UNITS[
+                        fields[1][0].lower() if len(fields) > 1 else '']
+        if cpus is None:
+            try:
+                cpus = len(os.sched_getaffinity(0))
+            except AttributeError:
+                cpus = os.cpu_count() or 1
+        total = values['MemTotal']
+        # kernels before 3.14 don't report MemAvailable
+        available = values.get('MemAvailable',
+                               values.get('MemFree', 0) + values.get(
+                                   'Cached', 0))
+        return HostResources(total, available, cpus)
+
+    def __repr__(self):
+        return "HostResources(total={}, available={}, cpus={})".format(
+            self.total, self.available, self.cpus)
+
+
+"""
+JVM roles whose GC threads compete for the CPUs. Controllers and injectors
+spend a run mostly idle, so their GC threads aren't counted.
+"""
+BusyRoles = [
+    "composite",
+    "backend",
+]
+
+
+class JvmSet:
+    """
+    'count' JVMs of a run with the same role and footprint,
+    started once for the run, or once for every group if 'per_group'.
+    """
+
+    def __init__(self, role, count, footprint, per_group=False):
+        self.role = role
+        self.count = count
+        self.footprint = footprint
+        self.per_group = per_group
+
+    def total(self, groups):
+        return self.count * groups if self.per_group else self.count
+
+
+class RunDemand:
+    """
+    The JVMs (a list of JvmSets) a run starts on this host, with 'groups' groups.
+    """
+
+    def __init__(self, jvm_sets, groups=1):
+        self.jvm_sets = jvm_sets
+        self.groups = groups
+
+    def jvms(self, groups=None):
+        groups = self.groups if groups is None else groups
+        return sum(s.total(groups) for s in self.jvm_sets)
+
+    def memory(self, host, groups=None):
+        """Bytes the run may use with 'groups' groups"""
+        groups = self.groups if groups is None else groups
+        return sum(
+            s.total(groups) * s.footprint.memory(host) for s in self.jvm_sets)
+
+    def threads(self, groups=None):
+        """GC threads the busy JVMs of the run were given, with 'groups' groups"""
+        groups = self.groups if groups is None else groups
+        return sum(
+            s.total(groups) * (s.footprint.gc_threads or 0)
+            for s in self.jvm_sets if s.role in BusyRoles)
+
+
+class AdmissionDecision:
+    """
+    admit: whether the run may start
+    groups: the number of groups the run may start with
+    reason: a description of the decision
+    reserved: the (memory, GC threads) reserved for the run, None if nothing was
+    """
+
+    def __init__(self, admit, groups, reason):
+        self.admit = admit
+        self.groups = groups
+        self.reason = reason
+        self.reserved = None
+
+    def __repr__(self):
+        return "AdmissionDecision(admit={}, groups={}, reason={})".format(
+            self.admit, self.groups, self.reason)
+
+
+class Reservations:
+    """
+    The memory and GC threads of the runs that were admitted and are still running.
+
+    The memory left for another run is what's left of MemAvailable (as it was when the first of
+    these runs was admitted) after their reservations, or what MemAvailable is now if that's less.
+    That way memory their JVMs already allocated isn't counted twice.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.memory = 0
+        self.threads = 0
+        self.runs = 0
+        # MemAvailable when the first of the runs was admitted
+        self.baseline = None
+
+    def available(self, host):
+        """Returns the memory of 'host' that's neither used nor reserved"""
+        with self.lock:
+            if not self.runs:
+                return host.available
+            return min(host.available, max(0, self.baseline - self.memory))
+
+    def add(self, host, memory, threads):
+        with self.lock:
+            if not self.runs:
+                self.baseline = host.available
+            self.runs += 1
+            self.memory += memory
+            self.threads += threads
+
+    def remove(self, memory, threads):
+        with self.lock:
+            self.runs -= 1
+            self.memory -= memory
+            self.threads -= threads
+            if not self.runs:
+                self.baseline = None
+
+
+# what the runs of this process reserved
+reservations = Reservations()
+
+
+def _gib(n):
+    return "{:.1f}GiB".format(n / 2**30)
+
+
+class AdmissionController:
+    """
+    Applies an admission policy (see AdmissionPolicies) to runs.
+    """
+
+    def __init__(self,
+                 policy="off",
+                 headroom=HEADROOM,
+                 queue_timeout=3600,
+                 queue_interval=30,
+                 read_host=HostResources.read,
+                 own_cpus=False,
+                 reserved=reservations,
+                 logger=log):
+        """
+        :param headroom: Fraction of the available memory runs may use
+        :param queue_timeout: Seconds a queued run waits for memory before it's refused (None = forever)
+        :param queue_interval: Seconds between checks of the available memory while queued
+        :param read_host: Returns the current HostResources
+        :param own_cpus: Whether the run has CPUs of its own (see src.scheduler), then the GC threads of other runs don't compete with its
+        :param reserved: The Reservations of the runs still running
+        """
+        if policy not in AdmissionPolicies:
+            raise Exception(
+                "unrecognized admission policy '{}', must be one of {}".format(
+                    policy, AdmissionPolicies))
+        self.policy = policy
+        self.headroom = headroom
+        self.queue_timeout = queue_timeout
+        self.queue_interval = queue_interval
+        self.read_host = read_host
+        self.own_cpus = own_cpus
+        self.reserved = reserved
+        self.log = logger
+
+    def fits(self, demand, host, groups=None, reserved=True):
+        """
+        :param reserved: Whether what the runs still running reserved is taken
+        :return: None if the run fits on 'host', or a description of what doesn't
+        """
+        memory = demand.memory(host, groups)
+        available = self.reserved.available(
+            host) if reserved else host.available
+        limit = int(available * self.headroom)
+        if memory > limit:
+            return "needs {} of memory for {} JVMs, {} is available".format(
+                _gib(memory), demand.jvms(groups), _gib(limit))
+        threads = demand.threads(groups)
+        busy = self.reserved.threads if reserved and not self.own_cpus else 0
+        if threads + busy > host.cpus:
+            if busy:
+                return "starts {} GC threads on {} CPUs, where other runs started {}".format(
+                    threads, host.cpus, busy)
+            return "starts {} GC threads on {} CPUs".format(threads, host.cpus)
+        return None
+
+    def check(self, demand, host=None, reserve=False):
+        """
+        Decides whether a run may start right now, without waiting.
+        :param reserve: Whether an admitted run reserves what it was admitted with, until it's released
+        :return: An AdmissionDecision
+        """
+        if self.policy == "off":
+            return AdmissionDecision(True, demand.groups, "admission is off")
+        host = host if host is not None else self.read_host()
+        with self.reserved.lock:
+            decision = self._decide(demand, host)
+            if reserve and decision.admit:
+                decision.reserved = (demand.memory(host, decision.groups),
+                                     0 if self.own_cpus else
+                                     demand.threads(decision.groups))
+                self.reserved.add(host, *decision.reserved)
+        return decision
+
+    def _decide(self, demand, host):
+        """Called internally only by check()"""
+        problem = self.fits(demand, host)
+        if problem is None:
+            return AdmissionDecision(True, demand.groups, "fits")
+
+        if self.policy == "shrink":
+            for groups in range(demand.groups - 1, 0, -1):
+                if self.fits(demand, host, groups) is None:
+                    return AdmissionDecision(
+                        True, groups,
+                        "{}, shrinking from {} to {} groups".format(
+                            problem, demand.groups, groups))
+        return AdmissionDecision(False, demand.groups, problem)
+
+    def release(self, decision):
+        """Releases what the run of 'decision' reserved, once it's finished"""
+        if decision is not None and decision.reserved is not None:
+            self.reserved.remove(*decision.reserved)
+            decision.reserved = None
+
+    def admit(self, demand, cancelled=lambda: False):
+        """
+        Decides whether a run may start, queueing it (with the 'queue' policy)
+        until it fits, 'queue_timeout' expires or 'cancelled()' returns True.
+        An admitted run reserves what it was admitted with, release() it when it's finished.
+        :return: An AdmissionDecision
+        """
+        decision = self.check(demand, reserve=True)
+        if decision.admit or self.policy != "queue":
+            return decision
+
+        host = self.read_host()
+        # a run that can't fit even on an idle host will never start
+        idle = HostResources(host.total, host.total, host.cpus)
+        if self.fits(demand, idle, reserved=False) is not None:
+            return AdmissionDecision(False, demand.groups,
+                                     "{}, even with nothing else running".format(
+                                         decision.reason))
+
+        self.log.info("queueing run: {}".format(decision.reason))
+        started = time.monotonic()
+        while not cancelled():
+            if self.queue_timeout is not None and time.monotonic(
+            ) - started >= self.queue_timeout:
+                return AdmissionDecision(
+                    False, demand.groups,
+                    "{}, after waiting {}s".format(decision.reason,
+                                                  self.queue_timeout))
+            time.sleep(self.queue_interval)
+            decision = self.check(demand, reserve=True)
+            if decision.admit:
+                return decision
+        return AdmissionDecision(False, demand.groups, "cancelled while queued")
@@ -0,0 +1,270 @@
+"""
+This module binds JVMs to CPUs (and optionally NUMA memory) from inside
+the child process, between fork and exec, instead of wrapping commands
+with numactl.
+
+A Binding is used as a Popen preexec_fn. affinity_plan() builds one
+per group of a multi-JVM run from a src.topology.Topology.
+"""
+import ctypes
+import os
+import platform
+
+from src.topology import GroupBinding, Topology, binding_plan, format_cpulist
+
+"""
+These are the ways the groups of a multi-JVM run can be bound:
+    - numactl: commands are prefixed with 'numactl --cpunodebind=<node> --localalloc'
+    - node: each group is pinned to every CPU of its node
+    - core: each group gets its own cores inside its node, with the injectors
+      on different cores than the backend
+"""
+BindingModes = [
+    "numactl",
+    "node",
+    "core",
+]
+
+"""
+These are the memory policies a Binding can apply:
+    - local: memory comes from the node of the CPU touching it first (the kernel default)
+    - preferred: memory comes from the group's node while it has free memory
+    - bind: memory only ever comes from the group's node
+"""
+MemoryPolicies = [
+    "local",
+    "preferred",
+    "bind",
+]
+
+# share of a group's cores given to its injectors in 'core' mode
+INJECTOR_SHARE = 0.125
+
+_MPOL = {
+    "preferred": 1,
+    "bind": 2,
+}
+
+# glibc doesn't wrap set_mempolicy (libnuma does), so it's called by number
+_SYS_SET_MEMPOLICY = {
+    "x86_64": 238,
+    "aarch64": 237,
+    "ppc64": 261,
+    "ppc64le": 261,
+    "s390x": 270,
+    "i386": 276,
+    "i686": 276,
+}
+
+
+def mempolicy_supported():
+    """Returns whether set_mempolicy can be called on this machine"""
+    return platform.system() == "Linux" and platform.machine(
+    ) in _SYS_SET_MEMPOLICY
+
+
+_syscall = None
+
+
+def _libc_syscall():
+    """Called internally only.  Returns libc's syscall(), looked up once"""
+    global _syscall
+    if _syscall is None:
+        _syscall = ctypes.CDLL(None, use_errno=True).syscall
+    return _syscall
+
+
+def mempolicy_call(policy, nodes):
+    """
+    Prepares the set_mempolicy call of 'policy' on 'nodes', so it can be made between fork
+    and exec without loading libraries or allocating (which can deadlock in the child of
+    a process with threads).
+    :return: A function making the call, or None for the 'local' policy
+    """
+    if policy == "local":
+        return None
+    nodes = sorted(nodes)
+    # the kernel ignores the last bit of maxnode
+    maxnode = nodes[-1] + 2
+    words = (maxnode + 63) // 64
+    mask = (ctypes.c_ulong * words)()
+    for n in nodes:
+        mask[n // 64] |= 1 << (n % 64)
+    syscall = _libc_syscall()
+    args = (_SYS_SET_MEMPOLICY[platform.machine()], _MPOL[policy], mask,
+            ctypes.c_ulong(maxnode))
+
+    def _call():
+        if syscall(*args) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    return _call
+
+
+def set_mempolicy(policy, nodes):
+    """
+    Sets the NUMA memory policy of the calling process.
+    :param policy: One of MemoryPolicies
+    :param nodes: The nodes memory may come from
+    """
+    call = mempolicy_call(policy, nodes)
+    if call is not None:
+        call()
+
+
+class Binding:
+    """
+    A Popen preexec_fn pinning the child to 'cpus', and applying 'memory_policy'
+    on 'nodes'. It's a class (and not a closure) so TaskRunners using it stay pickle-able.
+    The memory policy call is prepared in the parent, so the child only makes it.
+    """
+
+    def __init__(self, cpus, nodes=(), memory_policy="local"):
+        if memory_policy not in MemoryPolicies:
+            raise Exception(
+                "unrecognized memory policy '{}', must be one of {}".format(
+                    memory_policy, MemoryPolicies))
+        if memory_policy != "local" and not mempolicy_supported():
+            raise Exception(
+                "memory policy '{}' isn't supported on this machine".format(
+                    memory_policy))
+        self.cpus = sorted(cpus)
+        self.nodes = sorted(nodes)
+        self.memory_policy = memory_policy
+        self._mempolicy = mempolicy_call(memory_policy, self.nodes)
+
+    def __getstate__(self):
+        # the prepared call holds ctypes objects, it's prepared again when unpickled
+        state = dict(self.__dict__)
+        del state['_mempolicy']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._mempolicy = mempolicy_call(self.memory_policy, self.nodes)
+
+    def __call__(self):
+        os.sched_setaffinity(0, self.cpus)
+        if self._mempolicy is not None:
+            self._mempolicy()
+
+    def __repr__(self):
+        return "Binding(cpus={}, nodes={}, memory_policy={})".format(
+            format_cpulist(self.cpus), self.nodes, self.memory_policy)
+
+
+class GroupAffinity(GroupBinding):
+    """
+    A GroupBinding that also knows which CPUs the group's JVMs get.
+    backend, injectors: the Bindings of the group's backend and injectors,
+        or None in 'numactl' mode
+    """
+
+    def __init__(self, group, node, backend=None, injectors=None):
+        super().__init__(group, node)
+        self.backend = backend
+        self.injectors = injectors
+
+    def numactl(self):
+        """Returns the numactl command prefix binding this group to its node"""
+        return ["numactl", "--cpunodebind={}".format(self.node.id),
+                "--localalloc"]
+
+    def __repr__(self):
+        return "GroupAffinity(group={}, node={}, backend={}, injectors={})".format(
+            self.group, self.node.id, self.backend, self.injectors)
+
+
+def _split(items, parts):
+    """Called internally only.  Splits 'items' into 'parts' contiguous, nearly equal chunks"""
+    size, extra = divmod(len(items), parts)
+    chunks = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def affinity_plan(topo,
+                  groups,
+                  max_nodes=None,
+                  mode="node",
+                  memory_policy="local",
+                  cpus=None):
+    """
+    Spreads 'groups' groups across the nodes of 'topo' round robin (see
+    src.topology.binding_plan), and decides which CPUs each group's JVMs get.
+    :param mode: One of BindingModes
+    :param cpus: Only hand out these CPUs (None = all of them)
+    :return: A list of GroupAffinity, one per group
+    """
+    if mode not in BindingModes:
+        raise Exception("unrecognized binding mode '{}', must be one of {}".format(
+            mode, BindingModes))
+    allowed = set(cpus) if cpus is not None else None
+    nodes = [
+        n for n in topo.usable()
+        if allowed is None or allowed.intersection(n.cpus)
+    ]
+    if not nodes:
+        raise Exception("none of the CPUs {} are on a NUMA node".format(
+            format_cpulist(cpus)))
+    assigned = {n.id: [] for n in nodes}
+    for b in binding_plan(Topology(nodes), groups, max_nodes):
+        assigned[b.node.id].append(b.group)
+
+    plan = [None] * groups
+    for node in nodes:
+        cores = [[c for c in core if allowed is None or c in allowed]
+                 for core in node.cores]
+        cores = [core for core in cores if core]
+        node_cpus = [c for core in cores for c in core]
+        members = assigned[node.id]
+        if not members:
+            continue
+        if mode == "numactl":
+            for g in members:
+                plan[g] = GroupAffinity(g, node)
+            continue
+        if mode == "node":
+            for g in members:
+                b = Binding(node_cpus, [node.id], memory_policy)
+                plan[g] = GroupAffinity(g, node, b, b)
+            continue
+        # 'core': groups sharing a node get disjoint cores when there are enough
+        if len(cores) >= len(members):
+            shares = _split(cores, len(members))
+        else:
+            shares = [cores] * len(members)
+        for g, share in zip(members, shares):
+            if len(share) > 1:
+                tx = max(1, int(round(len(share) * INJECTOR_SHARE)))
+                be_cores, tx_cores = share[:-tx], share[-tx:]
+            else:
+                be_cores = tx_cores = share
+            plan[g] = GroupAffinity(
+                g, node,
+                Binding([c for core in be_cores for c in core], [node.id],
+                        memory_policy),
+                Binding([c for core in tx_cores for c in core], [node.id],
+                        memory_policy))
+    return plan
+
+
+def describe(plan):
+    """Returns one readable line per group of an affinity plan"""
+    lines = []
+    for a in plan:
+        if a.backend is None:
+            lines.append("Group {} -> NUMA node {} (numactl, CPUs {})".format(
+                a.group, a.node.id, format_cpulist(a.node.cpus)))
+        else:
+            lines.append(
+                "Group {} -> NUMA node {}, backend CPUs {}, injector CPUs {}, memory {}".
+                format(a.group, a.node.id, format_cpulist(a.backend.cpus),
+                       format_cpulist(a.injectors.cpus),
+                       a.backend.memory_policy))
+    return lines
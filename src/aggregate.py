@@ -0,0 +1,195 @@
+"""
+This module aggregates repeated runs of the same configuration (see
+'num_runs' and 'times') from the results catalog (see src.catalog).
+
+Runs are grouped by the key of their configuration in the catalog (see
+src.catalog.config_key, which src.compare uses too): run type, JVM
+options, topology and props, leaving out what differs between repeats of
+the same configuration (the tag, the results directory, the controller
+port of a parallel run, the JDK and the host). For each configuration
+the mean, standard deviation, coefficient of variation and a bootstrap
+confidence interval of the mean are computed for max-jOPS and
+critical-jOPS, and a configuration whose interval is still too wide is
+flagged as needing more repeats, with an estimate of how many.
+"""
+import csv
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from src.catalog import config_key, configuration
+
+# the columns of 'runs' that are part of a configuration
+CONFIG_COLUMNS = ['run_type', 'jvm_options', 'groups', 'numa_nodes', 'binding']
+# the results aggregated, columns of 'runs'
+METRICS = ['max_jops', 'critical_jops']
+
+"""
+n: how many values
+mean, stdev: their mean and (sample) standard deviation, stdev is NaN for one value
+cv: stdev / mean
+ci_low, ci_high: the bootstrap confidence interval of the mean
+"""
+Stats = namedtuple('Stats', ['n', 'mean', 'stdev', 'cv', 'ci_low', 'ci_high'])
+
+"""
+key: the key of the configuration in the catalog
+config: the configuration (see src.catalog.configuration), a dict of CONFIG_COLUMNS and 'props'
+tags: the tags of its runs
+runs: the ids of its runs (in the catalog)
+stats: metric => Stats, for each of METRICS the runs have values of
+needs_more: why more repeats are needed, None if the configuration is well determined
+repeats: how many runs in total the configuration is estimated to need
+"""
+Aggregate = namedtuple('Aggregate', [
+    'key', 'config', 'tags', 'runs', 'stats', 'needs_more', 'repeats'
+])
+
+
+def bootstrap_ci(values, confidence=0.95, resamples=10000, seed=None):
+    """
+    Returns the bootstrap percentile confidence interval of the mean of 'values'.
+    Every resample is drawn at once, as a (resamples x len(values)) array of indexes.
+    :return: (low, high), the mean twice for a single value
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        m = float(values.mean()) if len(values) else float('nan')
+        return m, m
+    rng = np.random.default_rng(seed)
+    means = values[rng.integers(0, len(values),
+                                (resamples, len(values)))].mean(axis=1)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(means, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def describe(values, confidence=0.95, resamples=10000, seed=None):
+    """Returns the Stats of 'values'"""
+    values = np.asarray(values, dtype=np.float64)
+    mean = float(values.mean())
+    stdev = float(values.std(ddof=1)) if len(values) > 1 else float('nan')
+    cv = stdev / mean if mean else float('nan')
+    low, high = bootstrap_ci(values, confidence, resamples, seed)
+    return Stats(len(values), mean, stdev, cv, low, high)
+
+
+def repeats_needed(stats, precision, confidence=0.95):
+    """
+    Estimates how many runs it takes for the confidence interval of the mean to be
+    within +/- 'precision' (a fraction of the mean), from the coefficient of variation so far.
+    :return: The number of runs, or None if it can't be estimated yet
+    """
+    if stats.n < 2 or math.isnan(stats.cv):
+        return None
+    z = _z(confidence)
+    return max(stats.n, int(math.ceil((z * stats.cv / precision)**2)))
+
+
+def _z(confidence):
+    """Called internally only.  The two-sided standard normal quantile of 'confidence'"""
+    # bisection on erf, statistics.NormalDist needs python 3.8
+    low, high = 0.0, 10.0
+    for _ in range(60):
+        mid = (low + high) / 2
+        if math.erf(mid / math.sqrt(2)) < confidence:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def config_of(run, props):
+    """
+    Returns the configuration of a run (see src.catalog.configuration).
+    :param run: The run's row of the catalog
+    :param props: Its props, name => value
+    """
+    return configuration(*([run[c] for c in CONFIG_COLUMNS] + [props]))
+
+
+def aggregate(catalog,
+              min_runs=3,
+              precision=0.02,
+              confidence=0.95,
+              resamples=10000,
+              seed=None,
+              **find):
+    """
+    Aggregates the successful runs in 'catalog' (a src.catalog.Catalog) by configuration.
+    A configuration needs more repeats while it has fewer than 'min_runs' runs, or while the
+    confidence interval of its mean max-jOPS (or critical-jOPS) is wider than +/- 'precision' of the mean.
+    :param find: Limits the runs aggregated, see src.catalog.Catalog.find
+    :return: A list of Aggregates, the configurations needing more repeats first
+    """
+    runs = [
+        r for r in catalog.find(**find)
+        if r['exit_code'] in (0, None) and r['max_jops'] is not None
+    ]
+    props = catalog.all_props([r['id'] for r in runs])
+    groups = {}
+    for r in runs:
+        config = config_of(r, props.get(r['id'], {}))
+        key = r['config'] or config_key(
+            *([r[c] for c in CONFIG_COLUMNS] + [props.get(r['id'], {})]))
+        if key not in groups:
+            groups[key] = (config, [])
+        groups[key][1].append(r)
+
+    result = []
+    for key, (config, members) in groups.items():
+        stats = {}
+        for metric in METRICS:
+            values = [r[metric] for r in members if r[metric] is not None]
+            if values:
+                stats[metric] = describe(values, confidence, resamples, seed)
+        needs_more = None
+        repeats = len(members)
+        if len(members) < min_runs:
+            needs_more = "{} of at least {} runs".format(len(members), min_runs)
+            repeats = min_runs
+        for metric, s in stats.items():
+            width = max(s.mean - s.ci_low, s.ci_high - s.mean)
+            if s.mean and width / s.mean > precision:
+                if needs_more is None:
+                    needs_more = "{} interval is +/-{:.1%} of the mean".format(
+                        metric, width / s.mean)
+                estimate = repeats_needed(s, precision, confidence)
+                if estimate is not None:
+                    repeats = max(repeats, estimate)
+        tags = sorted(set(r['tag'] for r in members if r['tag']))
+        result.append(
+            Aggregate(key, config, tags, [r['id'] for r in members], stats,
+                      needs_more, repeats))
+    result.sort(key=lambda a: (a.needs_more is None, a.tags, a.key))
+    return result
+
+
+"""
+The columns of write_csv, one row per configuration.
+"""
+AggregateHeader = ["Config", "Tags", "Runs", "Needs More", "Runs Needed"] + [
+    "{} {}".format(m, s) for m in METRICS
+    for s in ("Mean", "Stdev", "CV", "CI Low", "CI High")
+]
+
+
+def write_csv(aggregates, path):
+    """Writes 'aggregates' to the CSV file 'path' (see AggregateHeader)"""
+    with open(path, 'w', newline='') as f:
+        out = csv.writer(f)
+        out.writerow(AggregateHeader)
+        for a in aggregates:
+            row = [
+                a.key, " ".join(a.tags),
+                len(a.runs), a.needs_more or "", a.repeats
+            ]
+            for m in METRICS:
+                s = a.stats.get(m)
+                if s is None:
+                    row.extend([""] * 5)
+                    continue
+                row.extend("" if math.isnan(v) else repr(v)
+                           for v in (s.mean, s.stdev, s.cv, s.ci_low, s.ci_high))
+            out.writerow(row)
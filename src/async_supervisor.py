@@ -0,0 +1,310 @@
+"""
+This module runs the JVMs of a SPECjbb2015 run as asyncio subprocesses,
+so one event loop can launch the controller, backends and injectors,
+stream their output and collect their exit codes without a Python
+process (or thread) per JVM.
+"""
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+from asyncio.subprocess import PIPE, STDOUT
+
+from src.supervisor import TERM_TIMEOUT, group_members, signal_process
+
+log = logging.getLogger(__name__)
+
+# longest line we'll buffer from a JVM before splitting it
+LINE_LIMIT = 2**20
+
+
+def task_name(task, index):
+    """
+    Returns a readable name for a TaskRunner, based on the SPECjbb component
+    ('-m') it runs, e.g. 'backend-0'.
+    """
+    options = task.argument_list()
+    try:
+        component = options[options.index("-m") + 1].lower()
+    except (ValueError, IndexError):
+        component = "task"
+    return "{}-{}".format(component, index)
+
+
+class ThreadedChildWatcher(asyncio.AbstractChildWatcher):
+    """
+    A child watcher that waits for each process from a thread of its own, like python 3.8's.
+    The watchers of older pythons rely on SIGCHLD, so they only work for the event loop of
+    the main thread, and runs executing in parallel run their loops in worker threads.
+    """
+
+    def add_child_handler(self, pid, callback, *args):
+        loop = asyncio.get_event_loop()
+        t = threading.Thread(
+            target=self._wait, args=(loop, pid, callback, args), daemon=True)
+        t.start()
+
+    @staticmethod
+    def _wait(loop, pid, callback, args):
+        """Called internally only.  Waits for 'pid' to exit, then calls 'callback' from 'loop'"""
+        try:
+            _, status = os.waitpid(pid, 0)
+        except ChildProcessError:
+            # already reaped by someone else
+            returncode = 255
+        else:
+            if os.WIFSIGNALED(status):
+                returncode = -os.WTERMSIG(status)
+            elif os.WIFEXITED(status):
+                returncode = os.WEXITSTATUS(status)
+            else:
+                returncode = status
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(callback, pid, returncode, *args)
+
+    def remove_child_handler(self, pid):
+        return True
+
+    def attach_loop(self, loop):
+        pass
+
+    def is_active(self):
+        return True
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_watcher_lock = threading.Lock()
+
+
+def _install_child_watcher():
+    """Called internally only.  Installs a ThreadedChildWatcher, before python 3.8 (see its documentation)"""
+    if sys.version_info >= (3, 8):
+        return
+    with _watcher_lock:
+        policy = asyncio.get_event_loop_policy()
+        if not isinstance(getattr(policy, '_watcher', None),
+                          ThreadedChildWatcher):
+            asyncio.set_child_watcher(ThreadedChildWatcher())
+
+
+def run_coroutine(coroutine, interrupted=None):
+    """
+    Runs 'coroutine' to completion on a fresh event loop and returns its result.
+    Can be called from any thread.
+    :param interrupted: Returns a coroutine run on the same loop when 'coroutine' is interrupted
+        (KeyboardInterrupt, or cancelled), before the interruption is raised again
+    """
+    _install_child_watcher()
+    loop = asyncio.new_event_loop()
+    try:
+        # before python 3.8 the child watcher attaches to the current loop
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(coroutine)
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            if interrupted is not None:
+                cleanup = asyncio.ensure_future(interrupted(), loop=loop)
+                while not cleanup.done():
+                    try:
+                        loop.run_until_complete(cleanup)
+                    except (KeyboardInterrupt, asyncio.CancelledError):
+                        # raised again by the tasks that were interrupted,
+                        # the cleanup has to finish regardless
+                        pass
+            raise
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+class AsyncSupervisor:
+    """
+    Supervises a controller and a set of agent TaskRunners from one event loop.
+
+    The agents are started as soon as the controller is, and output from every
+    process is handed to 'handle' line by line. When every agent has exited
+    the controller is stopped, and when the controller exits first the agents
+    get 'grace' seconds to follow before they're terminated.
+    Terminated processes (and their process groups) are killed if they're
+    still running 'term_timeout' seconds later.
+    """
+
+    def __init__(self,
+                 handle=None,
+                 grace=30,
+                 logger=log,
+                 term_timeout=TERM_TIMEOUT):
+        """
+        :param handle: Called with (name, line) for every line of output. Defaults to logging it.
+        :param grace: Seconds agents may outlive the controller before being terminated.
+        :param term_timeout: Seconds a terminated process gets to exit before it's killed.
+        """
+        self.log = logger
+        self.handle = handle if handle else self._log_line
+        self.grace = grace
+        self.term_timeout = term_timeout
+        self.exit_codes = {}
+        # the exit codes of the processes that failed (exited non-zero without being stopped)
+        self.failed = {}
+        # why abort() was called, None if it wasn't
+        self.aborted = None
+        # processes we terminated ourselves, so their exit codes aren't failures
+        self._stopped = []
+        # every process started by supervise(), so abort() can stop them
+        self._procs = []
+
+    def _log_line(self, name, line):
+        self.log.info("{}: {}".format(name, line.rstrip()))
+
+    async def _pump(self, name, reader):
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # a line longer than LINE_LIMIT, hand it over in pieces
+                line = await reader.read(LINE_LIMIT)
+            if not line:
+                return
+            self.handle(name, line.decode(errors='replace'))
+
+    async def _start(self, name, task):
+        kw = {
+            k: v
+            for k, v in task.kw.items()
+            if k not in ("stdout", "stderr", "universal_newlines", "bufsize")
+        }
+        self.log.debug("starting {}: {}".format(name, task))
+        proc = await asyncio.create_subprocess_exec(
+            *task.argument_list(),
+            stdout=PIPE,
+            stderr=STDOUT,
+            limit=LINE_LIMIT,
+            **kw)
+        return proc, asyncio.ensure_future(self._pump(name, proc.stdout))
+
+    async def _finish(self, name, proc, pump):
+        code = await proc.wait()
+        await pump
+        self.exit_codes[name] = code
+        if code != 0 and proc not in self._stopped:
+            self.failed[name] = code
+            self.log.warning("{} exited with {}".format(name, code))
+        else:
+            self.log.debug("{} exited".format(name))
+        return code
+
+    def _terminate(self, proc):
+        if proc.returncode is None:
+            self._stopped.append(proc)
+            signal_process(proc.pid, signal.SIGTERM)
+            asyncio.get_event_loop().call_later(self.term_timeout, self._kill,
+                                                proc)
+
+    def _kill(self, proc):
+        if proc.returncode is None:
+            self.log.warning("{} ignored SIGTERM for {}s, killing it".format(
+                proc.pid, self.term_timeout))
+            signal_process(proc.pid, signal.SIGKILL)
+
+    def abort(self, reason):
+        """
+        Terminates the controller and every agent, e.g. from 'handle' when the run isn't worth finishing.
+        supervise() returns once they've exited.
+        """
+        if self.aborted is not None:
+            return
+        self.aborted = reason
+        self.log.warning("aborting run: {}".format(reason))
+        for proc in self._procs:
+            self._terminate(proc)
+
+    def _reap_groups(self, procs):
+        """Kills whatever is left in the process groups of processes that already exited"""
+        for proc in procs:
+            if group_members(proc.pid):
+                self.log.warning(
+                    "processes left behind by {}, killing them".format(
+                        proc.pid))
+                signal_process(proc.pid, signal.SIGKILL)
+
+    async def supervise(self, controller, tasks):
+        """
+        Runs 'controller' and 'tasks' (TaskRunners) to completion.
+        :return: A dict of process name => exit code
+        """
+        self.exit_codes = {}
+        self.failed = {}
+        self.aborted = None
+        self._stopped = []
+        c_proc, c_pump = await self._start("controller", controller)
+        self._procs = [c_proc]
+        started = await asyncio.gather(*[
+            self._start(task_name(task, i), task)
+            for i, task in enumerate(tasks)
+        ])
+        self._procs.extend(proc for proc, _ in started)
+        if self.aborted is not None:
+            # aborted while the agents were starting
+            for proc, _ in started:
+                self._terminate(proc)
+        names = [task_name(task, i) for i, task in enumerate(tasks)]
+
+        c_done = asyncio.ensure_future(
+            self._finish("controller", c_proc, c_pump))
+        agents_done = asyncio.ensure_future(
+            asyncio.gather(*[
+                self._finish(name, proc, pump)
+                for name, (proc, pump) in zip(names, started)
+            ]))
+
+        if not started:
+            await c_done
+            await agents_done
+            self._reap_groups([c_proc])
+            return self.exit_codes
+
+        await asyncio.wait([c_done, agents_done],
+                           return_when=asyncio.FIRST_COMPLETED)
+
+        if agents_done.done():
+            # agents are finished, the controller has nothing left to do
+            self._terminate(c_proc)
+        else:
+            try:
+                await asyncio.wait_for(
+                    asyncio.shield(agents_done), timeout=self.grace)
+            except asyncio.TimeoutError:
+                self.log.warning(
+                    "agents outlived the controller by {}s, terminating them".
+                    format(self.grace))
+                for proc, _ in started:
+                    self._terminate(proc)
+
+        await c_done
+        await agents_done
+        self._reap_groups([c_proc] + [proc for proc, _ in started])
+        return self.exit_codes
+
+    async def _interrupted(self):
+        """
+        Called internally only.  Stops every process when supervise() is interrupted:
+        they run in sessions of their own, so e.g. Ctrl+C at the terminal doesn't reach them.
+        """
+        self.abort("interrupted")
+        await asyncio.gather(*[proc.wait() for proc in self._procs])
+        self._reap_groups(self._procs)
+
+    def run(self, controller, tasks=()):
+        """Synchronous wrapper around supervise(), stopping every process if it's interrupted"""
+        return run_coroutine(
+            self.supervise(controller, list(tasks)), self._interrupted)
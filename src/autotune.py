@@ -0,0 +1,298 @@
+"""
+This module tunes the fork-join worker counts of the three tiers
+(specjbb.forkjoin.workers.Tier1..3) of a run by searching for the counts
+with the best max-jOPS (or critical-jOPS), instead of sweeping every
+combination.
+
+The search is a coordinate descent over the integer tier counts: from the
+run's own counts it tries a step up and a step down along each tier, moves
+whenever that's better by more than the noise of a run ('min_gain'), and
+halves the steps when no move helps, until the steps are down to nothing or
+the run budget is spent.
+
+Every trial (the tiers tried and the resulting jOPS) is appended to a
+journal as soon as its run finishes. The search is deterministic, so when
+it's started again with the same journal it walks the same path, taking
+the results of trials it already has from the journal, and carries on from
+where it stopped.
+"""
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+
+from src import catalog
+from src.benchmark_run import SpecJBBRun
+from src.run_generator import RunGenerator
+
+log = logging.getLogger(__name__)
+
+# the props tuned, in order
+TIER_PROPS = [
+    'specjbb.forkjoin.workers.Tier1', 'specjbb.forkjoin.workers.Tier2',
+    'specjbb.forkjoin.workers.Tier3'
+]
+# the results a search can maximize
+TARGETS = ['max_jops', 'critical_jops']
+
+"""
+tiers: the worker counts of the tiers, in the order of TIER_PROPS
+tag: the tag (and results directory) of the trial's run
+exit_code: the run's exit code in the results catalog, None if it wasn't recorded
+max_jops, critical_jops: the run's results, None when missing
+finished: when the run finished, seconds since the epoch
+"""
+Trial = namedtuple(
+    'Trial',
+    ['tiers', 'tag', 'exit_code', 'max_jops', 'critical_jops', 'finished'])
+
+
+class Journal:
+    """
+    The trials of a search, kept in a file of one JSON object per line.
+    Trials are appended (and flushed) one at a time, so a search that's killed loses at most the run in progress.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.trials = {}
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                try:
+                    trial = Trial(**json.loads(line))
+                except (ValueError, TypeError):
+                    # a line cut short when the search was killed
+                    log.warning("skipping a broken line of {}".format(path))
+                    continue
+                trial = trial._replace(tiers=tuple(trial.tiers))
+                self.trials[trial.tiers] = trial
+
+    def __len__(self):
+        return len(self.trials)
+
+    def get(self, tiers):
+        """Returns the Trial of 'tiers', or None if they weren't tried"""
+        return self.trials.get(tuple(tiers))
+
+    def add(self, trial, save=True):
+        """Records 'trial', replacing any earlier trial of its tiers. Unless 'save', it's only kept in memory."""
+        trial = trial._replace(tiers=tuple(trial.tiers))
+        self.trials[trial.tiers] = trial
+        if not save:
+            return
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(trial._asdict()) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def coordinate_descent(start, low, high, min_gain=0.01):
+    """
+    Searches for the integer point between 'low' and 'high' (inclusive, per coordinate)
+    with the highest value, starting from 'start'.
+    It's a generator: it yields the points to try, and is sent the value of each
+    (None for a point that couldn't be measured). It returns when the search has converged.
+    :param min_gain: How much better (a fraction) a point has to be to move to it
+    """
+    def clip(i, value):
+        return max(low[i], min(high[i], value))
+
+    x = tuple(clip(i, v) for i, v in enumerate(start))
+    fx = yield x
+    steps = [max(1, v // 2) for v in x]
+
+    def better(fy):
+        return fy is not None and (fx is None or fy > fx * (1 + min_gain))
+
+    while any(steps):
+        moved = False
+        for i in range(len(x)):
+            if not steps[i]:
+                continue
+            for direction in (1, -1):
+                y = x[:i] + (clip(i, x[i] + direction * steps[i]), ) + x[i + 1:]
+                if y == x:
+                    continue
+                fy = yield y
+                if better(fy):
+                    x, fx, moved = y, fy, True
+                    break
+        if not moved:
+            steps = [s // 2 for s in steps]
+
+
+def tier_args(template):
+    """
+    Returns the args of 'template' that translate to TIER_PROPS, in their order.
+    Raises an Exception if the template doesn't have all three.
+    """
+    translations = template.get("translations", {})
+    args = {prop: arg for arg, prop in translations.items()}
+    missing = [prop for prop in TIER_PROPS if prop not in args]
+    if missing:
+        raise Exception(
+            "template has no arguments translating to {}".format(missing))
+    return [args[prop] for prop in TIER_PROPS]
+
+
+def execute_run(run, dry_run=False, engine="pool", admission="off"):
+    """
+    Executes a run of RunGenerator.runs with SpecJBBRun, and looks its results up in the results catalog.
+    :return: (exit code, max-jOPS, critical-jOPS), None for each of them that isn't known
+    """
+    s = SpecJBBRun(**run)
+    s.run(dry_run, engine, admission=admission)
+    path = os.path.join(s.cwd, catalog.DEFAULT_NAME)
+    if dry_run or not os.path.exists(path):
+        return None, None, None
+    with catalog.Catalog(path) as c:
+        rows = c.under(os.path.abspath(os.path.join(s.cwd, str(s.run_id))))
+    return combine(rows)
+
+
+def combine(rows):
+    """
+    Returns the result of a trial from the catalog rows of its runs (one per 'times'):
+    (exit code, max-jOPS, critical-jOPS), the first non-zero exit code of a run (0 if they all completed),
+    and the means of the jOPS of the runs that completed. None for each of them that isn't known.
+    """
+    if not rows:
+        return None, None, None
+    failed = [r["exit_code"] for r in rows if r["exit_code"] not in (0, None)]
+    completed = [r for r in rows if r["exit_code"] == 0]
+
+    def mean(column):
+        values = [r[column] for r in completed if r[column] is not None]
+        return sum(values) / len(values) if values else None
+
+    if failed:
+        exit_code = failed[0]
+    elif completed:
+        exit_code = 0
+    else:
+        exit_code = None
+    return exit_code, mean("max_jops"), mean("critical_jops")
+
+
+class Autotuner:
+    """
+    Tunes the tiers of one RunList entry of a Tate config (see the module's documentation).
+    """
+
+    def __init__(self,
+                 TemplateData,
+                 run,
+                 journal,
+                 target="max_jops",
+                 budget=20,
+                 low=1,
+                 high=None,
+                 min_gain=0.01,
+                 execute=execute_run):
+        """
+        :param TemplateData: The templates of the config
+        :param run: The RunList entry tuned, its template needs args translating to TIER_PROPS
+        :param journal: A Journal, or the path of one
+        :param target: One of TARGETS
+        :param budget: The most runs this search executes (trials already in the journal are free)
+        :param low: The fewest workers a tier gets
+        :param high: The most workers a tier gets, a list per tier or one for all of them.
+            Defaults to four times the run's count, or four per CPU, whichever is more.
+        :param min_gain: How much better (a fraction of 'target') a move has to be, for runs to not chase noise
+        :param execute: Called with a run of RunGenerator.runs to execute it, returns (exit code, max-jOPS, critical-jOPS)
+        """
+        if target not in TARGETS:
+            raise Exception("unrecognized target '{}', must be one of {}".format(
+                target, TARGETS))
+        self.templates = TemplateData
+        self.run = run
+        self.args = tier_args(TemplateData[run["template_type"]])
+        self.journal = journal if isinstance(journal,
+                                             Journal) else Journal(journal)
+        self.target = target
+        self.budget = budget
+        self.start = tuple(
+            int(self._default(run, arg, prop))
+            for arg, prop in zip(self.args, TIER_PROPS))
+        self.low = [low] * len(TIER_PROPS)
+        if high is None:
+            high = [max(4 * s, 4 * (os.cpu_count() or 1)) for s in self.start]
+        elif not isinstance(high, (list, tuple)):
+            high = [high] * len(TIER_PROPS)
+        self.high = list(high)
+        self.min_gain = min_gain
+        self.execute = execute
+        # runs executed by this search
+        self.spent = 0
+
+    def _default(self, run, arg, prop):
+        """
+        Called internally only.  The count 'run' gives the tier of 'arg' (translating to 'prop'),
+        falling back to the template's default for it.
+        """
+        if arg in run["args"]:
+            return run["args"][arg]
+        options = self.templates[run["template_type"]].get("prop_options", {})
+        for name in (arg, prop):
+            if name in options:
+                return options[name]
+        raise Exception(
+            "no count for the tier {} in the run or its template".format(arg))
+
+    def trial(self, tiers):
+        """Returns the Trial of 'tiers', from the journal, or by executing a run and adding it to the journal"""
+        trial = self.journal.get(tiers)
+        if trial is not None:
+            return trial
+        entry = dict(self.run, args=dict(self.run["args"]))
+        entry.update(tag="{}-T1-{}-T2-{}-T3-{}".format(
+            self.run.get("tag", "autotune"), *tiers))
+        entry["args"].update(zip(self.args, tiers))
+        entry.pop("sweep", None)
+        run = next(RunGenerator(self.templates, [entry]).runs)
+        log.info("trial {} of {}: tiers {}".format(self.spent + 1, self.budget,
+                                                   tiers))
+        exit_code, max_jops, critical_jops = self.execute(run)
+        self.spent += 1
+        trial = Trial(tiers, entry["tag"], exit_code, max_jops, critical_jops,
+                      time.time())
+        # nothing was measured (a dry run, or the run wasn't recorded), try it again next time
+        self.journal.add(trial, save=exit_code is not None
+                         or max_jops is not None)
+        return trial
+
+    def value(self, trial):
+        """Returns the value of 'trial' being maximized, None if its run failed"""
+        if trial.exit_code not in (0, None):
+            return None
+        return getattr(trial, self.target)
+
+    def best(self):
+        """Returns the Trial in the journal with the best value, or None"""
+        trials = [
+            t for t in self.journal.trials.values()
+            if self.value(t) is not None
+        ]
+        return max(trials, key=self.value) if trials else None
+
+    def tune(self):
+        """
+        Searches until it converges or the budget is spent.
+        :return: The best Trial, None if no trial succeeded
+        """
+        search = coordinate_descent(self.start, self.low, self.high,
+                                    self.min_gain)
+        tiers = next(search)
+        try:
+            while True:
+                if self.journal.get(tiers) is None and self.spent >= self.budget:
+                    log.info("run budget of {} spent".format(self.budget))
+                    break
+                tiers = search.send(self.value(self.trial(tiers)))
+        except StopIteration:
+            log.info("search converged after {} trials".format(
+                len(self.journal)))
+        return self.best()
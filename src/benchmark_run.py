@@ -6,12 +6,19 @@ with logging and error handling included.
 
 import os
 import shutil
+import signal
+import time
+from io import StringIO
 from multiprocessing import Pool
 from uuid import uuid4
 import logging
 import configparser
 
 from src.task_runner import TaskRunner
+from src.async_supervisor import AsyncSupervisor, task_name
+from src.supervisor import ProcessSupervisor
+from src.admission import AdmissionController, HostResources, JvmSet, RunDemand, parse_jvm_options
+from src import affinity, catalog, fingerprint, rollup, rt_monitor, topology
 from src.validate import random_run_id
 from src.compliant import compliant
 
@@ -38,8 +45,26 @@ def do(task):
     this function needs to be pickle-able for `Pool.map` to be able to use it.
     """
     log.debug("starting task {}".format(task))
-    task.run()
+    try:
+        task.run()
+    except BaseException:
+        # the worker was interrupted or terminated (see _terminated), the task's
+        # process group is a session of its own, so it has to be stopped here
+        task.stop()
+        raise
     log.debug("finished task {}".format(task))
+    proc = getattr(task, "proc", None)
+    return proc.returncode if proc is not None else None
+
+
+def _terminated(signum, frame):
+    """Called internally only.  Turns the SIGTERM of Pool.terminate() into an exception `do` cleans up after"""
+    raise SystemExit(128 + signum)
+
+
+def _pool_worker():
+    """Called internally only.  Initializes the Pool workers of a run"""
+    signal.signal(signal.SIGTERM, _terminated)
 
 
 def do_dry(task):
@@ -104,6 +129,17 @@ SpecJBBComponentTypes = [
 ]
 
 
+"""
+These are the ways SpecJBBRun can execute the JVMs of a run:
+    - pool: a multiprocessing.Pool worker blocks on each JVM
+    - asyncio: one event loop supervises every JVM (see src.async_supervisor)
+"""
+SpecJBBEngines = [
+    "pool",
+    "asyncio",
+]
+
+
 class SpecJBBComponentOptions(dict):
     """
     A helper class for SpecJBBRun that provides a way to set defaults,
@@ -178,7 +214,12 @@ class SpecJBBRun:
                  tag=None,
                  times=1,
                  props={},
-                 props_file='specjbb2015.props'):
+                 props_file='specjbb2015.props',
+                 cpus=0,
+                 numa_nodes=1,
+                 binding="node",
+                 memory_policy="local",
+                 abort_policy=None):
         """
         Initialize a SpecJBBRun.
 
@@ -190,6 +231,11 @@ class SpecJBBRun:
             jar: The relative or absolute path to the specjbb2015.jar file.
             props: The props that will be passed to the props file generated for this run. Keys look like ("com.spec.prop": "value").
             props_file: The relative or absolute path to the specjbb2015.props file that will be generated for this particular run.
+            cpus: How many CPUs this run needs when runs execute in parallel (see src.scheduler). 0 means an equal share.
+            numa_nodes: How many NUMA nodes to spread the groups (a backend and its injectors) across (see src.topology).
+            binding: How groups are bound to their CPUs, one of src.affinity.BindingModes.
+            memory_policy: Where the memory of bound groups comes from, one of src.affinity.MemoryPolicies.
+            abort_policy: When to abort the run while it's running, the settings of a src.rt_monitor.AbortPolicy. Needs the "asyncio" engine.
         """
         if None in [java, jar] or not isinstance(jar, str):
             raise InvalidRunConfigurationException
@@ -199,6 +245,14 @@ class SpecJBBRun:
         self.times = times
         self.props = props
         self.props_file = props_file
+        self.cpus = cpus
+        self.numa_nodes = numa_nodes
+        self.binding = binding
+        self.memory_policy = memory_policy
+        self.abort_policy = abort_policy
+        # why a repetition of the last run was aborted, None if none was
+        self.aborted = None
+        self._fingerprint = None
         self.run_id = tag if tag else random_run_id()
         self.log = logging.LoggerAdapter(log, {'run_id': self.run_id})
 
@@ -230,10 +284,12 @@ class SpecJBBRun:
         self.backends = SpecJBBComponentOptions("backend", rest=backends)
         self.injectors = SpecJBBComponentOptions("txinjector", rest=injectors)
 
-    def _generate_tasks(self):
+    def _generate_tasks(self, cpus=None, **popen_kw):
         """
         Generator that yields TaskRunners for the backends and injectors
         with the correct JVM and SPECjbb2015 arguments for this particular run.
+        `cpus` limits the CPUs groups are bound to (see self.binding_plan).
+        `popen_kw` is passed on to every TaskRunner.
         """
         if self.controller["type"] == "composite":
             return
@@ -241,12 +297,23 @@ class SpecJBBRun:
         self.log.info("generating {} groups, each with {} transaction injectors"
                       .format(self.backends["count"], self.injectors["count"]))
 
-        for _ in range(self.backends["count"]):
+        plan = self.binding_plan(cpus)
+
+        for g in range(self.backends["count"]):
             group_id = uuid4().hex
             backend_jvm_id = uuid4().hex
+            bind = []
+            backend_kw = dict(popen_kw)
+            injector_kw = dict(popen_kw)
+            if plan is not None and self.binding == "numactl":
+                bind = plan[g].numactl()
+            elif plan is not None:
+                backend_kw["preexec_fn"] = plan[g].backend
+                injector_kw["preexec_fn"] = plan[g].injectors
             self.log.debug("constructing group {}".format(group_id))
-            yield TaskRunner(*self.backend_run_args(), '-G={}'.format(group_id),
-                             '-J={}'.format(backend_jvm_id))
+            yield TaskRunner(*bind, *self.backend_run_args(),
+                             '-G={}'.format(group_id),
+                             '-J={}'.format(backend_jvm_id), **backend_kw)
 
             self.log.debug(
                 "constructing injectors for group {}".format(group_id))
@@ -256,50 +323,148 @@ class SpecJBBRun:
                 self.log.debug(
                     "preparing injector in group {} with jvmid={}".format(
                         group_id, ti_jvm_id))
-                yield TaskRunner(*self.injector_run_args(),
+                yield TaskRunner(*bind, *self.injector_run_args(),
                                  '-G={}'.format(group_id),
-                                 '-J={}'.format(ti_jvm_id))
+                                 '-J={}'.format(ti_jvm_id), **injector_kw)
 
-    def run(self, dry_run=False):
+    def run(self, dry_run=False, engine="pool", slot=None, admission="off"):
         """
         Sets up the results directory, and executes the configured
         runs based on self.
         `dry_run` sets whether or not to actually run the JVMs associated with
         this run.
+        `engine` is one of SpecJBBEngines, and picks how the JVMs are executed.
+        `slot` is the src.scheduler.RunSlot (CPUs and controller port) this run
+        was given when runs execute in parallel.
+        `admission` is one of src.admission.AdmissionPolicies, and decides what
+        happens when this run doesn't fit on this host.
+        Returns False if the run was refused.
         """
+        if engine not in SpecJBBEngines:
+            raise Exception("unrecognized engine '{}', must be one of {}".format(
+                engine, SpecJBBEngines))
+        if self.abort_policy and engine != "asyncio":
+            self.log.warning(
+                "abort_policy is ignored, only the asyncio engine follows the controller's output")
+
+        cpus = len(slot.cpus) if slot is not None and slot.cpus else None
+        controller = AdmissionController(
+            admission,
+            read_host=lambda: HostResources.read(cpus=cpus),
+            own_cpus=cpus is not None)
+        demand, decision = None, None
+        if controller.policy != "off":
+            # the JVM options are only read when there's something to decide
+            demand = self.demand()
+            decision = controller.check(
+                demand) if dry_run else controller.admit(demand)
+        props, backends = self.props, self.backends
+        try:
+            return self._admitted(decision, demand, dry_run, engine, slot)
+        finally:
+            # what the run reserved is free for other runs once it's finished
+            controller.release(decision)
+            if self.backends is not backends:
+                # a shrunk run is its full size again, the next time it's run
+                self.props, self.backends = props, backends
+                self._fingerprint = None
+
+    def _admitted(self, decision, demand, dry_run, engine, slot):
+        """Called internally only.  The rest of run(), once 'decision' was made (None when admission is off)"""
+        if decision is None:
+            pass
+        elif not decision.admit:
+            self.log.error("run refused: {}".format(decision.reason))
+            if not dry_run:
+                return False
+        elif decision.groups != demand.groups:
+            self.log.warning("run shrunk: {}".format(decision.reason))
+            # the controller waits for as many groups as the props file says,
+            # and every group starts its backend and injectors
+            self.props = dict(self.props)
+            self.props["specjbb.group.count"] = decision.groups
+            self.backends = SpecJBBComponentOptions(
+                "backend",
+                dict(self.backends, count=self.props["specjbb.group.count"]))
+            # it no longer executes what it was fingerprinted as
+            self._fingerprint = None
 
         results_directory = os.path.join(self.cwd, str(self.run_id))
 
         self.log.debug("set run directory to {}".format(results_directory))
 
         if dry_run:
-            return self._run(dry_run)
+            return self._run(dry_run, engine, slot=slot)
         else:
             try:
                 self.log.debug(
                     "attempting to create results directory {}".format(
                         results_directory))
                 os.mkdir(results_directory)
-            except os.FileExistsError:
+            except FileExistsError:
                 self.log.error(
                     "run results directory already existed, continuing")
 
-            os.chdir(results_directory)
-
+            self.aborted = None
+            started = time.time()
+            failed = {}
+            # the JVMs are started in the results directory, rather than
+            # changing ours, so other runs can execute at the same time
             try:
                 for number_of_times in range(self.times):
                     self.log.debug("beginning run {}/{}".format(
                         number_of_times, self.times))
-                    self._run(dry_run)
+                    failed.update(
+                        self._run(dry_run, engine, results_directory, slot))
             except Exception as e:
                 self.log.error(
                     "exception: {}, removing results directory".format(e))
                 shutil.rmtree(results_directory)
-            finally:
-                self.log.info("returning to {}".format(self.cwd))
-                os.chdir(self.cwd)
+                return
+            if self.aborted is not None:
+                exit_code = -1
+            elif failed:
+                exit_code = failed.get("controller",
+                                       next(iter(failed.values())))
+            else:
+                exit_code = 0
+            self.record(results_directory, slot, exit_code,
+                        time.time() - started)
 
-    def _run(self, dry_run=False):
+    def record(self, results_directory, slot=None, exit_code=0, duration=None):
+        """
+        Records this (finished) run in the results catalog in self.cwd (see src.catalog).
+        `exit_code` is 0 for a run that completed, -1 for one that was aborted,
+        and the exit code of a JVM that failed (the controller's first) otherwise.
+        `duration` is how long it took, in seconds.
+        A run that can't be recorded is logged, not failed.
+        """
+        props = dict(self.props)
+        cpus = None
+        if slot is not None:
+            props["specjbb.controller.port"] = slot.port
+            cpus = slot.cpus
+        topo = {
+            "groups": self.backends["count"],
+            "numa_nodes": self.numa_nodes,
+            "binding": self.binding,
+            "cpus": cpus,
+        }
+        path = os.path.join(self.cwd, catalog.DEFAULT_NAME)
+        try:
+            with catalog.Catalog(path) as c:
+                c.record(os.path.abspath(results_directory), self.run_id,
+                         self.controller["type"],
+                         fingerprint.jdk_version(self.java["path"]),
+                         self.java["options"], props, topo, exit_code,
+                         analysis=rollup.analyze_run(results_directory),
+                         fingerprint=self.fingerprint(),
+                         duration=duration,
+                         java=self.java["path"])
+        except Exception as e:
+            self.log.error("failed to record run in {}: {}".format(path, e))
+
+    def _run(self, dry_run=False, engine="pool", cwd=None, slot=None):
         """
         Executes this particular SpecJBBRun by:
             - writing the props file for this run at self.props_file
@@ -307,53 +472,202 @@ class SpecJBBRun:
             - setting up the transaction injectors and backends and running their tasks
             - emmitting "done" messages when finished
         `dry_run` set to True will commit all of these changes.
+        `engine` picks how the JVMs are executed (see SpecJBBEngines).
+        `cwd` is the directory the props file is written to and the JVMs run in.
+        `slot` pins the JVMs to its CPUs and the controller to its port.
+        Every JVM is started in its own process group, so stopping it also
+        stops anything it started.
+        Returns a dict of process name => exit code of the JVMs that failed
+        (exited non-zero without being stopped).
         """
+        props = dict(self.props)
+        popen_kw = ProcessSupervisor.popen_kw()
+        if cwd:
+            popen_kw["cwd"] = cwd
+        if slot is not None:
+            props["specjbb.controller.port"] = slot.port
+            if slot.preexec_fn() is not None:
+                popen_kw["preexec_fn"] = slot.preexec_fn()
+
         # write props file (or ensure it exists)
         if dry_run:
             self.log.info("DRY: run would write following props:")
-            if not self.props:
+            if not props:
                 self.log.info("DRY: (none provided)")
-            for name, value in self.props.items():
+            for name, value in props.items():
                 self.log.info("DRY: name: {}, value({}): {}".format(
                     name, type(value), value))
         else:
-            with open(self.props_file, 'w+') as props_file:
-                c = configparser.ConfigParser()
-                c.read_dict({'SPECtate': self.props})
-                c.write(props_file)
+            with open(os.path.join(cwd or "", self.props_file),
+                      'w+') as props_file:
+                props_file.write(self.props_text(props))
+
+        cpus = slot.cpus if slot is not None else None
+        if dry_run:
+            plan = self.binding_plan(cpus)
+            if plan is None:
+                self.log.info("DRY: groups won't be bound to NUMA nodes")
+            else:
+                self.log.info("DRY: groups would be bound to NUMA nodes:")
+                for line in affinity.describe(plan):
+                    self.log.info("DRY: {}".format(line))
 
         # setup jvms
         # we first need to setup the controller
-        c = TaskRunner(*self.controller_run_args())
+        c = TaskRunner(*self.controller_run_args(), **popen_kw)
         self.dump()
 
+        if engine == "asyncio" and not dry_run:
+            return self._run_async(c, popen_kw, cpus)
+
         if self.controller["type"] == "composite":
             self.log.info("begin composite benchmark")
             if dry_run:
                 self.log.info("DRY: run would invoke following controller:")
                 self.log.info("DRY: {}".format(c))
-            else:
-                c.run()
+                return {}
+            c.run()
             self.log.info("done")
-            return
+            return self._failed({"controller": c.proc.returncode})
 
         c.start()
 
-        tasks = [task for task in self._generate_tasks()]
-        pool = Pool(processes=len(tasks))
+        tasks = [task for task in self._generate_tasks(cpus, **popen_kw)]
+        pool = Pool(processes=len(tasks), initializer=_pool_worker)
 
         self.dump()
 
         # run benchmark
         self.log.info("begin benchmark")
 
-        if dry_run:
-            pool.map(do_dry, tasks)
-        else:
-            pool.map(do, tasks)
+        exit_codes = {}
+        try:
+            if dry_run:
+                pool.map(do_dry, tasks)
+            else:
+                exit_codes = dict(
+                    zip((task_name(t, i) for i, t in enumerate(tasks)),
+                        pool.map(do, tasks)))
+            pool.close()
+        except BaseException:
+            # e.g. Ctrl+C, which doesn't reach the JVMs' own sessions,
+            # every worker stops the group of its backend or injector
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            # a controller that's still running is stopped, which isn't a failure
+            if c.proc.poll() is not None:
+                exit_codes["controller"] = c.proc.returncode
+            # the next run can't start while the controller is still running
+            if not c.stop():
+                raise Exception(
+                    "controller of run {} is still running".format(
+                        self.run_id))
+        self.log.info("done")
+        return self._failed(exit_codes)
+
+    def _failed(self, exit_codes):
+        """Called internally only.  Returns (and logs) the exit codes of 'exit_codes' that aren't 0"""
+        failed = {
+            name: code
+            for name, code in exit_codes.items() if code not in (0, None)
+        }
+        if failed:
+            self.log.error("processes exited abnormally: {}".format(failed))
+        return failed
+
+    def _run_async(self, controller, popen_kw={}, cpus=None):
+        """
+        Runs the controller and every backend and injector of this run
+        from a single asyncio event loop, logging their output as it arrives.
+        Returns a dict of process name => exit code of the processes that failed
+        (exited non-zero without being stopped).
+        """
+        tasks = [task for task in self._generate_tasks(cpus, **popen_kw)]
+
+        self.log.info("begin {} benchmark with {} agents".format(
+            self.controller["type"], len(tasks)))
+
+        monitor = rt_monitor.RtMonitor(
+            rt_monitor.policy(
+                self.abort_policy,
+                os.path.join(self.cwd, catalog.DEFAULT_NAME),
+                tag=self.run_id))
+
+        def handle(name, line):
+            self.log.info("{}: {}".format(name, line.rstrip()))
+            if name == "controller" and monitor.line(line) is not None:
+                self.log.debug("RT curve: {}".format(monitor.status()))
+                if monitor.abort is not None:
+                    supervisor.abort(monitor.abort)
+
+        supervisor = AsyncSupervisor(handle=handle, logger=self.log)
+        supervisor.run(controller, tasks)
+        if supervisor.aborted is not None:
+            self.aborted = supervisor.aborted
+            self.log.error("run aborted: {} ({})".format(
+                self.aborted, monitor.status()))
 
-        c.stop()
         self.log.info("done")
+        return self._failed(supervisor.failed)
+
+    def binding_plan(self, cpus=None):
+        """
+        Returns the src.affinity plan spreading this run's groups across
+        (up to self.numa_nodes) NUMA nodes, or None when they won't be bound.
+        'core' binding also applies inside a single node.
+        `cpus` limits the CPUs handed out (e.g. to those of a RunSlot).
+        """
+        if self.controller["type"] == "composite":
+            return None
+        topo = topology.topology()
+        if self.binding != "core" and (self.numa_nodes <= 1
+                                       or len(topo.usable()) <= 1):
+            return None
+        if self.binding == "numactl" and not topology.numactl_available():
+            return None
+        return affinity.affinity_plan(topo, self.backends["count"],
+                                      self.numa_nodes, self.binding,
+                                      self.memory_policy, cpus)
+
+    def demand(self):
+        """
+        Returns the src.admission.RunDemand of the JVMs this run starts,
+        where a group is a backend and its injectors.
+        """
+
+        def footprint(options_dict):
+            return parse_jvm_options(self.java["options"] +
+                                     options_dict.get("jvm_opts", []))
+
+        controller_type = self.controller["type"]
+        if controller_type == "composite":
+            return RunDemand(
+                [JvmSet("composite", 1, footprint(self.controller))])
+        return RunDemand([
+            JvmSet("controller", 1, footprint(self.controller)),
+            JvmSet("backend", 1, footprint(self.backends), per_group=True),
+            JvmSet(
+                "txinjector",
+                self.injectors["count"],
+                footprint(self.injectors),
+                per_group=True),
+        ], self.backends["count"])
+
+    def props_text(self, props):
+        """Returns the contents of the props file of 'props'"""
+        c = configparser.ConfigParser()
+        c.read_dict({'SPECtate': props})
+        text = StringIO()
+        c.write(text)
+        return text.getvalue()
+
+    def fingerprint(self):
+        """Returns the fingerprint of this run, see src.fingerprint"""
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint.fingerprint(self)
+        return self._fingerprint
 
     def dump(self, level=logging.DEBUG):
         """
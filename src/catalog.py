@@ -0,0 +1,423 @@
+"""
+This module keeps a catalog of finished runs in a local SQLite database,
+so runs can be found by their configuration and results without going
+through every result directory.
+
+Each run is one row of 'runs' (where its results are, its tag, JDK (what
+'java -version' printed, so runs can be told apart by JDK wherever it's
+installed), topology, jOPS and failure point), with the props it set in 'props',
+its JVM flags in 'flags' and the GC summary of its steady state in 'gc'.
+Props and flags are indexed by name and value, so a query like
+"HBIR_RT runs with ParallelGCThreads=48" is a couple of index lookups.
+
+Every run also gets the key of its configuration (see config_key), and
+'baselines' keeps the running count, sum and sum of squares of the
+BASELINE_METRICS of the successful runs of each configuration, updated as
+runs are recorded, so comparing a run to its history (see src.compare)
+doesn't read the history.
+
+Runs recorded with their fingerprint (see src.fingerprint) and duration
+can be looked up by fingerprint, so a run identical to one that already
+completed can be skipped.
+"""
+import hashlib
+import json
+import math
+import os
+import platform
+import re
+import shlex
+import sqlite3
+import time
+
+from src import gc_log
+from src.topology import format_cpulist
+
+# the name of the catalog, kept next to the results trees it describes
+DEFAULT_NAME = 'results.db'
+
+_GC_FIELDS = [f for f in gc_log.GcSummary._fields if f not in ('start', 'end')]
+
+# props that differ between repeats of one configuration
+VOLATILE_PROPS = ['specjbb.controller.port']
+
+"""
+The metrics baselines are kept for: (name, table, column, whether higher is better)
+"""
+BASELINE_METRICS = [
+    ('max_jops', 'runs', 'max_jops', True),
+    ('critical_jops', 'runs', 'critical_jops', True),
+    ('gc_avg', 'gc', 'avg', False),
+    ('gc_pct', 'gc', 'pct', False),
+    ('gc_major_avg', 'gc', 'major_avg', False),
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    host TEXT,
+    tag TEXT,
+    run_type TEXT,
+    jdk TEXT,
+    jvm_options TEXT,
+    finished REAL,
+    exit_code INTEGER,
+    groups INTEGER,
+    numa_nodes INTEGER,
+    binding TEXT,
+    cpus TEXT,
+    max_jops INTEGER,
+    critical_jops INTEGER,
+    hbir_settled INTEGER,
+    hbir_attempted INTEGER,
+    failure_point INTEGER,
+    steady_start INTEGER,
+    steady_end INTEGER,
+    config TEXT,
+    fingerprint TEXT,
+    duration REAL,
+    java TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS runs_path ON runs (path);
+CREATE INDEX IF NOT EXISTS runs_tag ON runs (tag);
+CREATE INDEX IF NOT EXISTS runs_run_type ON runs (run_type);
+CREATE INDEX IF NOT EXISTS runs_jdk ON runs (jdk);
+CREATE INDEX IF NOT EXISTS runs_finished ON runs (finished);
+CREATE INDEX IF NOT EXISTS runs_config ON runs (config);
+CREATE INDEX IF NOT EXISTS runs_fingerprint ON runs (fingerprint);
+CREATE TABLE IF NOT EXISTS props (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS props_lookup ON props (name, value);
+CREATE TABLE IF NOT EXISTS flags (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS flags_lookup ON flags (name, value);
+CREATE TABLE IF NOT EXISTS gc (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (id) ON DELETE CASCADE,
+{}
+);
+CREATE TABLE IF NOT EXISTS baselines (
+    config TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    total REAL NOT NULL,
+    squares REAL NOT NULL,
+    PRIMARY KEY (config, metric)
+) WITHOUT ROWID;
+""".format(",\n".join("    {} REAL".format(f) for f in _GC_FIELDS))
+
+_HEAP = re.compile(r'^-X(mx|ms|mn|ss)(.+)$')
+
+
+def parse_flags(jvm_options):
+    """
+    Splits JVM options (a string or a list) into (name, value) pairs:
+    '-XX:+UseG1GC' => ('UseG1GC', 'true'), '-XX:ParallelGCThreads=48' => ('ParallelGCThreads', '48'),
+    '-Xmx4g' => ('Xmx', '4g'), '-Dkey=value' => ('Dkey', 'value'), anything else => (option, '')
+    """
+    if isinstance(jvm_options, str):
+        jvm_options = shlex.split(jvm_options)
+    flags = []
+    for opt in jvm_options:
+        if opt.startswith('-XX:+') or opt.startswith('-XX:-'):
+            flags.append((opt[5:], 'true' if opt[4] == '+' else 'false'))
+        elif opt.startswith('-XX:'):
+            name, _, value = opt[4:].partition('=')
+            flags.append((name, value))
+        elif _HEAP.match(opt):
+            m = _HEAP.match(opt)
+            flags.append(('X' + m.group(1), m.group(2)))
+        else:
+            name, _, value = opt.lstrip('-').partition('=')
+            flags.append((name, value))
+    return flags
+
+
+def configuration(run_type, jvm_options, groups, numa_nodes, binding, props):
+    """
+    Returns a configuration: how it runs and its props (without VOLATILE_PROPS), as a dict.
+    The JDK and the host aren't part of it, so runs before and after an update of either share it.
+    """
+    return {
+        'run_type': run_type,
+        'jvm_options': jvm_options,
+        'groups': _int(groups),
+        'numa_nodes': _int(numa_nodes),
+        'binding': binding,
+        'props': {
+            name: str(value)
+            for name, value in (props or {}).items()
+            if name not in VOLATILE_PROPS
+        }
+    }
+
+
+def config_key(run_type, jvm_options, groups, numa_nodes, binding, props):
+    """Returns the key of a configuration (see configuration): a digest of it"""
+    config = configuration(run_type, jvm_options, groups, numa_nodes, binding,
+                           props)
+    text = json.dumps(config, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _real(value):
+    return None if value is None or math.isnan(value) else float(value)
+
+
+class Catalog:
+    """
+    A results catalog stored at 'path' (created if it doesn't exist).
+    Can be used as a context manager, which closes it.
+    """
+
+    def __init__(self, path=DEFAULT_NAME):
+        self.path = path
+        # several runs may finish (and record) at the same time
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA foreign_keys = ON")
+        with self.db:
+            self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self,
+               path,
+               tag="",
+               run_type="",
+               jdk="",
+               jvm_options="",
+               props=None,
+               topology=None,
+               exit_code=None,
+               analysis=None,
+               finished=None,
+               fingerprint=None,
+               duration=None,
+               java=None):
+        """
+        Records a finished run, replacing any earlier record of 'path'.
+        :param path: The run's result directory
+        :param run_type: How the run was executed (composite, multi, ...)
+        :param jdk: What 'java -version' printed for the run's java (see src.fingerprint.jdk_version)
+        :param props: The props the run set (what its props file holds, SPECjbb's defaults apply to the others), name => value
+        :param topology: A dict with the 'groups', 'numa_nodes', 'binding' and 'cpus' (list) of the run
+        :param analysis: The src.rollup.RunAnalysis of the run's results, if any
+        :param finished: When the run finished (seconds since the epoch), defaults to now
+        :param fingerprint: The run's src.fingerprint, if known
+        :param duration: How long the run took, in seconds, if known
+        :param java: The path of the run's java
+        :return: The id of the run
+        """
+        topology = topology or {}
+        ir = analysis.ir if analysis else []
+        ir = [_int(v) for v in ir] + [None] * (4 - len(ir))
+        controller = analysis.controller if analysis else None
+        if not isinstance(jvm_options, str):
+            jvm_options = " ".join(jvm_options)
+        cpus = topology.get('cpus')
+        config = config_key(run_type, jvm_options, topology.get('groups'),
+                            topology.get('numa_nodes'),
+                            topology.get('binding'), props)
+        with self.db:
+            old = self.db.execute("SELECT id FROM runs WHERE path = ?",
+                                  (path, )).fetchone()
+            if old is not None:
+                self._count(old['id'], -1)
+                self.db.execute("DELETE FROM runs WHERE id = ?", (old['id'], ))
+            cur = self.db.execute(
+                "INSERT INTO runs (path, host, tag, run_type, jdk, jvm_options, finished, "
+                "exit_code, groups, numa_nodes, binding, cpus, max_jops, critical_jops, "
+                "hbir_settled, hbir_attempted, failure_point, steady_start, steady_end, config, "
+                "fingerprint, duration, java) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, platform.node(), tag, run_type, jdk, jvm_options,
+                 finished if finished is not None else time.time(),
+                 exit_code, _int(topology.get('groups')),
+                 _int(topology.get('numa_nodes')), topology.get('binding'),
+                 format_cpulist(cpus) if cpus else None, ir[0], ir[1],
+                 ir[2], ir[3],
+                 controller.first_failure if controller else None,
+                 controller.start if controller else None,
+                 controller.end if controller else None, config, fingerprint,
+                 duration, java))
+            run_id = cur.lastrowid
+            self.db.executemany(
+                "INSERT INTO props (run_id, name, value) VALUES (?, ?, ?)",
+                [(run_id, name, str(value))
+                 for name, value in (props or {}).items()])
+            self.db.executemany(
+                "INSERT OR REPLACE INTO flags (run_id, name, value) VALUES (?, ?, ?)",
+                [(run_id, name, value)
+                 for name, value in parse_flags(jvm_options)])
+            if analysis is not None and analysis.gc is not None:
+                self.db.execute(
+                    "INSERT INTO gc (run_id, {}) VALUES (?{})".format(
+                        ", ".join(_GC_FIELDS), ", ?" * len(_GC_FIELDS)),
+                    [run_id] + [
+                        _real(getattr(analysis.gc, f)) for f in _GC_FIELDS
+                    ])
+            self._count(run_id, 1)
+        return run_id
+
+    def _count(self, run_id, sign):
+        """
+        Called internally only.  Adds (sign 1) or removes (sign -1) the metrics of a successful run
+        to or from the baseline of its configuration.
+        """
+        run = self.get(run_id)
+        if run['exit_code'] not in (0, None) or run['config'] is None:
+            return
+        for metric, value in self.metrics(run_id).items():
+            self.db.execute(
+                "INSERT OR IGNORE INTO baselines (config, metric, n, total, squares) "
+                "VALUES (?, ?, 0, 0, 0)", (run['config'], metric))
+            self.db.execute(
+                "UPDATE baselines SET n = n + ?, total = total + ?, squares = squares + ? "
+                "WHERE config = ? AND metric = ?",
+                (sign, sign * value, sign * value * value, run['config'],
+                 metric))
+
+    def metrics(self, run_id):
+        """Returns the BASELINE_METRICS of a run that it has values of, metric => value"""
+        run = self.get(run_id)
+        gc = self.gc(run_id) or {}
+        values = {}
+        for metric, table, column, _ in BASELINE_METRICS:
+            value = run[column] if table == 'runs' else gc.get(column)
+            if value is not None:
+                values[metric] = float(value)
+        return values
+
+    def baseline(self, config):
+        """
+        Returns the baseline of a configuration, metric => (n, total, sum of squares)
+        of the metric's values over the successful runs of the configuration.
+        """
+        return {
+            r['metric']: (r['n'], r['total'], r['squares'])
+            for r in self.db.execute(
+                "SELECT metric, n, total, squares FROM baselines WHERE config = ? AND n > 0",
+                (config, ))
+        }
+
+    def under(self, path):
+        """Returns the runs recorded in the directory 'path', or recorded as 'path' itself, newest first"""
+        path = path.rstrip(os.sep)
+        # a range over the path index: everything starting with 'path/'
+        return self.db.execute(
+            "SELECT * FROM runs WHERE path = ? OR (path >= ? AND path < ?) "
+            "ORDER BY finished DESC",
+            (path, path + os.sep,
+             path + chr(ord(os.sep) + 1))).fetchall()
+
+    def completed(self, fingerprint):
+        """Returns the newest run with 'fingerprint' that completed (exit code 0), or None"""
+        return self.db.execute(
+            "SELECT * FROM runs WHERE fingerprint = ? AND exit_code = 0 "
+            "ORDER BY finished DESC LIMIT 1", (fingerprint, )).fetchone()
+
+    def find(self,
+             tag=None,
+             run_type=None,
+             jdk=None,
+             host=None,
+             props=None,
+             flags=None,
+             limit=None,
+             java=None):
+        """
+        Returns the runs (sqlite3.Rows of 'runs') matching every given condition, newest first.
+        Values containing '%' are matched with LIKE, the others exactly.
+        :param jdk: What 'java -version' printed, e.g. '%"11.0.2"%'
+        :param java: The path of java
+        :param props: A dict of prop name => value the runs must have had
+        :param flags: A dict of JVM flag name => value (see parse_flags) the runs must have had
+        """
+        where = []
+        args = []
+
+        def _match(column, value):
+            return "{} {} ?".format(column, "LIKE"
+                                    if '%' in str(value) else "=")
+
+        for column, value in (('tag', tag), ('run_type', run_type),
+                              ('jdk', jdk), ('host', host), ('java', java)):
+            if value is not None:
+                where.append(_match(column, value))
+                args.append(value)
+        for table, conditions in (('props', props), ('flags', flags)):
+            for name, value in (conditions or {}).items():
+                where.append(
+                    "id IN (SELECT run_id FROM {} WHERE name = ? AND {})".
+                    format(table, _match('value', value)))
+                args.extend([name, str(value)])
+        sql = "SELECT * FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY finished DESC"
+        if limit is not None:
+            sql += " LIMIT {}".format(int(limit))
+        return self.db.execute(sql, args).fetchall()
+
+    def get(self, run_id):
+        """Returns the 'runs' row of 'run_id', or None"""
+        return self.db.execute("SELECT * FROM runs WHERE id = ?",
+                               (run_id, )).fetchone()
+
+    def props(self, run_id):
+        """Returns the props a run set, name => value"""
+        return {
+            r['name']: r['value']
+            for r in self.db.execute(
+                "SELECT name, value FROM props WHERE run_id = ?", (run_id, ))
+        }
+
+    def all_props(self, run_ids=None):
+        """
+        Returns the props many runs set at once, run id => {name => value}.
+        :param run_ids: The runs to return, all of them when None
+        """
+        result = {}
+        rows = self.db.execute("SELECT run_id, name, value FROM props")
+        wanted = set(run_ids) if run_ids is not None else None
+        for r in rows:
+            if wanted is None or r['run_id'] in wanted:
+                result.setdefault(r['run_id'], {})[r['name']] = r['value']
+        return result
+
+    def flags(self, run_id):
+        """Returns the JVM flags of a run, name => value"""
+        return {
+            r['name']: r['value']
+            for r in self.db.execute(
+                "SELECT name, value FROM flags WHERE run_id = ?", (run_id, ))
+        }
+
+    def gc(self, run_id):
+        """Returns the GC summary of a run as a dict (missing values are None), or None"""
+        r = self.db.execute("SELECT * FROM gc WHERE run_id = ?",
+                            (run_id, )).fetchone()
+        return {f: r[f] for f in _GC_FIELDS} if r else None
@@ -0,0 +1,171 @@
+"""
+This module compares new runs to the history of their configuration in
+the results catalog (see src.catalog), to catch regressions after a JDK,
+kernel or firmware update.
+
+New runs are matched to earlier runs by their configuration key (how they
+run and their props, but not the JDK or host), and every metric of
+src.catalog.BASELINE_METRICS is tested against the configuration's
+baseline with a one-sided Welch t-test. The baselines are kept up to date
+as runs are recorded, so a comparison reads no result directories and
+only the baseline rows of the configurations being compared.
+"""
+import math
+from collections import namedtuple
+
+from src.catalog import BASELINE_METRICS
+
+"""
+config: the configuration key
+tags: the tags of the new runs
+metric: one of src.catalog.BASELINE_METRICS
+n, mean: of the new runs
+baseline_n, baseline_mean, baseline_stdev: of the earlier runs of the configuration
+change: (mean - baseline_mean) / baseline_mean
+p: the probability of a change at least this bad by chance, None when it can't be tested
+regression: whether the change is significant and worse than the tolerance
+"""
+Comparison = namedtuple('Comparison', [
+    'config', 'tags', 'metric', 'n', 'mean', 'baseline_n', 'baseline_mean',
+    'baseline_stdev', 'change', 'p', 'regression'
+])
+
+
+def _betacf(a, b, x):
+    """Called internally only.  Continued fraction of the incomplete beta function (Numerical Recipes)"""
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 200):
+        for num in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                    -(a + m) * (a + b + m) * x / ((a + 2 * m) *
+                                                  (a + 2 * m + 1))):
+            d = 1 + num * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + num / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1) < 1e-12:
+            break
+    return h
+
+
+def _betainc(a, b, x):
+    """Called internally only.  The regularized incomplete beta function I_x(a, b)"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x)
+        + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1 - front * _betacf(b, a, 1 - x) / b
+
+
+def t_sf(t, df):
+    """Returns P(T > t) for Student's t distribution with 'df' degrees of freedom"""
+    tail = 0.5 * _betainc(df / 2, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1 - tail
+
+
+def _stats(n, total, squares):
+    """Called internally only.  Mean and sample variance from a count, sum and sum of squares"""
+    mean = total / n
+    var = max(squares - n * mean * mean, 0.0) / (n - 1) if n > 1 else float(
+        'nan')
+    return mean, var
+
+
+def test(values, baseline, higher_is_better=True):
+    """
+    Tests whether 'values' are worse than 'baseline'.
+    :param values: The new values
+    :param baseline: (n, sum, sum of squares) of the earlier values
+    :return: (mean, baseline mean, baseline stdev, relative change, p), p is None when it can't be tested
+    """
+    n = len(values)
+    mean = sum(values) / n
+    bn, total, squares = baseline
+    bmean, bvar = _stats(bn, total, squares)
+    bstdev = math.sqrt(bvar) if bn > 1 else float('nan')
+    change = (mean - bmean) / bmean if bmean else float('nan')
+    if bn < 2:
+        return mean, bmean, bstdev, change, None
+    if n < 2:
+        # a single new run, against the spread of the baseline
+        se = math.sqrt(bvar * (1 + 1 / bn))
+        df = bn - 1
+    else:
+        var = sum((v - mean)**2 for v in values) / (n - 1)
+        a, b = var / n, bvar / bn
+        se = math.sqrt(a + b)
+        denominator = a * a / (n - 1) + b * b / (bn - 1)
+        df = (a + b)**2 / denominator if denominator else n + bn - 2
+    worse = bmean - mean if higher_is_better else mean - bmean
+    if se == 0:
+        return mean, bmean, bstdev, change, 0.0 if worse > 0 else 1.0
+    return mean, bmean, bstdev, change, t_sf(worse / se, df)
+
+
+def compare(catalog, paths, alpha=0.01, tolerance=0.02):
+    """
+    Compares the runs recorded under 'paths' (run directories or results trees) to the baselines
+    of their configurations, without the runs themselves.
+    A metric regresses when it's worse by more than 'tolerance' (a fraction of the baseline mean)
+    and the chance of that being noise is below 'alpha'.
+    :return: A list of Comparisons, per configuration and metric
+    """
+    new = {}
+    for path in paths:
+        for run in catalog.under(path):
+            if run['config'] is not None and run['exit_code'] in (0, None):
+                new.setdefault(run['config'], {})[run['id']] = run
+    result = []
+    for config, runs in sorted(new.items()):
+        baseline = catalog.baseline(config)
+        values = {}
+        for run_id in runs:
+            for metric, value in catalog.metrics(run_id).items():
+                values.setdefault(metric, []).append(value)
+        tags = sorted(set(r['tag'] for r in runs.values() if r['tag']))
+        for metric, _, _, higher in BASELINE_METRICS:
+            if metric not in values:
+                continue
+            vs = values[metric]
+            # the new runs are part of the baseline, take them out again
+            n, total, squares = baseline.get(metric, (0, 0.0, 0.0))
+            n -= len(vs)
+            total -= sum(vs)
+            squares -= sum(v * v for v in vs)
+            if n < 1:
+                result.append(
+                    Comparison(config, tags, metric, len(vs),
+                               sum(vs) / len(vs), 0, None, None, None, None,
+                               False))
+                continue
+            mean, bmean, bstdev, change, p = test(vs, (n, total, squares),
+                                                  higher)
+            worse = change < -tolerance if higher else change > tolerance
+            result.append(
+                Comparison(config, tags, metric, len(vs), mean, n, bmean,
+                           bstdev, change, p, p is not None and p < alpha
+                           and worse))
+    return result
+
+
+def describe(c):
+    """Returns a Comparison as one line of text"""
+    head = "{} {} {}: {:.6g} ({} runs)".format(c.config, " ".join(c.tags),
+                                              c.metric, c.mean, c.n)
+    if c.baseline_n == 0:
+        return head + ", no baseline"
+    text = "{} vs {:.6g} +/- {:.3g} ({} runs), {:+.2%}".format(
+        head, c.baseline_mean, c.baseline_stdev, c.baseline_n, c.change)
+    if c.p is not None:
+        text += ", p={:.3g}".format(c.p)
+    if c.regression:
+        text += ", REGRESSION"
+    return text
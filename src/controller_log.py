@@ -0,0 +1,172 @@
+"""
+This module parses the controller output of a SPECjbb2015 run (controller.out)
+in a single pass, line by line, so memory use doesn't grow with the file.
+
+records() turns the interesting lines into typed records:
+    - Phase: a phase boundary (load levels, ramp up, RT-curve, max-jOPS)
+    - Failure: a failed RT-curve step about to be retried
+    - RtStep: one step of the throughput-responsetime curve
+
+summarize() folds those records into the values scripts/Rollup.pl reads
+from controller.out (the first failure point and the steady state window).
+"""
+import re
+from collections import namedtuple
+
+"""
+time: seconds since the controller started
+name: one of Phases
+value: max-jOPS for 'max_jops', None otherwise
+"""
+Phase = namedtuple('Phase', ['time', 'name', 'value'])
+
+"""
+time: seconds since the controller started
+retries_left: overall retries left after this one
+retry, retries: this is retry 'retry' of 'retries' for the step
+"""
+Failure = namedtuple('Failure', ['time', 'retries_left', 'retry', 'retries'])
+
+"""
+time: seconds since the controller started
+percent: the step's share of the high bound, None if it isn't printed
+ir: the injection rate the step was run at
+rir, air, pr: the requested injection rate, actual injection rate and processed requests
+tpr: total processed requests, None if it isn't printed
+status: the step's outcome ('OK', 'fail', ...), None if it isn't printed
+"""
+RtStep = namedtuple(
+    'RtStep', ['time', 'percent', 'ir', 'rir', 'air', 'pr', 'tpr', 'status'])
+
+"""
+The phase boundaries found in controller.out:
+    - load_levels: 'Performing load levels'
+    - ramp_up: 'Ramping up completed'
+    - rt_curve: 'Building throughput-responsetime curve'
+    - max_jops: 'max-jOPS is presumably <n>'
+"""
+Phases = [
+    "load_levels",
+    "ramp_up",
+    "rt_curve",
+    "max_jops",
+]
+
+"""
+start: when the steady state began
+end: when it ended
+first_failure: time of the first failed step, None if no step failed
+max_jops: the last presumed max-jOPS, None if none was printed
+steps, failures: how many RtStep and Failure records were seen
+last_step: the last RtStep, None if there was none
+"""
+Summary = namedtuple('Summary', [
+    'start', 'end', 'first_failure', 'max_jops', 'steps', 'failures',
+    'last_step'
+])
+
+_PHASE = re.compile(
+    r'(\d+)s: (?:(Performing load levels)|(Ramping up completed)|'
+    r'(Building throughput-responsetime curve)|'
+    r'max-jOPS is presumably (\d+))')
+_FAILURE = re.compile(
+    r'(\d+)s: Failed, (\d+) overall retries left, retrying (\d+) of (\d+)')
+_STEP = re.compile(
+    r'(\d+)s:\s*(?:\(\s*(\d+)%\))?\s*IR = (\d+)\b.*?'
+    r'\(rIR:aIR:PR = (\d+):(\d+):(\d+)\)'
+    r'(?:\s*\(tPR = (\d+)\))?(?:\s*\[([^\]]*)\])?')
+
+# Rollup.pl's window when controller.out has no phase boundaries
+DEFAULT_START = 1500
+DEFAULT_END = 8000
+# how long a steady state lasts after 'load_levels' or 'ramp_up'
+STEADY_STATE = 900
+# how long an RT-curve lasts when max-jOPS was never printed
+RT_CURVE = 6000
+
+
+def _int(value):
+    return int(value) if value is not None else None
+
+
+def parse_line(line):
+    """
+    Parses a line of controller output.
+    :return: A Phase, Failure or RtStep, or None if the line is none of them
+    """
+    # cheap substring tests first, most lines match none of the expressions
+    if 'IR = ' in line:
+        m = _STEP.search(line)
+        if m:
+            return RtStep(
+                int(m.group(1)), _int(m.group(2)), int(m.group(3)),
+                int(m.group(4)), int(m.group(5)), int(m.group(6)),
+                _int(m.group(7)), m.group(8))
+        return None
+    if 'Failed' in line:
+        m = _FAILURE.search(line)
+        if m:
+            return Failure(*(int(g) for g in m.groups()))
+        return None
+    if 'Perf' in line or 'Ramp' in line or 'curve' in line or 'max-jOPS' in line:
+        m = _PHASE.search(line)
+        if m:
+            for name, group in zip(Phases, m.groups()[1:]):
+                if group is not None:
+                    value = int(group) if name == "max_jops" else None
+                    return Phase(int(m.group(1)), name, value)
+    return None
+
+
+def records(lines):
+    """Yields the record of every line of 'lines' that parse_line recognizes"""
+    for line in lines:
+        record = parse_line(line)
+        if record is not None:
+            yield record
+
+
+def read(path):
+    """Yields the records of the controller output file at 'path'"""
+    with open(path, errors='replace') as f:
+        for record in records(f):
+            yield record
+
+
+def summarize(records):
+    """
+    Folds 'records' into a Summary, keeping only the latest values.
+    The steady state window follows Rollup.pl: 'load_levels' and 'ramp_up'
+    start a STEADY_STATE long window, 'rt_curve' starts one that ends at the
+    last 'max_jops' (or RT_CURVE later), and nothing moves its start after that.
+    """
+    start, end = DEFAULT_START, DEFAULT_END
+    in_curve = False
+    first_failure = max_jops = last_step = None
+    steps = failures = 0
+    for r in records:
+        if isinstance(r, RtStep):
+            steps += 1
+            last_step = r
+        elif isinstance(r, Failure):
+            failures += 1
+            if first_failure is None:
+                first_failure = r.time
+        elif r.name == "max_jops":
+            max_jops = r.value
+            if in_curve:
+                end = r.time
+        elif r.name == "rt_curve" and not in_curve:
+            in_curve = True
+            start, end = r.time, 0
+        elif not in_curve:
+            start, end = r.time, r.time + STEADY_STATE
+    if in_curve and end == 0:
+        end = start + RT_CURVE
+    return Summary(start, end, first_failure, max_jops, steps, failures,
+                   last_step)
+
+
+def summarize_file(path):
+    """Returns the Summary of the controller output file at 'path'"""
+    return summarize(read(path))
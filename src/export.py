@@ -0,0 +1,270 @@
+"""
+This module exports the results of SPECjbb2015 runs in a columnar layout,
+for analyses over many runs that would otherwise parse rollup CSV files.
+
+An export is a directory with one subdirectory per table and one NumPy .npy
+file per column, described by schema.json:
+
+    <out>/schema.json
+    <out>/runs/<column>.npy     one row per run (see RunColumns)
+    <out>/steps/<column>.npy    one row per RT-curve step (see StepColumns)
+    <out>/gc/<column>.npy       one row per GC pause (see GcColumns)
+
+Every column is a plain typed array, so load() can memory-map it and a
+filter only reads the columns it uses. The 'run' column of 'steps' and 'gc'
+is the row of the run in 'runs'.
+"""
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+from src import controller_log, gc_log, rollup
+
+# bump when the layout or a column changes
+SCHEMA_VERSION = 1
+SCHEMA_FILE = 'schema.json'
+# what a missing value is in a column of each kind, ints are counts, jOPS or seconds
+MISSING_INT = -1
+MISSING_STR = ''
+
+"""
+The columns of the 'runs' table, (name, dtype), strings are stored as 'U'.
+The GC columns are those of src.gc_log.GcSummary over the same window as the rollup.
+"""
+RunColumns = [
+    ('name', 'U'),
+    ('path', 'U'),
+    ('max_jops', 'i8'),
+    ('critical_jops', 'i8'),
+    ('hbir_settled', 'i8'),
+    ('hbir_attempted', 'i8'),
+    ('steady_start', 'i8'),
+    ('steady_end', 'i8'),
+    ('failure_point', 'i8'),
+    ('steps', 'i8'),
+    ('failures', 'i8'),
+    ('gc_events', 'i8'),
+] + [('gc_' + f, 'f8') for f in gc_log.GcSummary._fields] + [
+    ('jvm_options', 'U'),
+]
+
+"""
+The columns of the 'steps' table, the fields of src.controller_log.RtStep.
+"""
+StepColumns = [
+    ('run', 'i4'),
+    ('time', 'i8'),
+    ('percent', 'i8'),
+    ('ir', 'i8'),
+    ('rir', 'i8'),
+    ('air', 'i8'),
+    ('pr', 'i8'),
+    ('tpr', 'i8'),
+    ('status', 'U'),
+]
+
+"""
+The columns of the 'gc' table, the arrays of src.gc_log.GcEvents.
+"""
+GcColumns = [
+    ('run', 'i4'),
+    ('when', 'f8'),
+    ('pause', 'f8'),
+    ('before', 'f8'),
+    ('after', 'f8'),
+    ('young', 'f8'),
+    ('old', 'f8'),
+    ('perm', 'f8'),
+    ('major', '?'),
+]
+
+"""
+The tables of an export and their columns.
+"""
+Tables = [
+    ('runs', RunColumns),
+    ('steps', StepColumns),
+    ('gc', GcColumns),
+]
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING_INT
+
+
+def _column(values, dtype):
+    """Called internally only.  Converts a list of values to a column, filling in missing values"""
+    if dtype == 'U':
+        return np.array(
+            [MISSING_STR if v is None else str(v) for v in values], dtype=str)
+    if dtype == 'f8':
+        return np.array(
+            [np.nan if v is None else v for v in values], dtype=np.float64)
+    if dtype == '?':
+        return np.array(values, dtype=bool)
+    return np.array([MISSING_INT if v is None else v for v in values],
+                    dtype=dtype)
+
+
+def export_run(path):
+    """
+    Reads the run directory 'path' once.
+    :return: The run's row of 'runs' (a dict), its RtSteps, its GcEvents, and the messages of the analysis
+    """
+    messages = []
+    records = []
+    controller_out = os.path.join(path, 'controller.out')
+    if os.path.exists(controller_out):
+        records = list(controller_log.read(controller_out))
+    else:
+        messages.append("No controller.out found")
+    summary = controller_log.summarize(records)
+    steps = [r for r in records if isinstance(r, controller_log.RtStep)]
+
+    events = gc_log.GcEvents.empty()
+    gc = gc_log.GcSummary(*([None] * len(gc_log.GcSummary._fields)))
+    log = rollup.gc_log_path(path)
+    if log is None:
+        messages.append("No GC log found")
+    else:
+        events = gc_log.parse(log)
+        try:
+            gc = gc_log.summarize(events, summary.end - rollup.GC_WINDOW,
+                                  summary.end)
+        except Exception as e:
+            messages.append("{}: {}".format(os.path.basename(log), e))
+
+    ir = rollup.ir_data(path)
+    row = {
+        'name': os.path.basename(path),
+        'path': path,
+        'max_jops': _int(ir[0]),
+        'critical_jops': _int(ir[1]),
+        'hbir_settled': _int(ir[2]),
+        'hbir_attempted': _int(ir[3]),
+        'steady_start': summary.start if records else None,
+        'steady_end': summary.end if records else None,
+        'failure_point': summary.first_failure,
+        'steps': summary.steps,
+        'failures': summary.failures,
+        'gc_events': len(events),
+        'jvm_options': rollup.jvm_options(path),
+    }
+    for f in gc_log.GcSummary._fields:
+        row['gc_' + f] = getattr(gc, f)
+    return row, steps, events, messages
+
+
+def _work(path):
+    """Called internally only.  Runs export_run in a worker, so one broken directory doesn't stop the export"""
+    try:
+        return (path, ) + export_run(path)
+    except Exception as e:
+        return path, None, [], gc_log.GcEvents.empty(), [
+            "Failed: {}".format(e)
+        ]
+
+
+def _save(out, table, columns, values):
+    """Called internally only.  Writes the columns of 'table', returns its entry in the schema"""
+    os.makedirs(os.path.join(out, table), exist_ok=True)
+    entry = {"rows": 0, "columns": {}}
+    for name, dtype in columns:
+        column = values[name]
+        if not isinstance(column, np.ndarray):
+            column = _column(column, dtype)
+        np.save(os.path.join(out, table, name + '.npy'), column)
+        entry["rows"] = len(column)
+        entry["columns"][name] = column.dtype.str
+    return entry
+
+
+def export(paths, out, outhandle=print, processes=None):
+    """
+    Exports the run directories of one or more results trees into the directory 'out'.
+    :param paths: A results tree (a directory of run directories), or a list of them
+    :param outhandle: Receives progress messages as the directories are read
+    :param processes: Number of worker processes, defaults to one per CPU
+    :return: The number of runs exported
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    dirs = []
+    for path in paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        path = os.path.abspath(path)
+        dirs.extend(os.path.join(path, d) for d in rollup.run_dirs(path))
+
+    runs = {name: [] for name, _ in RunColumns}
+    steps = {name: [] for name, _ in StepColumns}
+    gc = {name: [] for name, _ in GcColumns}
+    if dirs:
+        pool = Pool(processes=min(processes or os.cpu_count() or 1, len(dirs)))
+        try:
+            # imap keeps the runs in order, so exports of the same trees are identical
+            for path, row, run_steps, events, messages in pool.imap(_work, dirs):
+                outhandle("Exported {}".format(os.path.basename(path)))
+                for m in messages:
+                    outhandle("    {}".format(m))
+                if row is None:
+                    continue
+                run = len(runs['name'])
+                for name, _ in RunColumns:
+                    runs[name].append(row[name])
+                steps['run'].extend([run] * len(run_steps))
+                for name, _ in StepColumns[1:]:
+                    steps[name].extend(getattr(s, name) for s in run_steps)
+                gc['run'].append(np.full(len(events), run, dtype=np.int32))
+                for name, _ in GcColumns[1:]:
+                    gc[name].append(getattr(events, name))
+        finally:
+            pool.close()
+            pool.join()
+    for name, dtype in GcColumns:
+        gc[name] = np.concatenate(gc[name]).astype(dtype) if gc[name] else \
+            np.empty(0, dtype=dtype)
+
+    schema = {"version": SCHEMA_VERSION, "missing_int": MISSING_INT, "tables": {}}
+    values = {'runs': runs, 'steps': steps, 'gc': gc}
+    for table, columns in Tables:
+        schema["tables"][table] = _save(out, table, columns, values[table])
+    # written last, an export without a schema is incomplete
+    with open(os.path.join(out, SCHEMA_FILE), 'w') as f:
+        json.dump(schema, f, indent=2, sort_keys=True)
+    return len(runs['name'])
+
+
+def schema(out):
+    """Returns the schema of the export in 'out'"""
+    with open(os.path.join(out, SCHEMA_FILE)) as f:
+        s = json.load(f)
+    if s.get("version") != SCHEMA_VERSION:
+        raise Exception("{} is an export of version {}, not {}".format(
+            out, s.get("version"), SCHEMA_VERSION))
+    return s
+
+
+def load(out, table, columns=None, mmap_mode='r'):
+    """
+    Loads a table of the export in 'out'.
+    :param table: 'runs', 'steps' or 'gc'
+    :param columns: The names of the columns to load, all of them when None
+    :param mmap_mode: How to memory-map the columns (see numpy.load), None reads them into memory
+    :return: A dict of column name => array
+    """
+    entry = schema(out)["tables"].get(table)
+    if entry is None:
+        raise Exception("{} has no table '{}'".format(out, table))
+    if columns is None:
+        columns = list(entry["columns"])
+    return {
+        name: np.load(os.path.join(out, table, name + '.npy'),
+                      mmap_mode=mmap_mode)
+        for name in columns
+    }
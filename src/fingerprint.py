@@ -0,0 +1,174 @@
+"""
+This module fingerprints runs, so runs that would do exactly the same
+thing can be found: duplicates within a configuration (e.g. where sweeps
+overlap), and runs that already completed (see src.catalog).
+
+A run's fingerprint is a digest of what it executes: the props file it
+writes, the command lines of its controller, backends and injectors (with
+the JDK, jar and props file paths left out, as the paths of the same files
+differ between hosts), the hash of the jar, the version the JDK reports,
+and its topology. The controller port isn't part of it, as parallel runs
+are given different ones.
+"""
+import hashlib
+import json
+import logging
+import os
+import subprocess
+
+from src import catalog
+
+log = logging.getLogger(__name__)
+
+# bump when what goes into a fingerprint changes, so older fingerprints don't match
+VERSION = 1
+
+# (path, size, mtime) => sha256 of the file
+_file_hashes = {}
+# java => what 'java -version' printed
+_jdk_versions = {}
+
+
+def file_hash(path):
+    """Returns the sha256 of the file at 'path' (remembered until the file changes), or None if it can't be read"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_size, st.st_mtime)
+    if key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(2**20), b''):
+                digest.update(block)
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+
+def jdk_version(java):
+    """Returns what 'java -version' prints (remembered per java), or None if it can't be run"""
+    if java not in _jdk_versions:
+        try:
+            out = subprocess.check_output([java, "-version"],
+                                          stderr=subprocess.STDOUT,
+                                          timeout=60)
+            _jdk_versions[java] = out.decode(errors='replace').strip()
+        except (OSError, subprocess.SubprocessError) as e:
+            log.warning("couldn't get the version of {}: {}".format(java, e))
+            _jdk_versions[java] = None
+    return _jdk_versions[java]
+
+
+def components(run):
+    """Returns what the fingerprint of 'run' (a src.benchmark_run.SpecJBBRun) is made of, as a dict"""
+    paths = {
+        run.java["path"]: "<java>",
+        run.jar: "<jar>",
+        run.props_file: "<props>"
+    }
+
+    def _options(args):
+        return [paths.get(a, a) for a in args]
+
+    props = {
+        name: value
+        for name, value in run.props.items()
+        if name not in catalog.VOLATILE_PROPS
+    }
+    return {
+        'version': VERSION,
+        'props': run.props_text(props),
+        'controller': _options(run.controller_run_args()),
+        'backend': _options(run.backend_run_args()),
+        'injector': _options(run.injector_run_args()),
+        'jar': file_hash(run.jar),
+        'jdk': jdk_version(run.java["path"]),
+        'topology': [
+            run.backends["count"], run.injectors["count"], run.times,
+            run.cpus, run.numa_nodes, run.binding, run.memory_policy
+        ],
+    }
+
+
+def fingerprint(run):
+    """Returns the fingerprint of 'run' (a src.benchmark_run.SpecJBBRun)"""
+    text = json.dumps(components(run), sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+class Deduplicator:
+    """
+    Decides which runs of a plan to skip, as they're about to start, and reports what that saved.
+
+    A run is a duplicate when an earlier run of the plan has its fingerprint, and it's already
+    done when the results catalog in its directory has a completed run with its fingerprint.
+    Duplicates are only warned about, unless 'reuse' is set, then both are skipped.
+    """
+
+    def __init__(self, reuse=False, logger=log):
+        self.reuse = reuse
+        self.log = logger
+        # fingerprint => tag of the first run of the plan with it
+        self.seen = {}
+        # (tag, fingerprint, catalog path, why) of every skipped run
+        self.skipped = []
+        self.duplicates = 0
+
+    def skip(self, run):
+        """Returns whether 'run' (a src.benchmark_run.SpecJBBRun) should be skipped"""
+        fp = run.fingerprint()
+        path = os.path.join(run.cwd, catalog.DEFAULT_NAME)
+        first = self.seen.get(fp)
+        if first is None:
+            self.seen[fp] = run.run_id
+            if not self.reuse or not os.path.exists(path):
+                return False
+            with catalog.Catalog(path) as c:
+                done = c.completed(fp)
+            if done is None:
+                return False
+            why = "already completed in {}".format(done["path"])
+        else:
+            self.duplicates += 1
+            if not self.reuse:
+                self.log.warning("{} is identical to {}".format(
+                    run.run_id, first))
+                return False
+            why = "identical to {}".format(first)
+        self.log.info("skipping {}: {}".format(run.run_id, why))
+        self.skipped.append((run.run_id, fp, path, why))
+        return True
+
+    def saved(self):
+        """
+        Returns the machine-hours the skipped runs saved (the durations of the runs they matched),
+        and how many of them matched a run whose duration isn't known.
+        """
+        hours, unknown = 0.0, 0
+        for _, fp, path, _ in self.skipped:
+            done = None
+            if os.path.exists(path):
+                with catalog.Catalog(path) as c:
+                    done = c.completed(fp)
+            if done is None or done["duration"] is None:
+                unknown += 1
+            else:
+                hours += done["duration"] / 3600
+        return hours, unknown
+
+    def report(self):
+        """Returns the report of what was skipped, as lines of text"""
+        lines = ["skipped {}: {}".format(tag, why)
+                 for tag, _, _, why in self.skipped]
+        if self.skipped:
+            hours, unknown = self.saved()
+            lines.append(
+                "skipped {} runs, saving {:.2f} machine-hours{}".format(
+                    len(self.skipped), hours,
+                    " (and {} runs of unknown duration)".format(unknown)
+                    if unknown else ""))
+        elif self.duplicates:
+            lines.append(
+                "{} runs were identical to earlier runs, --reuse skips them".
+                format(self.duplicates))
+        return lines
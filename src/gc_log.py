@@ -0,0 +1,361 @@
+"""
+This module analyzes the GC logs of SPECjbb2015 JVMs, in place of
+scripts/Rollup_ParseGC.pl.
+
+The log is memory-mapped and its format is detected once, from the start of
+the file. The pause events of that format are then pulled out with one
+regular expression scan per event kind into NumPy arrays, and summarized
+over a time window with array operations instead of line by line.
+
+Supported formats are HotSpot's -XX:+PrintGCDetails (Parallel GC) and
+-XX:+PrintGC output, JRockit's -Xverbose:memory output and the unified
+JDK 9+ -Xlog:gc output.
+"""
+import itertools
+import mmap
+import re
+from collections import namedtuple
+
+import numpy as np
+
+"""
+kind: 'minor', 'major', or None when the 'kind' group of the expression decides
+    (a 'Full' pause is major, the other pauses it matches are minor)
+regex: compiled bytes expression with named groups for 'when', 'pause' and
+    'before'/'after' (and optionally 'young', 'old', 'perm' and 'kind'), sizes in K
+pause_scale: what to multiply 'pause' by to get seconds
+"""
+GcPattern = namedtuple('GcPattern', ['kind', 'regex', 'pause_scale'])
+"""
+name: the format's name
+patterns: the GcPatterns of its events
+"""
+GcFormat = namedtuple('GcFormat', ['name', 'patterns'])
+
+# optional -XX:+PrintGCDateStamps prefix, e.g. '2018-03-01T10:00:00.000+0000: '
+_DATE = rb'(?:\d{4}-\d\d-\d\dT[\d:.]+[+-]\d{4}: )?'
+
+"""
+These are the GC log formats that can be analyzed:
+    - hotspot-details: HotSpot with -XX:+PrintGCDetails and the Parallel GC
+    - hotspot: HotSpot with -XX:+PrintGC
+    - jrockit: JRockit with -Xverbose:memory
+    - unified: JDK 9+ with -Xlog:gc (uptime decorations), for any collector
+"""
+GcFormats = [
+    GcFormat('hotspot-details', [
+        GcPattern(
+            'minor',
+            re.compile(
+                rb'^' + _DATE + rb'(?P<when>\d+\.\d+): \[GC\b[^\n]*?'
+                rb'\[PSYoungGen: \d+K->(?P<young>\d+)K\(\d+K\)\] '
+                rb'(?P<before>\d+)K->(?P<after>\d+)K\(\d+K\), '
+                rb'(?P<pause>\d+\.\d+) secs\]', re.M), 1.0),
+        GcPattern(
+            'major',
+            re.compile(
+                rb'^' + _DATE + rb'(?P<when>\d+\.\d+): \[Full GC\b[^\n]*?'
+                rb'\[PSYoungGen: \d+K->(?P<young>\d+)K\(\d+K\)\] '
+                rb'\[(?:ParOldGen|PSOldGen): \d+K->(?P<old>\d+)K\(\d+K\)\] '
+                rb'(?P<before>\d+)K->(?P<after>\d+)K\(\d+K\),? '
+                rb'\[(?:Metaspace|PSPermGen): \d+K->(?P<perm>\d+)K\([^)]*\)\], '
+                rb'(?P<pause>\d+\.\d+) secs\]', re.M), 1.0),
+    ]),
+    GcFormat('hotspot', [
+        GcPattern(
+            'minor',
+            re.compile(
+                rb'^' + _DATE + rb'(?P<when>\d+\.\d+): \[GC (?:\([^)]*\) )?'
+                rb'(?P<before>\d+)K->(?P<after>\d+)K\(\d+K\), '
+                rb'(?P<pause>\d+\.\d+) secs\]', re.M), 1.0),
+        GcPattern(
+            'major',
+            re.compile(
+                rb'^' + _DATE + rb'(?P<when>\d+\.\d+): \[Full GC (?:\([^)]*\) )?'
+                rb'(?P<before>\d+)K->(?P<after>\d+)K\(\d+K\), '
+                rb'(?P<pause>\d+\.\d+) secs\]', re.M), 1.0),
+    ]),
+    GcFormat('jrockit', [
+        # without generations every collection is of the whole heap
+        GcPattern(
+            'major',
+            re.compile(
+                rb'^(?:\[\s*\d+\])?\[(?:memory \](?:\[INFO \])?|INFO \]\[memory \])'
+                rb' (?P<when>\d+\.\d+)(?:-\d+\.\d+)?: GC '
+                rb'(?P<before>\d+)K->(?P<after>\d+)K \(\d+K\)(?:,| in) '
+                rb'(?:sum of pauses )?(?P<pause>\d+\.\d+) ms', re.M), 0.001),
+        GcPattern(
+            'minor',
+            re.compile(
+                rb'^\[INFO \]\[memory \](?:\[[^]]+\]\[\d+\]\[\d+\])? \[YC#\d+\] '
+                rb'(?P<when>\d+\.\d+)-\d+\.\d+: YC '
+                rb'(?P<before>\d+)KB->(?P<after>\d+)KB \(\d+KB\), \d+\.\d+ s, '
+                rb'sum of pauses (?P<pause>\d+\.\d+) ms', re.M), 0.001),
+        GcPattern(
+            'major',
+            re.compile(
+                rb'^\[INFO \]\[memory \](?:\[[^]]+\]\[\d+\]\[\d+\])? \[OC#\d+\] '
+                rb'(?P<when>\d+\.\d+)-\d+\.\d+: OC '
+                rb'(?P<before>\d+)KB->(?P<after>\d+)KB \(\d+KB\), \d+\.\d+ s, '
+                rb'sum of pauses (?P<pause>\d+\.\d+) ms', re.M), 0.001),
+    ]),
+    GcFormat('unified', [
+        # [12.345s][info][gc] GC(7) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 3.456ms
+        # only collections count, like Rollup_ParseGC.pl: G1's Remark and Cleanup pauses are left out
+        GcPattern(
+            None,
+            re.compile(
+                rb'^\[(?P<when>\d+\.\d+)s\][^\n]*?\bGC\(\d+\) '
+                rb'Pause (?P<kind>Young|Mixed|Initial Mark|Full)\b[^\n]*? '
+                rb'(?P<before>\d+)(?P<before_unit>[KMG])->'
+                rb'(?P<after>\d+)(?P<after_unit>[KMG])\(\d+[KMG]\) '
+                rb'(?P<pause>\d+\.\d+)ms', re.M), 0.001),
+    ]),
+]
+
+# how much of the start of a log is searched for a known format
+DETECT_BYTES = 2**20
+# matches converted to arrays at a time
+_CHUNK = 2**16
+_UNITS = {b'K': 1, b'M': 1024, b'G': 1024**2}
+_COLUMNS = ['when', 'pause', 'before', 'after', 'young', 'old', 'perm']
+
+
+def detect_format(buf, limit=DETECT_BYTES):
+    """
+    Finds the format of the GC log in 'buf' (bytes or an mmap), from the
+    format whose events start earliest in its first 'limit' bytes
+    (or anywhere in it, when none are found there).
+    :return: One of GcFormats, or None
+    """
+    for end in (min(limit, len(buf)), len(buf)):
+        first = None
+        for fmt in GcFormats:
+            for p in fmt.patterns:
+                m = p.regex.search(buf, 0, end)
+                if m and (first is None or m.start() < first[0]):
+                    first = (m.start(), fmt)
+        if first is not None:
+            return first[1]
+    return None
+
+
+class GcEvents:
+    """
+    The pause events of a GC log, as NumPy arrays sorted by time.
+    when: seconds since the JVM started
+    pause: length of the pause in seconds
+    before, after: K of heap in use before and after the pause
+    young, old, perm: K in use in each generation after the pause (NaN when not logged)
+    major: whether the pause was a full (major) collection
+    """
+
+    def __init__(self, when, pause, before, after, young, old, perm, major):
+        order = np.argsort(when, kind='mergesort')
+        self.when = when[order]
+        self.pause = pause[order]
+        self.before = before[order]
+        self.after = after[order]
+        self.young = young[order]
+        self.old = old[order]
+        self.perm = perm[order]
+        self.major = major[order]
+
+    def __len__(self):
+        return len(self.when)
+
+    def select(self, mask):
+        """Returns the events selected by the boolean array 'mask'"""
+        return GcEvents(self.when[mask], self.pause[mask], self.before[mask],
+                        self.after[mask], self.young[mask], self.old[mask],
+                        self.perm[mask], self.major[mask])
+
+    @staticmethod
+    def empty():
+        none = np.empty(0)
+        return GcEvents(none, none, none, none, none, none, none,
+                        np.empty(0, dtype=bool))
+
+
+def _extract(pattern, buf):
+    """Called internally only.  Returns the matches of 'pattern' in 'buf' as a dict of column => array"""
+    index = pattern.regex.groupindex
+    chunks = []
+    matches = pattern.regex.finditer(buf)
+    while True:
+        rows = [m.groups(b'nan') for m in itertools.islice(matches, _CHUNK)]
+        if not rows:
+            break
+        chunks.append(np.array(rows))
+    if not chunks:
+        return None
+    table = np.concatenate(chunks)
+
+    def column(name):
+        if name not in index:
+            return np.full(len(table), np.nan)
+        return table[:, index[name] - 1].astype(np.float64)
+
+    columns = {name: column(name) for name in _COLUMNS}
+    columns['pause'] *= pattern.pause_scale
+    for name in ('before', 'after'):
+        unit = name + '_unit'
+        if unit in index:
+            units = table[:, index[unit] - 1]
+            for u, factor in _UNITS.items():
+                columns[name][units == u] *= factor
+    if pattern.kind is None:
+        columns['major'] = table[:, index['kind'] - 1] == b'Full'
+    else:
+        columns['major'] = np.full(len(table), pattern.kind == 'major')
+    return columns
+
+
+def parse_bytes(buf, fmt=None):
+    """
+    Extracts the pause events of the GC log in 'buf' (bytes or an mmap).
+    :param fmt: One of GcFormats, detected when None
+    :return: GcEvents, empty if the format isn't recognized
+    """
+    if fmt is None:
+        fmt = detect_format(buf)
+    if fmt is None:
+        return GcEvents.empty()
+    parts = [c for c in (_extract(p, buf) for p in fmt.patterns) if c]
+    if not parts:
+        return GcEvents.empty()
+    return GcEvents(*(np.concatenate([c[name] for c in parts])
+                      for name in _COLUMNS + ['major']))
+
+
+def parse(path, fmt=None):
+    """Memory-maps the GC log at 'path' and extracts its pause events, see parse_bytes"""
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return GcEvents.empty()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return parse_bytes(buf, fmt)
+
+
+"""
+The GC statistics of a window of a GC log.
+start, end: the window (None = unbounded)
+duration: seconds from the window's start to the end of its last pause
+minor_count, major_count: number of minor and major pauses
+minor_time, major_time: seconds spent in minor and major pauses
+minor_interval, major_interval, interval: average seconds between pauses (minor, major, any)
+minor_avg, major_avg, avg: average pause length in seconds
+minor_pct, major_pct, pct: share of the duration spent in pauses
+minor_collected, major_collected, collected: K of garbage collected per second
+young_resident, old_resident, resident, perm_resident: average K in use after a pause
+major_resident: average K in use after a major pause
+"""
+GcSummary = namedtuple('GcSummary', [
+    'start', 'end', 'duration', 'minor_count', 'major_count', 'minor_time',
+    'major_time', 'minor_interval', 'major_interval', 'interval',
+    'minor_avg', 'major_avg', 'avg', 'minor_pct', 'major_pct', 'pct',
+    'minor_collected', 'major_collected', 'collected', 'young_resident',
+    'old_resident', 'resident', 'perm_resident', 'major_resident'
+])
+
+
+def _ratio(a, b):
+    return a / b if b else float('nan')
+
+
+def _mean(values):
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if len(values) else float('nan')
+
+
+def _interval(events):
+    """Called internally only.  Average seconds from the end of one pause to the start of the next"""
+    if len(events) < 2:
+        return float('nan')
+    gaps = events.when[1:] - (events.when[:-1] + events.pause[:-1])
+    return float(gaps.sum()) / (len(events) - 1)
+
+
+def summarize(events, start=None, end=None):
+    """
+    Summarizes the pauses of 'events' that started between 'start' and 'end' seconds.
+    Unlike Rollup_ParseGC.pl, statistics of kinds without (enough) pauses
+    are NaN rather than divided by a made up count.
+    :return: A GcSummary
+    """
+    mask = np.ones(len(events), dtype=bool)
+    if start is not None:
+        mask &= events.when >= start
+    if end is not None:
+        mask &= events.when <= end
+    e = events.select(mask)
+    if not len(e):
+        raise Exception("No GC data between {}s and {}s".format(start, end))
+    minor, major = e.select(~e.major), e.select(e.major)
+
+    duration = float((e.when + e.pause).max())
+    if end is not None:
+        duration = min(duration, end)
+    if start is not None:
+        duration -= start
+    minor_time = float(minor.pause.sum())
+    major_time = float(major.pause.sum())
+    minor_collected = float((minor.before - minor.after).sum())
+    major_collected = float((major.before - major.after).sum())
+    return GcSummary(
+        start, end, duration, len(minor), len(major), minor_time, major_time,
+        _interval(minor), _interval(major), _interval(e),
+        _ratio(minor_time, len(minor)), _ratio(major_time, len(major)),
+        _ratio(minor_time + major_time, len(e)),
+        _ratio(100 * minor_time, duration), _ratio(100 * major_time, duration),
+        _ratio(100 * (minor_time + major_time), duration),
+        _ratio(minor_collected, duration), _ratio(major_collected, duration),
+        _ratio(minor_collected + major_collected, duration),
+        _mean(e.young), _mean(major.old), _mean(e.after), _mean(major.perm),
+        _mean(major.after))
+
+
+def analyze(path, start=None, end=None):
+    """Returns the GcSummary of the GC log at 'path' between 'start' and 'end' seconds"""
+    return summarize(parse(path), start, end)
+
+
+"""
+The GC columns of the Rollup.pl output, and the GcSummary field of each.
+Rates and memory are whole numbers, like Rollup_ParseGC.pl prints them.
+"""
+RollupColumns = [
+    ("Avg secs between Young GC", 'minor_interval'),
+    ("Avg secs between Full GC", 'major_interval'),
+    ("Avg secs between ANY GC", 'interval'),
+    ("Avg GC length(s) Young GC", 'minor_avg'),
+    ("Avg GC length(s) Full GC", 'major_avg'),
+    ("Avg GC length(s) ANY GC", 'avg'),
+    ("Time Spent(%) in Young GC", 'minor_pct'),
+    ("Time Spent(%) Full GC", 'major_pct'),
+    ("Time Spent(%) ANY GC", 'pct'),
+    ("Garbage Collected(K/s) Young", 'minor_collected'),
+    ("Garbage Collected(K/s) full", 'major_collected'),
+    ("Garbage Collected(K/s) Total", 'collected'),
+    ("Avg Resident Memory (K) Young", 'young_resident'),
+    ("Avg Resident Memory (K) Old", 'old_resident'),
+    ("Avg Resident Memory (K) Total", 'resident'),
+    ("Avg Resident Memory (K) Perm", 'perm_resident'),
+    ("Avg Resident Memory (K) Major", 'major_resident'),
+]
+
+_WHOLE = ('collected', 'resident')
+
+
+def rollup_row(summary):
+    """Returns the values of RollupColumns for 'summary' as strings, empty where they're NaN"""
+    row = []
+    for _, field in RollupColumns:
+        value = getattr(summary, field)
+        if np.isnan(value):
+            row.append("")
+        elif field.endswith(_WHOLE):
+            row.append(str(int(value)))
+        else:
+            row.append(repr(value))
+    return row
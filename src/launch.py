@@ -0,0 +1,168 @@
+"""
+This module sequences the launch of SPECjbb agents (backends and injectors)
+so that they don't all start at the same moment as the controller.
+The scheduler watches the controller's output: it waits for the controller
+to be ready for connections, then starts agents in waves, and records how
+long each agent took to attach (handshake) to the controller.
+"""
+import re
+import time
+
+# controller output that means it's accepting agent connections
+READY_PATTERN = r"Binary log file is|[Ww]aiting for"
+# controller output announcing an agent has finished its handshake
+ATTACH_PATTERN = r"attached"
+
+
+class agent:
+    """
+    An agent waiting to be (or already) launched.
+    name is the SPECjbb agent name, i.e. '<group>.<Backend|TxInjector>.<jvm id>'
+    """
+
+    def __init__(self, name, start):
+        self.name = name
+        self.start = start
+        self.wave = None
+        self.launched = None
+        self.attached = None
+        self._pattern = re.compile(r"(?<![\w.]){}(?![\w.])".format(
+            re.escape(name)))
+
+    def handshake_time(self):
+        """Seconds from launch to attaching to the controller, or None"""
+        if self.launched is None or self.attached is None:
+            return None
+        return self.attached - self.launched
+
+
+class launch_scheduler:
+    """
+    Decides when each agent of a run is started.
+
+    With wave_size 0 every agent is started on the first tick(), which is how
+    runs have always been launched. Otherwise agents wait until the controller
+    reports it is ready (or 'ready_timeout' seconds pass), then start
+    'wave_size' at a time. The next wave starts once the previous one has
+    attached (or 'wave_timeout' seconds pass), and no more than 'max_pending'
+    agents are ever launched without having attached yet (0 = no limit).
+    """
+
+    def __init__(self,
+                 wave_size=0,
+                 max_pending=0,
+                 ready_timeout=60,
+                 wave_timeout=120,
+                 ready_pattern=READY_PATTERN,
+                 attach_pattern=ATTACH_PATTERN,
+                 clock=time.monotonic):
+        self.wave_size = int(wave_size)
+        self.max_pending = int(max_pending)
+        self.ready_timeout = ready_timeout
+        self.wave_timeout = wave_timeout
+        self._ready_pattern = re.compile(ready_pattern)
+        self._attach_pattern = re.compile(attach_pattern)
+        self._clock = clock
+        self.agents = []
+        self.ready = None
+        self.started = clock()
+        self._wave = 0
+        self._wave_started = None
+
+    def add(self, name, start):
+        """
+        Queues an agent.
+        :param name: The SPECjbb agent name
+        :param start: Called (without arguments) to launch the agent
+        """
+        self.agents.append(agent(name, start))
+
+    def controller_line(self, line):
+        """Feeds a line of controller output to the scheduler"""
+        now = self._clock()
+        if self.ready is None and self._ready_pattern.search(line):
+            self.ready = now
+        if self._attach_pattern.search(line):
+            for a in self.agents:
+                if a.launched is not None and a.attached is None and a._pattern.search(
+                        line):
+                    a.attached = now
+                    return a
+        return None
+
+    def pending(self):
+        """Returns the agents that have been launched but haven't attached"""
+        return [
+            a for a in self.agents
+            if a.launched is not None and a.attached is None
+        ]
+
+    def waiting(self):
+        """Returns the agents that haven't been launched yet"""
+        return [a for a in self.agents if a.launched is None]
+
+    def done(self):
+        return not self.waiting()
+
+    def waves(self):
+        """Returns the number of waves launched so far"""
+        return self._wave
+
+    def _launch(self, agents, now):
+        self._wave += 1
+        self._wave_started = now
+        for a in agents:
+            a.wave = self._wave
+            a.launched = now
+            a.start()
+        return agents
+
+    def tick(self):
+        """
+        Launches every agent that is due.
+        :return: The agents launched by this call
+        """
+        now = self._clock()
+        waiting = self.waiting()
+        if not waiting:
+            return []
+        if self.wave_size <= 0:
+            return self._launch(waiting, now)
+
+        if self.ready is None and now - self.started < self.ready_timeout:
+            return []
+
+        pending = self.pending()
+        if self._wave_started is not None:
+            wave_pending = [a for a in pending if a.wave == self._wave]
+            if wave_pending and now - self._wave_started < self.wave_timeout:
+                return []
+
+        count = self.wave_size
+        if self.max_pending > 0:
+            count = min(count, self.max_pending - len(pending))
+        if count <= 0:
+            return []
+
+        return self._launch(waiting[:count], now)
+
+    def report(self):
+        """
+        Returns a list of rows (agent, wave, launched, attached, time to handshake),
+        with times in seconds since the scheduler was created.
+        """
+
+        def _rel(t):
+            return None if t is None else round(t - self.started, 3)
+
+        return [(a.name, a.wave, _rel(a.launched), _rel(a.attached),
+                 None if a.handshake_time() is None else round(
+                     a.handshake_time(), 3)) for a in self.agents]
+
+    def write_report(self, path):
+        """Writes report() to 'path' as a .csv file"""
+        with open(path, 'w') as f:
+            f.write("Agent,Wave,Launched (s),Attached (s),Time to handshake (s)\n")
+            for row in self.report():
+                f.write(",".join("" if v is None else str(v)
+                                 for v in row) + "\n")
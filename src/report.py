@@ -0,0 +1,234 @@
+"""
+This module reads SPECjbb2015 HTML reports as a stream, in place of the
+line-by-line regular expressions of Rollup.pl's GetIRData.
+
+The report is fed to an HTML parser a chunk at a time (gzip compressed
+reports are decompressed as they're read), and only the text of the
+current block or table row is held in memory, so a report_level 3 report
+costs no more memory than a level 0 one.
+
+From the report it extracts the headline metrics (max-jOPS,
+critical-jOPS and the HBIR settled/attempted values) and every table of
+response time percentiles per RT curve step.
+"""
+import fnmatch
+import gzip
+import os
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+"""
+max_jops, critical_jops: the headline metrics, None when missing
+hbir_settled, hbir_attempted: the high bound injection rate settled at and attempted, None when missing
+rt_percentiles: the RtPercentiles of every step of every response time percentile table, in order
+"""
+Report = namedtuple('Report', [
+    'max_jops', 'critical_jops', 'hbir_settled', 'hbir_attempted',
+    'rt_percentiles'
+])
+
+"""
+step: the step's label, the first cell of its row (e.g. '10%' or an IR)
+percentiles: percentile => response time, in the order of the table's columns
+    (min is the 0th percentile, median the 50th and max the 100th)
+"""
+RtPercentiles = namedtuple('RtPercentiles', ['step', 'percentiles'])
+
+# bytes read (and fed to the parser) at a time
+CHUNK = 2**16
+# report file names, in order of preference
+REPORTS = ['*.html', '*.html.gz', '*.htm']
+
+_MAX_JOPS = re.compile(r'(\d+)\s+SPECjbb2015-\S+\s+max-jOPS')
+_CRITICAL_JOPS = re.compile(r'(\d+)\s+SPECjbb2015-\S+\s+critical-jOPS')
+# the first number after the word, it may share a table row (or block) with the other
+_SETTLED = re.compile(r'settled.*?\s(\d+)')
+_ATTEMPTED = re.compile(r'attempted.*?\s(\d+)')
+_HEADLINES = [
+    ('max_jops', _MAX_JOPS),
+    ('critical_jops', _CRITICAL_JOPS),
+    ('hbir_settled', _SETTLED),
+    ('hbir_attempted', _ATTEMPTED),
+]
+# characters of text held before it's matched even though its block hasn't ended
+_TEXT_LIMIT = 2**16
+_PERCENTILE = re.compile(
+    r'^(?:p\s*(\d+(?:\.\d+)?)|(\d+(?:\.\d+)?)\s*-?\s*(?:th|st|nd|rd)?'
+    r'(?:[\s-]*percentile)?)(?:\s*\(.*\))?$', re.I)
+_NAMED = {'min': 0.0, 'median': 50.0, 'max': 100.0}
+_NUMBER = re.compile(r'^-?\d+(?:\.\d+)?')
+_THOUSANDS = re.compile(r'(?<=\d),(?=\d{3}\b)')
+
+# text in these elements ends where they end
+_BLOCKS = {
+    'title', 'p', 'div', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'caption',
+    'table', 'tr', 'pre'
+}
+
+
+def percentile(header):
+    """Returns the percentile a table column header names ('p99', '99th percentile', 'median', ...), or None"""
+    header = header.strip().lower()
+    name = header.split(' ')[0]
+    if name in _NAMED:
+        return _NAMED[name]
+    m = _PERCENTILE.match(header)
+    if m:
+        value = float(m.group(1) or m.group(2))
+        return value if 0 <= value <= 100 else None
+    return None
+
+
+class _Table:
+    """Called internally only.  A table being parsed, its columns are known once its first row ends"""
+
+    def __init__(self):
+        self.columns = None
+        self.row = None
+        self.cell = None
+
+
+class ReportParser(HTMLParser):
+    """
+    Incremental parser of a SPECjbb2015 HTML report, feed() it the report in pieces
+    and close() it to get its Report.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._text = []
+        self._text_size = 0
+        self._tables = []
+        self._percentiles = []
+        self._values = {
+            'max_jops': None,
+            'critical_jops': None,
+            'hbir_settled': None,
+            'hbir_attempted': None
+        }
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _BLOCKS or tag == 'br':
+            self._flush()
+        if tag == 'table':
+            self._tables.append(_Table())
+        elif self._tables and tag == 'tr':
+            # the previous row may not have been closed
+            self._end_row()
+            self._tables[-1].row = []
+        elif self._tables and tag in ('td', 'th'):
+            self._end_cell()
+            self._tables[-1].cell = []
+        if tag in ('td', 'th', 'br'):
+            # cells are words of their row's text
+            self._text.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th'):
+            self._end_cell()
+        elif tag == 'tr':
+            self._end_row()
+        if tag in _BLOCKS:
+            self._flush()
+        if tag == 'table' and self._tables:
+            self._end_row()
+            self._tables.pop()
+
+    def handle_data(self, data):
+        self._text.append(data)
+        self._text_size += len(data)
+        if self._text_size > _TEXT_LIMIT:
+            self._flush()
+        if self._tables and self._tables[-1].cell is not None:
+            self._tables[-1].cell.append(data)
+
+    def _end_cell(self):
+        table = self._tables[-1] if self._tables else None
+        if table is None or table.cell is None:
+            return
+        if table.row is None:
+            table.row = []
+        table.row.append(" ".join("".join(table.cell).split()))
+        table.cell = None
+
+    def _end_row(self):
+        """Called internally only.  The first row of a table names its columns, the others are steps"""
+        if not self._tables:
+            return
+        self._end_cell()
+        table = self._tables[-1]
+        row, table.row = table.row, None
+        if not row:
+            return
+        if table.columns is None:
+            columns = [percentile(h) for h in row[1:]]
+            # a table of something else, its rows are skipped
+            if sum(p is not None for p in columns) < 2:
+                columns = []
+            table.columns = columns
+            return
+        percentiles = []
+        for p, value in zip(table.columns, row[1:]):
+            m = _NUMBER.match(_THOUSANDS.sub('', value))
+            if p is not None and m:
+                percentiles.append((p, float(m.group(0))))
+        if percentiles:
+            self._percentiles.append(
+                RtPercentiles(row[0], dict(percentiles)))
+
+    def _flush(self):
+        """Called internally only.  Matches the headline metrics against the text of the block that ended"""
+        if not self._text:
+            return
+        text = _THOUSANDS.sub('', " ".join("".join(self._text).split()))
+        self._text = []
+        self._text_size = 0
+        for name, regex in _HEADLINES:
+            m = regex.search(text)
+            if m:
+                self._values[name] = int(m.group(1))
+
+    def close(self):
+        """Finishes parsing, returns the Report"""
+        super().close()
+        while self._tables:
+            self._end_row()
+            self._tables.pop()
+        self._flush()
+        return Report(rt_percentiles=self._percentiles, **self._values)
+
+
+def open_text(path):
+    """Opens the text file at 'path' for reading, decompressing it as it's read if its name ends in '.gz'"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', errors='replace')
+    return open(path, errors='replace')
+
+
+def parse(f, chunk=CHUNK):
+    """Parses the report read from the text file object 'f', 'chunk' characters at a time, returns its Report"""
+    parser = ReportParser()
+    while True:
+        data = f.read(chunk)
+        if not data:
+            break
+        parser.feed(data)
+    return parser.close()
+
+
+def read(path, chunk=CHUNK):
+    """Returns the Report of the (optionally gzip compressed) HTML report at 'path'"""
+    with open_text(path) as f:
+        return parse(f, chunk)
+
+
+def find(path):
+    """Returns the HTML report in the directory 'path' (the first of REPORTS found, by name), or None"""
+    names = sorted(os.listdir(path))
+    for pattern in REPORTS:
+        for name in names:
+            if fnmatch.fnmatch(name, pattern) and os.path.isfile(
+                    os.path.join(path, name)):
+                return os.path.join(path, name)
+    return None
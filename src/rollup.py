@@ -0,0 +1,257 @@
+"""
+This module rolls the results of a set of SPECjbb2015 runs up into one CSV
+file, in place of scripts/Rollup.pl.
+
+Every run directory is analyzed in its own worker process (its report,
+controller.out, GC log and sut.txt), and the rows are written in the order
+of the directory names, whatever order the workers finish in.
+
+The analysis of a run is cached next to it (CACHE_FILE), keyed by the size
+and modification time of the files it read, so rolling up a results tree
+again only analyzes the runs that changed.
+"""
+import csv
+import fnmatch
+import json
+import os
+import re
+from collections import namedtuple
+from multiprocessing import Pool
+
+from src import controller_log, gc_log, report
+
+"""
+The columns of the rollup, the GC columns are those of src.gc_log.RollupColumns.
+"""
+RollupHeader = [
+    "RunID",
+    "MaxIR",
+    "CriIR",
+    "HBIR Settled",
+    "HBIR Attempted",
+    "GC Start Time",
+    "GC End Time",
+    "GC SS Period",
+] + [label for label, _ in gc_log.RollupColumns] + ["JVM Options"]
+
+# GC logs looked for in a run directory, in order of preference
+GC_LOGS = [
+    'Group1.Backend.JVM2.GC.log',
+    '*Backend*GC*.log',
+    '*GC*.log',
+    '*gc*.log',
+]
+# seconds of the steady state window the GC data is taken from, counted back from its end
+GC_WINDOW = 600
+# the analysis of a run, saved in its directory
+CACHE_FILE = '.rollup.json'
+# bump when rows change, so older cached analyses are redone
+CACHE_VERSION = 2
+# the files an analysis reads, a change to any of them invalidates its cache
+INPUTS = report.REPORTS + ['controller.out', 'sut.txt'] + GC_LOGS
+
+_JVM_OPTIONS = re.compile(r'^All JVM options(.*)$')
+
+
+def run_dirs(path):
+    """Returns the run directories (names holding a timestamp) in 'path', sorted by name"""
+    return sorted(
+        name for name in os.listdir(path)
+        if re.search(r'\d{6}', name) and os.path.isdir(os.path.join(path, name)))
+
+
+def _find(path, patterns):
+    """Called internally only.  Returns the first file in 'path' matching one of 'patterns', in order"""
+    names = sorted(os.listdir(path))
+    for pattern in patterns:
+        for name in names:
+            if fnmatch.fnmatch(name, pattern) and os.path.isfile(
+                    os.path.join(path, name)):
+                return os.path.join(path, name)
+    return None
+
+
+def gc_log_path(path):
+    """Returns the GC log of the run directory 'path' (the first of GC_LOGS found), or None"""
+    return _find(path, GC_LOGS)
+
+
+def ir_data(path):
+    """
+    Reads the max-jOPS, critical-jOPS and HBIR values from the first HTML report in 'path' (see src.report).
+    :return: [MaxIR, CriIR, HBIR Settled, HBIR Attempted], empty strings for missing values
+    """
+    path = report.find(path)
+    if path is None:
+        return ["", "", "", ""]
+    r = report.read(path)
+    return [
+        "" if v is None else str(v)
+        for v in (r.max_jops, r.critical_jops, r.hbir_settled,
+                  r.hbir_attempted)
+    ]
+
+
+def jvm_options(path):
+    """Returns the 'All JVM options' of sut.txt in 'path'"""
+    options = []
+    sut = os.path.join(path, 'sut.txt')
+    if os.path.exists(sut):
+        with open(sut, errors='replace') as f:
+            for line in f:
+                m = _JVM_OPTIONS.match(line.rstrip('\r\n'))
+                if m:
+                    options.append(m.group(1).strip())
+    return " ".join(options)
+
+
+"""
+The analysis of a run directory.
+ir: [MaxIR, CriIR, HBIR Settled, HBIR Attempted] (see ir_data)
+controller: the src.controller_log.Summary of controller.out, None without one
+gc: the src.gc_log.GcSummary of the last GC_WINDOW seconds of the steady state, None without one
+jvm_options: the JVM options from sut.txt
+messages: what went wrong
+"""
+RunAnalysis = namedtuple(
+    'RunAnalysis', ['ir', 'controller', 'gc', 'jvm_options', 'messages'])
+
+
+def analyze_run(path):
+    """Analyzes the run directory 'path', returns a RunAnalysis"""
+    messages = []
+    controller = gc = None
+    controller_out = os.path.join(path, 'controller.out')
+    if os.path.exists(controller_out):
+        controller = controller_log.summarize_file(controller_out)
+        log = gc_log_path(path)
+        if log is None:
+            messages.append("No GC log found")
+        else:
+            try:
+                gc = gc_log.analyze(log, controller.end - GC_WINDOW,
+                                    controller.end)
+            except Exception as e:
+                messages.append("{}: {}".format(os.path.basename(log), e))
+    else:
+        messages.append("No controller.out found")
+    return RunAnalysis(
+        ir_data(path), controller, gc, jvm_options(path), messages)
+
+
+def rollup_dir(path):
+    """
+    Analyzes the run directory 'path'.
+    :return: The row of the run (see RollupHeader), and the messages of the analysis
+    """
+    a = analyze_run(path)
+    gc_columns = [""] * (3 + len(gc_log.RollupColumns))
+    if a.controller is not None:
+        s = a.controller
+        gc_columns[:3] = [str(s.start), str(s.end), str(s.end - s.start)]
+    if a.gc is not None:
+        gc_columns[3:] = gc_log.rollup_row(a.gc)
+    row = [os.path.basename(path)] + a.ir + gc_columns + [a.jvm_options]
+    return row, a.messages
+
+
+def fingerprint(path):
+    """
+    Returns what the analysis of the run directory 'path' depends on:
+    the name, size and modification time of each of its input files.
+    """
+    files = []
+    for name in sorted(os.listdir(path)):
+        if any(fnmatch.fnmatch(name, p) for p in INPUTS):
+            try:
+                st = os.stat(os.path.join(path, name))
+            except OSError:
+                continue
+            files.append([name, st.st_size, st.st_mtime_ns])
+    return {"version": CACHE_VERSION, "window": GC_WINDOW, "files": files}
+
+
+def load_cached(path, key):
+    """
+    Returns the cached (row, messages) of the run directory 'path',
+    or None if there are none for 'key' (see fingerprint).
+    """
+    try:
+        with open(os.path.join(path, CACHE_FILE)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("key") != key:
+        return None
+    return cached.get("row"), cached.get("messages", [])
+
+
+def save_cached(path, key, row, messages):
+    """Saves the analysis of the run directory 'path', read-only results just aren't cached"""
+    try:
+        with open(os.path.join(path, CACHE_FILE), 'w') as f:
+            json.dump({"key": key, "row": row, "messages": messages}, f)
+    except OSError:
+        pass
+
+
+def _work(path):
+    """
+    Called internally only.  Runs rollup_dir in a worker, so one broken directory doesn't stop the rollup.
+    :return: path, row, messages, and whether the analysis completed
+    """
+    try:
+        row, messages = rollup_dir(path)
+    except Exception as e:
+        row = [os.path.basename(path)] + [""] * (len(RollupHeader) - 1)
+        return path, row, ["Failed: {}".format(e)], False
+    return path, row, messages, True
+
+
+def rollup(path, outhandle=print, processes=None, cache=True):
+    """
+    Rolls the run directories in 'path' up into '<path>/<name of path>.csv'.
+    :param outhandle: Receives progress messages as the directories are analyzed
+    :param processes: Number of worker processes, defaults to one per CPU
+    :param cache: Reuse (and save) the analysis of runs that didn't change
+    :return: The path to the CSV file
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    path = os.path.abspath(path)
+    dirs = [os.path.join(path, d) for d in run_dirs(path)]
+    result = os.path.join(path, "{}.csv".format(os.path.basename(path)))
+    rows = {}
+    keys = {}
+    for d in dirs:
+        # keyed before the analysis, so a run changing meanwhile is redone next time
+        keys[d] = fingerprint(d)
+        cached = load_cached(d, keys[d]) if cache else None
+        if cached is not None:
+            rows[d] = cached[0]
+    todo = [d for d in dirs if d not in rows]
+    if len(todo) < len(dirs):
+        outhandle("Using the cached analysis of {} of {} runs".format(
+            len(dirs) - len(todo), len(dirs)))
+    if todo:
+        processes = min(processes or os.cpu_count() or 1, len(todo))
+        pool = Pool(processes=processes)
+        try:
+            for done, (d, row, messages, ok) in enumerate(
+                    pool.imap_unordered(_work, todo), 1):
+                outhandle("Analyzed {} ({} of {})".format(
+                    os.path.basename(d), done, len(todo)))
+                for m in messages:
+                    outhandle("    {}".format(m))
+                rows[d] = row
+                if cache and ok:
+                    save_cached(d, keys[d], row, messages)
+        finally:
+            pool.close()
+            pool.join()
+    with open(result, 'w', newline='') as f:
+        out = csv.writer(f)
+        out.writerow(RollupHeader)
+        for d in dirs:
+            out.writerow(rows[d])
+    return result
@@ -0,0 +1,154 @@
+"""
+This module follows the throughput-responsetime (RT) curve of a running
+SPECjbb2015 benchmark from the controller's output, one line at a time,
+so a run that is going badly can be stopped while it runs instead of being
+found out by the rollup afterwards.
+
+RtMonitor keeps the current state of the curve (the IR % being run, the
+last rIR/aIR/PR and the retries), and an AbortPolicy decides from that
+state whether the run is worth finishing.
+"""
+import os
+import statistics
+
+from src import catalog, controller_log
+
+
+class AbortPolicy:
+    """
+    When to give up on a run while its RT curve is being built.
+
+    A run is aborted when:
+        - 'max_low_failures' steps (0 = never) failed below 'low_percent' % of the high bound, or
+        - a step failed, or max-jOPS settled, below 'min_fraction' of 'baseline' max-jOPS
+          (the max-jOPS this configuration usually reaches, None = no baseline)
+    """
+
+    def __init__(self,
+                 low_percent=50,
+                 max_low_failures=0,
+                 baseline=None,
+                 min_fraction=0.5):
+        self.low_percent = low_percent
+        self.max_low_failures = int(max_low_failures)
+        self.baseline = baseline
+        self.min_fraction = min_fraction
+
+    def check(self, monitor):
+        """
+        Returns why the run followed by 'monitor' should be aborted, or None to let it go on.
+        """
+        if self.max_low_failures:
+            low = [
+                s for s in monitor.failed_steps
+                if s.percent is not None and s.percent < self.low_percent
+            ]
+            if len(low) >= self.max_low_failures:
+                return "{} steps failed below {}% of the high bound ({})".format(
+                    len(low), self.low_percent,
+                    ", ".join("{}%".format(s.percent) for s in low))
+        if self.baseline:
+            floor = self.baseline * self.min_fraction
+            if monitor.max_jops is not None and monitor.max_jops < floor:
+                return "max-jOPS settled at {}, below {:.0%} of the baseline {}".format(
+                    monitor.max_jops, self.min_fraction, self.baseline)
+            for s in monitor.failed_steps:
+                if s.ir < floor:
+                    return "a step failed at IR {}, below {:.0%} of the baseline {}".format(
+                        s.ir, self.min_fraction, self.baseline)
+        return None
+
+
+class RtMonitor:
+    """
+    The live state of a run's RT curve, updated by line() with each line of controller output.
+    phase: the last src.controller_log.Phases boundary seen, None before the first
+    step: the last src.controller_log.RtStep, None before the first
+    steps: how many steps were run
+    failed_steps: the RtSteps that ended with a failed status
+    failures: how many times the controller reported a failure and retried
+    retries_left: the overall retries the controller has left, None until a step fails
+    max_jops: the presumed max-jOPS, once the curve is done
+    abort: why the policy decided to abort the run, None while it hasn't
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy
+        self.phase = None
+        self.step = None
+        self.steps = 0
+        self.failed_steps = []
+        self.failures = 0
+        self.retries_left = None
+        self.max_jops = None
+        self.abort = None
+
+    def line(self, line):
+        """
+        Feeds a line of controller output to the monitor, and applies the policy if it changed anything.
+        :return: The record of the line (see src.controller_log.parse_line), or None
+        """
+        record = controller_log.parse_line(line)
+        if record is None:
+            return None
+        if isinstance(record, controller_log.RtStep):
+            self.step = record
+            self.steps += 1
+            if record.status is not None and record.status.lower().startswith(
+                    "fail"):
+                self.failed_steps.append(record)
+        elif isinstance(record, controller_log.Failure):
+            self.failures += 1
+            self.retries_left = record.retries_left
+        else:
+            self.phase = record.name
+            if record.name == "max_jops":
+                self.max_jops = record.value
+        if self.policy is not None and self.abort is None:
+            self.abort = self.policy.check(self)
+        return record
+
+    def status(self):
+        """Returns the current state as one line of text"""
+        if self.step is None:
+            return "RT curve not started{}".format(
+                " ({})".format(self.phase) if self.phase else "")
+        s = self.step
+        text = "IR {}{} (rIR:aIR:PR = {}:{}:{}), {} steps, {} failed, {} failures".format(
+            s.ir, " ({}%)".format(s.percent) if s.percent is not None else "",
+            s.rir, s.air, s.pr, self.steps, len(self.failed_steps),
+            self.failures)
+        if self.retries_left is not None:
+            text += ", {} retries left".format(self.retries_left)
+        if self.max_jops is not None:
+            text += ", max-jOPS {}".format(self.max_jops)
+        return text
+
+
+def catalog_baseline(path, runs=5, **find):
+    """
+    Returns the median max-jOPS of the newest 'runs' successful runs in the results catalog at 'path'
+    matching 'find' (see src.catalog.Catalog.find), or None if there are none.
+    """
+    if not os.path.exists(path):
+        return None
+    with catalog.Catalog(path) as c:
+        jops = [
+            r["max_jops"] for r in c.find(**find)
+            if r["exit_code"] == 0 and r["max_jops"]
+        ][:runs]
+    return statistics.median(jops) if jops else None
+
+
+def policy(settings, db=None, **find):
+    """
+    Builds the AbortPolicy of a run's 'abort_policy' settings (the keyword arguments of AbortPolicy).
+    A 'baseline' of "catalog" is looked up with catalog_baseline(db, **find), and left out if there is none.
+    :return: An AbortPolicy, or None if 'settings' is empty
+    """
+    if not settings:
+        return None
+    settings = dict(settings)
+    if settings.get("baseline") == "catalog":
+        settings["baseline"] = catalog_baseline(db, **find) if db else None
+    return AbortPolicy(**settings)
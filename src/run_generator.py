@@ -8,16 +8,75 @@ This module defines a RunGenerator that:
 The intention is that you pass a Tate Config into the
 RunGenerator, and it updates itself to have a list of
 all the runs present in that configuration.
+
+A RunList entry with a 'sweep' stands for one run per point of the sweep
+(see expand). Sweeps are expanded as the runs are asked for, so the first
+run of a sweep of millions of points starts right away, and only the run
+being handed out is held in memory.
 """
+import itertools
 import os
-from src.validate import TemplateDataSchema, RunConfigSchema, random_run_id
+from src.validate import TemplateDataValidator, RunConfigValidator, check_sweep_tags, random_run_id
+
+
+def _values(values):
+    """Called internally only.  The values of a sweep, a list or a range (see src.validate.SweepRange)"""
+    if isinstance(values, dict):
+        return range(*values["range"])
+    return values
+
+
+def _axis(axis):
+    """
+    Called internally only.  Returns the length of a sweep axis and its columns,
+    (section, name, values) for each arg and prop the axis sets.
+    """
+    columns = [(section, name, _values(values))
+               for section in ("args", "props_extra")
+               for name, values in sorted(axis.get(section, {}).items())]
+    return len(columns[0][2]), columns
+
+
+def size(run):
+    """Returns how many runs the RunList entry 'run' stands for (see expand)"""
+    count = 1
+    for axis in run.get("sweep", []):
+        count *= _axis(axis)[0]
+    return count
+
+
+def expand(run):
+    """
+    Yields the runs of a validated RunList entry: the entry itself, or one run per point of its 'sweep'.
+    A sweep is a list of axes (see src.validate.SweepAxisSchema), its points are every combination of
+    a point of each axis, the last axis changing fastest. Each run takes the entry's args and props_extra,
+    with the values of its point in their place, and the entry's tag (if any) followed by the point's index.
+    """
+    if "sweep" not in run:
+        yield run
+        return
+    base = {k: v for k, v in run.items() if k != "sweep"}
+    axes = [_axis(axis) for axis in run["sweep"]]
+    points = itertools.product(*[range(length) for length, _ in axes])
+    for i, point in enumerate(points):
+        r = dict(base)
+        r["args"] = dict(base["args"])
+        r["props_extra"] = dict(base.get("props_extra", {}))
+        for index, (_, columns) in zip(point, axes):
+            for section, name, values in columns:
+                value = values[index]
+                # props are strings, whether they came from a list or a range
+                r[section][name] = str(value) if section == "props_extra" else value
+        if "tag" in base:
+            r["tag"] = "{}-{}".format(base["tag"], i)
+        yield r
 
 
 class RunGenerator:
     """
     This class is responsible for taking a Tate config and
-    updating self.runs with a list of validated runs that
-    you can then pass to benchmark_run.SpecJBBRun for a successful
+    validating its runs, which self.runs then generates one at a
+    time for you to pass to benchmark_run.SpecJBBRun for a successful
     benchmarking run.
 
     The accompanying test module contains examples for how
@@ -26,62 +85,93 @@ class RunGenerator:
 
     def __init__(self, TemplateData=None, RunList=None):
         """
-        Initializes this instance to hold all the validated runs in the
+        Initializes this instance to generate all the validated runs in the
         provided configuration.
 
         :param TemplateData: A TemplateData object. (See src.validate.TemplateDataSchema)
         :param RunList: A list of RunConfig objects. (See src.validate.RunConfigSchema)
         """
-        self.runs = []
+        # validated RunList entries, with their validated templates
+        self._entries = []
+        # validated templates, by name, so each is validated once however many runs use it
+        templates = {}
 
-        # let's go ahead and populate everything
         for run in RunList:
-            run = RunConfigSchema.validate(run)
-            template = TemplateData.get(run["template_type"])
-            template = TemplateDataSchema.validate(template)
-
-            # populate prop_options
-            props = template.get("prop_options", dict()).copy()
-            # populate arguments
-            if "translations" in template:
-                props.update({
-                    translation: run["args"][arg]
-                    for arg, translation in template["translations"].items()
-                })
-            if "props_extra" in run:
-                props.update(run["props_extra"])
-
-            if "prop_options" in template:
-                # and let's peek for injector count (specjbb.txi.pergroup.count)
-                injectors = template["prop_options"].get(
-                    "specjbb.txi.pergroups.count", 1)
-                # and let's peek for backend count (specjbb.group.count)
-                backends = template["prop_options"].get("specjbb.group.count",
-                                                        1)
-            else:
-                injectors = 1
-                backends = 1
-
-            self.runs.append({
-                'controller': {
-                    "type": template["run_type"],
-                },
-                'backends':
-                backends,
-                'injectors':
-                injectors,
-                'cwd':
-                template["cwd"] if "cwd" in template else os.getcwd(),
-                'java':
-                template["java"],
-                'jar':
-                template["jar"],
-                'tag':
-                run["tag"] if "tag" in run else random_run_id(),
-                'times':
-                run["times"],
-                'props':
-                props,
-                'props_file':
-                template.get("props_file", 'specjbb2015.props'),
+            run = RunConfigValidator.validate(run)
+            template = templates.get(run["template_type"])
+            if template is None:
+                template = TemplateDataValidator.validate(
+                    TemplateData.get(run["template_type"]))
+                templates[run["template_type"]] = template
+            self._entries.append((run, template))
+        # the tags of the runs of a sweep name their results directories, no other run can take one
+        check_sweep_tags([run for run, _ in self._entries])
+
+    def __len__(self):
+        """How many runs self.runs generates, without generating them"""
+        return sum(size(run) for run, _ in self._entries)
+
+    @property
+    def runs(self):
+        """Generates the runs of the configuration, in order, expanding sweeps as it goes"""
+        for run, template in self._entries:
+            for r in expand(run):
+                yield self._populate(r, template)
+
+    def _populate(self, run, template):
+        """Called internally only.  Returns what SpecJBBRun needs for 'run' of 'template'"""
+        # populate prop_options
+        props = template.get("prop_options", dict()).copy()
+        # populate arguments
+        if "translations" in template:
+            props.update({
+                translation: run["args"][arg]
+                for arg, translation in template["translations"].items()
             })
+        if "props_extra" in run:
+            props.update(run["props_extra"])
+
+        if "prop_options" in template:
+            # and let's peek for injector count (specjbb.txi.pergroup.count)
+            injectors = template["prop_options"].get(
+                "specjbb.txi.pergroups.count", 1)
+            # and let's peek for backend count (specjbb.group.count)
+            backends = template["prop_options"].get("specjbb.group.count",
+                                                    1)
+        else:
+            injectors = 1
+            backends = 1
+
+        return {
+            'controller': {
+                "type": template["run_type"],
+            },
+            'backends':
+            backends,
+            'injectors':
+            injectors,
+            'cwd':
+            template["cwd"] if "cwd" in template else os.getcwd(),
+            'java':
+            template["java"],
+            'jar':
+            template["jar"],
+            'tag':
+            run["tag"] if "tag" in run else random_run_id(),
+            'times':
+            run["times"],
+            'props':
+            props,
+            'props_file':
+            template.get("props_file", 'specjbb2015.props'),
+            'cpus':
+            run["cpus"],
+            'numa_nodes':
+            run["numa_nodes"],
+            'binding':
+            run["binding"],
+            'memory_policy':
+            run["memory_policy"],
+            'abort_policy':
+            run.get("abort_policy"),
+        }
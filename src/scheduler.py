@@ -0,0 +1,197 @@
+"""
+This module runs independent benchmark runs at the same time.
+
+Each run declares how many CPUs it needs, and the scheduler hands every
+running run its own slot: a set of CPUs no other run is using, and a
+controller port no other run is listening on. At most 'parallel' runs
+execute at once, the rest wait (in order) until enough CPUs are free.
+"""
+import itertools
+import logging
+import os
+import threading
+
+log = logging.getLogger(__name__)
+
+# SPECjbb's default for specjbb.controller.port
+CONTROLLER_PORT = 24000
+# distance between the controller ports of two slots, leaving room for
+# the other listeners a controller opens next to its port
+PORT_STRIDE = 10
+
+
+def online_cpus():
+    """Returns the sorted list of CPUs this process may run on"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+class CpuPin:
+    """
+    A Popen preexec_fn that pins the child to 'cpus'.
+    It's a class (and not a closure) so TaskRunners using it stay pickle-able.
+    """
+
+    def __init__(self, cpus):
+        self.cpus = sorted(cpus)
+
+    def __call__(self):
+        os.sched_setaffinity(0, self.cpus)
+
+    def __repr__(self):
+        return "CpuPin({})".format(self.cpus)
+
+
+class RunSlot:
+    """
+    The resources handed to one run while it executes.
+
+    cpus: the CPUs reserved for the run, or None when it may use every CPU
+    port: the controller port reserved for the run
+    """
+
+    def __init__(self, index, cpus, port):
+        self.index = index
+        self.cpus = cpus
+        self.port = port
+
+    def preexec_fn(self):
+        """Returns a Popen preexec_fn applying this slot's CPUs, or None"""
+        if self.cpus is None:
+            return None
+        return CpuPin(self.cpus)
+
+    def __repr__(self):
+        return "RunSlot(index={}, cpus={}, port={})".format(
+            self.index, self.cpus, self.port)
+
+
+class RunScheduler:
+    """
+    Executes submitted runs, up to 'parallel' at a time, each on its own
+    thread (runs spend their time waiting on JVMs, not in Python).
+    """
+
+    def __init__(self,
+                 parallel=1,
+                 cpus=None,
+                 base_port=CONTROLLER_PORT,
+                 port_stride=PORT_STRIDE,
+                 logger=log):
+        """
+        :param parallel: The most runs executing at once
+        :param cpus: The CPUs that may be handed out. Defaults to every online CPU.
+        :param base_port: The controller port of the first slot
+        """
+        if int(parallel) < 1:
+            raise Exception(
+                "parallel must be at least 1, not {}".format(parallel))
+        self.parallel = int(parallel)
+        self.cpus = sorted(cpus) if cpus is not None else online_cpus()
+        self.base_port = base_port
+        self.port_stride = port_stride
+        self.log = logger
+        self._jobs = []
+
+    def default_cpus(self):
+        """The CPUs a run gets when it doesn't declare how many it needs"""
+        return max(1, len(self.cpus) // self.parallel)
+
+    def submit(self, name, target, cpus=0):
+        """
+        Queues a run.
+        :param name: A name for the run, used in logging
+        :param target: Called with a RunSlot to execute the run. Its return value is the run's result.
+        :param cpus: How many CPUs the run needs (0 = an equal share)
+        """
+        self._jobs.append(self._job(name, target, cpus))
+
+    def _job(self, name, target, cpus=0):
+        """Called internally only.  A queued run, with the CPUs it will get"""
+        cpus = int(cpus) if cpus else self.default_cpus()
+        if cpus > len(self.cpus):
+            self.log.warning(
+                "{} asks for {} CPUs but only {} are available, it will run alone".
+                format(name, cpus, len(self.cpus)))
+            cpus = len(self.cpus)
+        return name, target, cpus
+
+    def _take_cpus(self, free, count):
+        """
+        Called internally only.  Removes 'count' CPUs from 'free' and returns them,
+        preferring a contiguous block (neighbouring CPUs usually share a socket).
+        """
+        for start in range(len(free) - count + 1):
+            block = free[start:start + count]
+            if block[-1] - block[0] == count - 1:
+                break
+        else:
+            block = free[:count]
+        for c in block:
+            free.remove(c)
+        return block
+
+    def run(self, jobs=()):
+        """
+        Executes every submitted run and waits for all of them to finish.
+        :param jobs: More runs to execute after the submitted ones, (name, target, cpus) like submit()'s
+            arguments. It's only iterated as slots free up, so it may generate the runs as they're needed.
+        :return: The results of the runs, in the order they were submitted
+        """
+        jobs = itertools.chain(self._jobs,
+                               (self._job(*job) for job in jobs))
+        self._jobs = []
+        results = []
+        errors = []
+        free_cpus = list(self.cpus)
+        free_slots = list(range(self.parallel))
+        done = threading.Condition()
+
+        def _execute(i, name, target, slot, cpus):
+            try:
+                results[i] = target(slot)
+            except Exception as e:
+                self.log.error("{} failed: {}".format(name, e))
+                errors.append((name, e))
+            finally:
+                with done:
+                    free_cpus.extend(cpus)
+                    free_cpus.sort()
+                    free_slots.append(slot.index)
+                    free_slots.sort()
+                    done.notify()
+                self.log.info("{} finished".format(name))
+
+        threads = []
+        with done:
+            for i, (name, target, count) in enumerate(jobs):
+                results.append(None)
+                # runs start in the order they were submitted
+                while not free_slots or len(free_cpus) < count:
+                    done.wait(1)
+                index = free_slots.pop(0)
+                cpus = self._take_cpus(free_cpus, count)
+                slot = RunSlot(index,
+                               cpus if len(cpus) < len(self.cpus) else None,
+                               self.base_port + index * self.port_stride)
+                self.log.info("starting {} on {}".format(name, slot))
+                t = threading.Thread(
+                    target=_execute,
+                    args=(i, name, target, slot, cpus),
+                    name=name)
+                t.daemon = True
+                t.start()
+                # only keep the threads still running, however many runs there are
+                threads = [t for t in threads if t.is_alive()] + [t]
+
+        for t in threads:
+            # join in short steps so the main thread still sees signals
+            while t.is_alive():
+                t.join(1)
+
+        if errors:
+            self.log.error("{} of {} runs failed".format(
+                len(errors), len(results)))
+        return results
@@ -1,3 +1,7 @@
+import codecs
+import os
+import selectors
+import time
 from threading import Thread
 from queue import Queue, Empty
 
@@ -32,13 +36,166 @@ class stream:
                 parent._active = False
 
     def readline(self):
-        if self._active:
-            try:
-                return self._queue.get_nowait()
-            except Empty:
-                return ''
-        return ''
+        # lines queued before the child exited are still handed out
+        try:
+            return self._queue.get_nowait()
+        except Empty:
+            return ''
 
     def close(self):
         if (self._active):
             self._active = False
+
+
+class linebuffer:
+    """
+    Turns raw chunks of bytes read from a pipe into complete lines.
+    Partial lines are held until the rest of the line arrives.
+    """
+
+    def __init__(self, encoding='utf-8'):
+        self._decoder = codecs.getincrementaldecoder(encoding)(
+            errors='replace')
+        self._pending = ''
+
+    def feed(self, data: bytes):
+        """
+        Adds a chunk of bytes and returns a list of every line it completed.
+        Line endings are normalized to '\\n', like a pipe opened
+        with universal_newlines=True.
+        """
+        text = self._pending + self._decoder.decode(data)
+        # a trailing '\r' might be the first half of a '\r\n'
+        held = ''
+        if text.endswith('\r'):
+            text, held = text[:-1], '\r'
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        lines = text.split('\n')
+        self._pending = lines.pop() + held
+        return [l + '\n' for l in lines]
+
+    def flush(self):
+        """Returns whatever is left over as a final (unterminated) line"""
+        rest = self._pending + self._decoder.decode(b'', final=True)
+        rest = rest.replace('\r', '\n')
+        self._pending = ''
+        return [rest] if rest else []
+
+
+class multiplexer:
+    """
+    Waits on many child pipes at once and hands each complete line to the
+    handler registered for that pipe.
+    poll() blocks until at least one pipe has data (or the timeout expires),
+    so a run with dozens of JVMs costs no CPU while they are quiet.
+    """
+
+    def __init__(self, chunk_size=65536):
+        self._selector = selectors.DefaultSelector()
+        self._chunk_size = chunk_size
+        # pipes the selector refused (e.g. pipes on Windows) fall back to
+        # the threaded 'stream' reader and are checked on every poll
+        self._polled = []
+        # files being tailed, see follow()
+        self._followed = []
+
+    def register(self, pipe, handler):
+        """
+        pipe: a pipe from Popen (stdout or stderr)
+        handler: called with each line read from 'pipe'
+        """
+        try:
+            self._selector.register(pipe.fileno(), selectors.EVENT_READ,
+                                    (handler, linebuffer()))
+            os.set_blocking(pipe.fileno(), False)
+        except (OSError, ValueError, AttributeError):
+            try:
+                self._selector.unregister(pipe.fileno())
+            except (KeyError, ValueError):
+                pass
+            self._polled.append((stream(pipe), handler))
+
+    def follow(self, path, handler):
+        """
+        Tails the file at 'path', handing each line appended to it to 'handler'.
+        Files can't be waited on like pipes, so they are read once per poll().
+        """
+        self._followed.append((open(path, 'rb'), handler, linebuffer()))
+
+    def active(self):
+        """Returns the number of pipes that have not reached EOF"""
+        return len(self._selector.get_map()) + len(self._polled)
+
+    def poll(self, timeout=None):
+        """
+        Waits up to 'timeout' seconds (forever if None) for output,
+        and dispatches every complete line that is available.
+        :return: The number of lines handed to handlers
+        """
+        if self._polled and (timeout is None or timeout > 0.05):
+            timeout = 0.05
+        count = 0
+        if self._selector.get_map():
+            events = self._selector.select(timeout)
+        else:
+            events = []
+            if timeout and not self._polled:
+                time.sleep(timeout)
+        for key, mask in events:
+            count += self._drain(key)
+        for s, handler in list(self._polled):
+            # every line is queued before the reader thread marks the end of the stream
+            done = not s._active
+            line = s.readline()
+            while line != '':
+                handler(line)
+                count += 1
+                line = s.readline()
+            if done:
+                self._polled.remove((s, handler))
+        for f, handler, buf in self._followed:
+            data = f.read(self._chunk_size)
+            while data:
+                for line in buf.feed(data):
+                    handler(line)
+                    count += 1
+                data = f.read(self._chunk_size)
+        return count
+
+    def _drain(self, key):
+        """
+        Called internally only.  Reads everything available on the pipe of 'key',
+        unregistering it at EOF.
+        :return: The number of lines handed to its handler
+        """
+        handler, buf = key.data
+        count = 0
+        while True:
+            try:
+                data = os.read(key.fd, self._chunk_size)
+            except BlockingIOError:
+                return count
+            except OSError:
+                data = b''
+            if data:
+                lines = buf.feed(data)
+            else:
+                self._selector.unregister(key.fd)
+                lines = buf.flush()
+            for line in lines:
+                handler(line)
+            count += len(lines)
+            if not data:
+                return count
+
+    def close(self):
+        """Stops watching every pipe and file"""
+        for s, handler in self._polled:
+            s.close()
+        self._polled = []
+        for f, handler, buf in self._followed:
+            for line in buf.flush():
+                handler(line)
+            f.close()
+        self._followed = []
+        self._selector.close()
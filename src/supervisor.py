@@ -0,0 +1,163 @@
+"""
+This module keeps track of the processes a run starts (JVMs and data
+collectors), each in its own process group, so they can be stopped
+together with anything they started themselves.
+
+Stopping escalates per group: SIGTERM, then SIGKILL for the groups still
+running after a timeout, and finally checks that no process of any group
+is left holding a CPU.
+"""
+import logging
+import os
+import signal
+import time
+
+log = logging.getLogger(__name__)
+
+# seconds a group gets to exit after SIGTERM
+TERM_TIMEOUT = 10
+# seconds a group gets to disappear after SIGKILL
+KILL_TIMEOUT = 5
+
+
+def process_groups(pgids, proc_root='/proc'):
+    """
+    Returns the pids of the live (not zombie) processes in each of the process groups 'pgids',
+    as a dict of pgid => pids, reading /proc once for all of them.
+    """
+    pgids = set(pgids)
+    groups = {pgid: [] for pgid in pgids}
+    if not pgids:
+        return groups
+    if not os.path.isdir(proc_root):
+        # no /proc, all we can tell is whether the groups exist
+        for pgid in pgids:
+            try:
+                os.killpg(pgid, 0)
+                groups[pgid].append(pgid)
+            except (ProcessLookupError, PermissionError):
+                pass
+        return groups
+    for name in os.listdir(proc_root):
+        if not name.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc_root, name, 'stat')) as f:
+                stat = f.read()
+        except (IOError, OSError):
+            continue
+        # the command name is in parentheses and may contain spaces
+        fields = stat[stat.rfind(')') + 2:].split()
+        state, pgrp = fields[0], int(fields[2])
+        if pgrp in pgids and state not in ('Z', 'X'):
+            groups[pgrp].append(int(name))
+    return groups
+
+
+def group_members(pgid, proc_root='/proc'):
+    """
+    Returns the pids of the live (not zombie) processes in process group 'pgid'.
+    """
+    return process_groups([pgid], proc_root)[pgid]
+
+
+def signal_process(pid, sig):
+    """
+    Sends 'sig' to the process group led by 'pid' (even after its leader exited),
+    or to 'pid' alone when it doesn't lead a group.
+    """
+    try:
+        os.killpg(pid, sig)
+        return
+    except ProcessLookupError:
+        pass
+    except PermissionError:
+        return
+    try:
+        os.kill(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class ProcessSupervisor:
+    """
+    Tracks Popen objects and stops them, together with their process group
+    when they lead one (started with start_new_session=True).
+    """
+
+    def __init__(self,
+                 term_timeout=TERM_TIMEOUT,
+                 kill_timeout=KILL_TIMEOUT,
+                 logger=log):
+        self.term_timeout = term_timeout
+        self.kill_timeout = kill_timeout
+        self.log = logger
+        self._procs = []
+
+    @staticmethod
+    def popen_kw():
+        """Returns the Popen arguments that start a process in its own group"""
+        return {"start_new_session": True}
+
+    def adopt(self, proc):
+        """Starts tracking 'proc'"""
+        self._procs.append(proc)
+        return proc
+
+    def tracked(self):
+        return list(self._procs)
+
+    def _alive(self, procs):
+        # reap our own children, so they don't linger as zombies
+        exited = [p.pid for p in procs if p.poll() is not None]
+        # one pass over /proc finds what's left of every group whose leader exited
+        groups = process_groups(exited)
+        return [p for p in procs if p.poll() is None or groups.get(p.pid)]
+
+    def _wait(self, procs, timeout):
+        deadline = time.monotonic() + timeout
+        alive = self._alive(procs)
+        while alive and time.monotonic() < deadline:
+            time.sleep(0.05)
+            alive = self._alive(alive)
+        return alive
+
+    def stop(self, procs=None):
+        """
+        Stops the groups of 'procs' (default: every tracked process).
+        :return: The processes whose groups still have live members
+        """
+        procs = self.tracked() if procs is None else list(procs)
+        alive = self._alive(procs)
+        for p in alive:
+            signal_process(p.pid, signal.SIGTERM)
+        alive = self._wait(alive, self.term_timeout)
+        if alive:
+            self.log.warning(
+                "{} process groups ignored SIGTERM for {}s, killing them".
+                format(len(alive), self.term_timeout))
+            for p in alive:
+                signal_process(p.pid, signal.SIGKILL)
+            alive = self._wait(alive, self.kill_timeout)
+        for p in procs:
+            if p not in alive and p in self._procs:
+                self._procs.remove(p)
+        if alive:
+            self.log.error("process groups {} are still running".format(
+                [p.pid for p in alive]))
+        return alive
+
+    def verify(self):
+        """Returns True if no tracked group has a live process left"""
+        return not self._alive(self._procs)
+
+
+def stop_process(proc, term_timeout=TERM_TIMEOUT, kill_timeout=KILL_TIMEOUT):
+    """
+    Stops 'proc' (a Popen), and its whole group if it leads one,
+    escalating from SIGTERM to SIGKILL.
+    :return: True if everything stopped
+    """
+    s = ProcessSupervisor(term_timeout, kill_timeout)
+    s.adopt(proc)
+    return not s.stop()
@@ -1,6 +1,8 @@
 import subprocess
 import itertools
 
+from src.supervisor import TERM_TIMEOUT, stop_process
+
 
 class TaskRunner:
     """
@@ -41,14 +43,17 @@ class TaskRunner:
 
         return out
 
-    def stop(self):
+    def stop(self, timeout=TERM_TIMEOUT):
         """
-        Stops this running task, if applicable.
+        Stops this running task, if applicable, and anything it started in its
+        process group (see `start_new_session`). The task gets `timeout` seconds
+        to exit after SIGTERM before it's killed.
+        Returns True if nothing of the task is left running.
         """
         if not self.proc:
-            return
+            return True
 
-        return self.proc.terminate()
+        return stop_process(self.proc, timeout)
 
     def start(self):
         """
@@ -0,0 +1,187 @@
+"""
+This module reads the NUMA topology of this host from sysfs
+(/sys/devices/system/node) and turns it into a binding plan
+that spreads the groups of a multi-JVM run across the nodes.
+
+The topology is probed once per session, later calls get the cached result.
+"""
+import os
+import re
+import shutil
+
+NODE_ROOT = '/sys/devices/system/node'
+
+_topologies = {}
+_numactl = []
+
+
+def parse_cpulist(text):
+    """
+    Parses a sysfs CPU list ('0-3,8-11,16').
+    :return: A sorted list of CPU numbers
+    """
+    cpus = set()
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-')
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def format_cpulist(cpus):
+    """The reverse of parse_cpulist"""
+    cpus = sorted(cpus)
+    ranges = []
+    for c in cpus:
+        if ranges and ranges[-1][1] == c - 1:
+            ranges[-1][1] = c
+        else:
+            ranges.append([c, c])
+    return ','.join(
+        str(a) if a == b else "{}-{}".format(a, b) for a, b in ranges)
+
+
+class NumaNode:
+    """
+    id: the node number
+    cpus: the CPUs of the node
+    memory: bytes of memory on the node
+    cores: the CPUs of the node grouped by physical core (hyperthread siblings together)
+    """
+
+    def __init__(self, id, cpus, memory, cores=None):
+        self.id = id
+        self.cpus = cpus
+        self.memory = memory
+        self.cores = cores if cores is not None else [[c] for c in cpus]
+
+    def __repr__(self):
+        return "NumaNode(id={}, cpus={}, memory={})".format(
+            self.id, format_cpulist(self.cpus), self.memory)
+
+
+class Topology:
+    """The NUMA nodes of a host, sorted by id"""
+
+    def __init__(self, nodes):
+        self.nodes = sorted(nodes, key=lambda n: n.id)
+
+    def usable(self):
+        """Returns the nodes that have CPUs (memory-only nodes can't run JVMs)"""
+        return [n for n in self.nodes if n.cpus]
+
+    def cpus(self):
+        return sorted(c for n in self.nodes for c in n.cpus)
+
+    def node(self, id):
+        for n in self.nodes:
+            if n.id == id:
+                return n
+        raise Exception("no NUMA node {}".format(id))
+
+
+def _read(path, default=''):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return default
+
+
+def _cores(cpus, cpu_root):
+    """Called internally only.  Groups 'cpus' into physical cores using their thread siblings"""
+    cores = []
+    seen = set()
+    for c in cpus:
+        if c in seen:
+            continue
+        siblings = parse_cpulist(
+            _read(
+                os.path.join(cpu_root, 'cpu{}'.format(c), 'topology',
+                             'thread_siblings_list')))
+        core = [s for s in siblings if s in cpus and s not in seen] or [c]
+        seen.update(core)
+        cores.append(core)
+    return cores
+
+
+def probe(root=NODE_ROOT):
+    """
+    Reads the topology from sysfs, without caching it.
+    Hosts without NUMA support are reported as one node holding every CPU.
+    """
+    cpu_root = os.path.join(os.path.dirname(root), 'cpu')
+    nodes = []
+    names = os.listdir(root) if os.path.isdir(root) else []
+    ids = sorted(
+        int(m.group(1))
+        for m in (re.match(r'^node(\d+)$', name) for name in names) if m)
+    for id in ids:
+        path = os.path.join(root, 'node{}'.format(id))
+        cpus = parse_cpulist(_read(os.path.join(path, 'cpulist')))
+        memory = 0
+        m = re.search(r'MemTotal:\s+(\d+) kB',
+                      _read(os.path.join(path, 'meminfo')))
+        if m:
+            memory = int(m.group(1)) * 1024
+        nodes.append(NumaNode(id, cpus, memory, _cores(cpus, cpu_root)))
+    if not nodes:
+        try:
+            cpus = sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            cpus = list(range(os.cpu_count() or 1))
+        nodes.append(NumaNode(0, cpus, 0, _cores(cpus, cpu_root)))
+    return Topology(nodes)
+
+
+def topology(root=NODE_ROOT):
+    """Returns the topology of this host, probing sysfs the first time only"""
+    if root not in _topologies:
+        _topologies[root] = probe(root)
+    return _topologies[root]
+
+
+def numactl_available():
+    """Returns whether numactl is installed, looking for it the first time only"""
+    if not _numactl:
+        _numactl.append(shutil.which('numactl') is not None)
+    return _numactl[0]
+
+
+def clear_cache():
+    """Forgets every probe result, so the next call probes again"""
+    _topologies.clear()
+    del _numactl[:]
+
+
+class GroupBinding:
+    """
+    Where the JVMs of one group run.
+    group: the group number
+    node: the NumaNode the group's backend and injectors are bound to
+    """
+
+    def __init__(self, group, node):
+        self.group = group
+        self.node = node
+
+    def __repr__(self):
+        return "GroupBinding(group={}, node={})".format(self.group,
+                                                        self.node.id)
+
+
+def binding_plan(topo, groups, max_nodes=None):
+    """
+    Spreads 'groups' groups across the nodes of 'topo', round robin,
+    keeping each backend on the same node as its injectors.
+    :param max_nodes: Use at most this many nodes (None = all of them)
+    :return: A list of GroupBindings, one per group
+    """
+    nodes = topo.usable()
+    if max_nodes is not None:
+        nodes = nodes[:max(1, int(max_nodes))]
+    return [GroupBinding(g, nodes[g % len(nodes)]) for g in range(groups)]
@@ -1,5 +1,18 @@
+"""
+This module holds the schemas of a SPECtate configuration, and validates
+configurations against them.
+
+The schemas are written with the schema library, which interprets them
+for every piece of data it validates. For configurations with many runs,
+each schema is also compiled once (see compile_schema) into plain checking
+functions that accept and return exactly what the schema does; only data
+the compiled checks reject is validated by the schema library again, so
+errors keep the library's messages.
+"""
+import re
 import uuid
-from schema import Schema, And, Or, Optional
+from collections import Counter
+from schema import Schema, And, Or, Optional, SchemaError
 
 # used for python2 and python3 string types
 from six import text_type
@@ -36,6 +49,80 @@ TemplateDataSchema = Schema({
     },
 })
 
+"""
+When to abort a run while its RT curve is being built, see src.rt_monitor.AbortPolicy.
+A 'baseline' of "catalog" is the max-jOPS of earlier runs with the same tag in the results catalog.
+"""
+AbortPolicySchema = Schema({
+    Optional("low_percent"): And(Or(int, float), lambda p: 0 < p <= 100),
+    Optional("max_low_failures"): And(int, lambda n: n >= 0),
+    Optional("baseline"): Or(And(Or(int, float), lambda b: b > 0), "catalog"),
+    Optional("min_fraction"): And(Or(int, float), lambda f: 0 < f <= 1),
+})
+
+"""
+The values of a sweep: a list, or {"range": [stop]}, {"range": [start, stop]} or
+{"range": [start, stop, step]} for the ints of python's range().
+"""
+SweepRange = {
+    "range": And([int], lambda r: 1 <= len(r) <= 3 and (len(r) < 3 or r[2] != 0)),
+}
+
+
+def _lengths(axis):
+    """Called internally only.  The number of values of each arg and prop of a sweep axis"""
+    return set(
+        len(range(*v["range"])) if isinstance(v, dict) else len(v)
+        for section in axis.values() for v in section.values())
+
+
+def _zipped(axis):
+    """Called internally only.  The values of one axis are zipped, so they need as many of each"""
+    lengths = _lengths(axis)
+    return len(lengths) == 1 and lengths.pop() > 0
+
+
+def _points(run):
+    """Called internally only.  The number of points of a validated RunList entry's sweep"""
+    count = 1
+    for axis in run["sweep"]:
+        count *= _lengths(axis).pop()
+    return count
+
+
+def check_sweep_tags(runs):
+    """
+    The runs of a sweep are tagged <tag>-<index> (see src.run_generator.expand),
+    raises an Exception if another of the validated RunList entries 'runs' takes the tag of one of them.
+    """
+    points = {
+        run["tag"]: _points(run)
+        for run in runs if "tag" in run and "sweep" in run
+    }
+    taken = []
+    for run in runs:
+        m = re.match(r"(.+)-(0|[1-9][0-9]*)$", run.get("tag", ""))
+        if m and "sweep" not in run and \
+                int(m.group(2)) < points.get(m.group(1), 0):
+            taken.append(run["tag"])
+    if taken:
+        raise Exception(
+            "Custom run IDs taken by the runs of a sweep: {}".format(taken))
+
+
+"""
+One axis of a sweep (see src.run_generator.expand): args and props_extra mapped to their values,
+which are zipped together, i.e. the axis' first point takes the first value of each.
+"""
+SweepAxisSchema = Schema(And({
+    Optional("args"): {
+        Optional(is_stringy): Or([object], SweepRange),
+    },
+    Optional("props_extra"): {
+        Optional(is_stringy): Or([is_stringy], SweepRange),
+    },
+}, _zipped))
+
 RunConfigSchema = Schema({
     "template_type": is_stringy,
     "args": {
@@ -46,6 +133,12 @@ RunConfigSchema = Schema({
     },
     Optional("times", default=1): int,
     Optional("tag"): is_stringy,
+    Optional("cpus", default=0): And(int, lambda c: c >= 0),
+    Optional("numa_nodes", default=1): And(int, lambda n: n >= 1),
+    Optional("binding", default="node"): And(is_stringy, lambda b: b in ["numactl", "node", "core"]),
+    Optional("memory_policy", default="local"): And(is_stringy, lambda m: m in ["local", "preferred", "bind"]),
+    Optional("abort_policy"): AbortPolicySchema,
+    Optional("sweep"): [SweepAxisSchema],
 })
 
 SpectateConfig = Schema({
@@ -56,34 +149,247 @@ SpectateConfig = Schema({
 })
 
 
+class _Invalid(Exception):
+    """Called internally only.  Raised by compiled checks, which leave the error message to the schema library"""
+
+
+def _generic(s):
+    """Called internally only.  A check that hands 's' to the schema library, for what isn't compiled"""
+    schema = Schema(s)
+
+    def check(data):
+        try:
+            return schema.validate(data)
+        except SchemaError:
+            raise _Invalid()
+
+    return check
+
+
+def _plain(s):
+    """Called internally only.  Whether the Schema (or And/Or) 's' has no custom error, name or extra keys"""
+    return (getattr(s, '_error', None) is None
+            and not getattr(s, '_ignore_extra_keys', False)
+            and getattr(s, '_name', None) is None
+            and not getattr(s, 'only_one', False))
+
+
+def _compile_type(s):
+    def check(data):
+        # like the schema library, bools aren't ints
+        if isinstance(data, s) and not (s is int and isinstance(data, bool)):
+            return data
+        raise _Invalid()
+
+    return check
+
+
+def _compile_callable(s):
+    def check(data):
+        try:
+            ok = s(data)
+        except Exception:
+            raise _Invalid()
+        if ok:
+            return data
+        raise _Invalid()
+
+    return check
+
+
+def _compile_literal(s):
+    def check(data):
+        if s == data:
+            return data
+        raise _Invalid()
+
+    return check
+
+
+def _compile_and(checks):
+    def check(data):
+        for c in checks:
+            data = c(data)
+        return data
+
+    return check
+
+
+def _compile_or(checks):
+    def check(data):
+        for c in checks:
+            try:
+                return c(data)
+            except _Invalid:
+                pass
+        raise _Invalid()
+
+    return check
+
+
+def _compile_iterable(s):
+    kind = type(s)
+    element = _compile_or([compile_schema(e) for e in s])
+
+    def check(data):
+        if not isinstance(data, kind):
+            raise _Invalid()
+        return type(data)(element(d) for d in data)
+
+    return check
+
+
+def _compile_dict(s):
+    """
+    Called internally only.  Keys that are literals are looked up, any other keys are tried in
+    the order the schema library tries them (see Schema._dict_key_priority).
+    """
+    literals = {}
+    others = []
+    required = set()
+    defaults = []
+    for skey in sorted(s, key=Schema._dict_key_priority):
+        key = skey
+        if isinstance(skey, Optional):
+            if not _plain(skey):
+                return _generic(s)
+            key = skey.schema
+            if hasattr(skey, 'default'):
+                defaults.append((skey, skey.key, skey.default))
+        elif isinstance(skey, Schema):
+            # Hooks, Forbidden and keys wrapped in a Schema
+            return _generic(s)
+        else:
+            required.add(skey)
+        if isinstance(key, (str, int)):
+            literals[key] = (skey, compile_schema(s[skey]))
+        else:
+            others.append((skey, compile_schema(key), compile_schema(s[skey])))
+
+    def check(data):
+        if not isinstance(data, dict):
+            raise _Invalid()
+        new = type(data)()
+        covered = set()
+        for key, value in data.items():
+            try:
+                literal = literals.get(key)
+            except TypeError:
+                raise _Invalid()
+            if literal is not None:
+                new[key] = literal[1](value)
+                covered.add(literal[0])
+                continue
+            for skey, key_check, value_check in others:
+                try:
+                    nkey = key_check(key)
+                except _Invalid:
+                    continue
+                new[nkey] = value_check(value)
+                covered.add(skey)
+                break
+            else:
+                raise _Invalid()
+        if not required <= covered or len(new) != len(data):
+            raise _Invalid()
+        for skey, key, default in defaults:
+            if skey not in covered:
+                new[key] = default() if callable(default) else default
+        return new
+
+    return check
+
+
+def compile_schema(s):
+    """
+    Compiles a schema (a Schema, or anything a Schema can be built from) into a function
+    that takes data and returns it validated, like Schema(s).validate, but raises _Invalid
+    without a message when the data doesn't validate.
+    Parts of the schema that aren't understood here are left to the schema library.
+    """
+    if type(s) in (list, tuple, set, frozenset):
+        return _compile_iterable(s)
+    if isinstance(s, dict):
+        return _compile_dict(s)
+    if isinstance(s, type):
+        return _compile_type(s)
+    if type(s) is Schema or type(s) is Optional:
+        return compile_schema(s.schema) if _plain(s) else _generic(s)
+    if type(s) in (And, Or):
+        if not _plain(s):
+            return _generic(s)
+        checks = [compile_schema(a) for a in s.args]
+        return _compile_and(checks) if type(s) is And else _compile_or(checks)
+    if hasattr(s, 'validate'):
+        return _generic(s)
+    if callable(s):
+        return _compile_callable(s)
+    return _compile_literal(s)
+
+
+class CompiledSchema:
+    """
+    A Schema compiled once with compile_schema, a drop-in for the Schema's validate().
+    Data the compiled checks reject is validated again by the Schema, so the SchemaError
+    raised is the one the Schema would have raised.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._check = compile_schema(schema)
+
+    def validate(self, data):
+        try:
+            return self._check(data)
+        except _Invalid:
+            return self.schema.validate(data)
+
+
+TemplateDataValidator = CompiledSchema(TemplateDataSchema)
+RunConfigValidator = CompiledSchema(RunConfigSchema)
+SpectateConfigValidator = CompiledSchema(SpectateConfig)
+
+
 def validate(unvalidated):
-    d = SpectateConfig.validate(unvalidated)
+    d = SpectateConfigValidator.validate(unvalidated)
 
     # each run needs a unique run id
     custom_run_ids = list(
         map(lambda run: run["tag"],
             filter(lambda run: "tag" in run, d["RunList"])))
 
-    if custom_run_ids and len(set(custom_run_ids)) != len(custom_run_ids):
-        duplicates = [
-            _id for _id in custom_run_ids if custom_run_ids.count(_id) > 1
-        ]
+    counts = Counter(custom_run_ids)
+    if len(counts) != len(custom_run_ids):
+        duplicates = [_id for _id in custom_run_ids if counts[_id] > 1]
         raise Exception(
             "Duplicate custom run IDs provided to different configured runs: {}".
             format(duplicates))
 
+    check_sweep_tags(d["RunList"])
+
     # generate IDs for each unspecified run
     for run in list(filter(lambda run: "tag" not in run, d["RunList"])):
         run["tag"] = random_run_id()
 
+    # the arguments of each template, to look them up once per run
+    template_args = {
+        name: set(t["args"])
+        for name, t in d["TemplateData"].items()
+    }
+
     # each of the args that appear in the RunList,
     for run in d["RunList"]:
         # for the TemplateData they pull from,
         t = d["TemplateData"][run["template_type"]]
+        # (and the args a sweep sets)
+        swept = [
+            arg for axis in run.get("sweep", [])
+            for arg in axis.get("args", {})
+        ]
 
         # they need to appear in the template
-        for arg in run["args"]:
-            if arg not in t["args"]:
+        for arg in list(run["args"]) + swept:
+            if arg not in template_args[run["template_type"]]:
                 raise Exception(
                     "Argument '{}' was not in the template {}'s arguments: {}".
                     format(arg, run["template_type"], t["args"]))
@@ -91,7 +397,8 @@ def validate(unvalidated):
         # and if the arg isn't in the run,
         # it needs to have a default
         for arg in t["args"]:
-            if arg not in run["args"] and arg not in t["prop_options"]:
+            if arg not in run["args"] and arg not in swept and arg not in t[
+                    "prop_options"]:
                 raise Exception(
                     "Argument '{}' did not have a default from template {}".
                     format(arg, run["template_type"]))
@@ -0,0 +1,198 @@
+import os
+import tempfile
+import unittest
+
+from src.admission import AdmissionController, HostResources, JvmFootprint, JvmSet, Reservations, RunDemand, parse_jvm_options, parse_size, JVM_OVERHEAD
+
+GiB = 2**30
+
+
+def multi_demand(options, groups, injectors=1):
+    fp = parse_jvm_options(options)
+    return RunDemand([
+        JvmSet("controller", 1, parse_jvm_options("-Xmx1g")),
+        JvmSet("txinjector", injectors, parse_jvm_options("-Xmx1g"), True),
+        JvmSet("backend", 1, fp, True),
+    ], groups)
+
+
+class TestParsing(unittest.TestCase):
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("29g"), 29 * GiB)
+        self.assertEqual(parse_size("512M"), 512 * 2**20)
+        self.assertEqual(parse_size("1024"), 1024)
+        with self.assertRaises(Exception):
+            parse_size("lots")
+
+    def test_parse_jvm_options(self):
+        fp = parse_jvm_options(
+            "-Xms29g -Xmx30g -Xmn27g -XX:ParallelGCThreads=48 -XX:ConcGCThreads=4"
+        )
+
+        self.assertEqual(fp.heap, 30 * GiB)
+        self.assertEqual(fp.gc_threads, 52)
+
+    def test_parse_jvm_options_without_flags(self):
+        fp = parse_jvm_options(["-XX:+UseG1GC"])
+
+        self.assertIsNone(fp.heap)
+        self.assertIsNone(fp.gc_threads)
+        host = HostResources(64 * GiB, 64 * GiB, 8)
+        self.assertEqual(fp.memory(host), GiB + JVM_OVERHEAD)
+
+    def test_read_meminfo(self):
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "meminfo")
+            with open(path, 'w') as f:
+                f.write("MemTotal:       65536000 kB\n"
+                        "MemFree:         1000000 kB\n"
+                        "MemAvailable:   32768000 kB\n"
+                        "HugePages_Total:       0\n")
+            host = HostResources.read(path, cpus=16)
+
+        self.assertEqual(host.total, 65536000 * 1024)
+        self.assertEqual(host.available, 32768000 * 1024)
+        self.assertEqual(host.cpus, 16)
+
+
+class TestRunDemand(unittest.TestCase):
+
+    def test_multiplies_by_groups(self):
+        d = multi_demand("-Xms29g -Xmx29g -XX:ParallelGCThreads=48", 4, 2)
+        host = HostResources(512 * GiB, 512 * GiB, 192)
+
+        self.assertEqual(d.jvms(), 1 + 4 * 3)
+        self.assertEqual(
+            d.memory(host), (1 + 4 * 2 + 4 * 29) * GiB + 13 * JVM_OVERHEAD)
+        # only backends count towards the CPUs
+        self.assertEqual(d.threads(), 4 * 48)
+
+
+class TestAdmissionController(unittest.TestCase):
+    host = HostResources(128 * GiB, 100 * GiB, 192)
+
+    def setUp(self):
+        self.reserved = Reservations()
+
+    def controller(self, policy, **kw):
+        return AdmissionController(policy, reserved=self.reserved, **kw)
+
+    def test_run_that_fits_is_admitted(self):
+        d = multi_demand("-Xmx29g", 2)
+
+        decision = self.controller("refuse").check(d, self.host)
+
+        self.assertTrue(decision.admit)
+        self.assertEqual(decision.groups, 2)
+
+    def test_refuse(self):
+        d = multi_demand("-Xmx29g", 4)
+
+        decision = self.controller("refuse").check(d, self.host)
+
+        self.assertFalse(decision.admit)
+        self.assertIn("memory", decision.reason)
+
+    def test_refuses_too_many_gc_threads(self):
+        d = multi_demand("-Xmx1g -XX:ParallelGCThreads=100", 2)
+
+        decision = self.controller("refuse").check(d, self.host)
+
+        self.assertFalse(decision.admit)
+        self.assertIn("GC threads", decision.reason)
+
+    def test_shrink(self):
+        d = multi_demand("-Xmx29g", 4)
+
+        decision = self.controller("shrink").check(d, self.host)
+
+        self.assertTrue(decision.admit)
+        self.assertEqual(decision.groups, 2)
+
+    def test_shrink_refuses_when_one_group_doesnt_fit(self):
+        d = multi_demand("-Xmx200g", 4)
+
+        decision = self.controller("shrink").check(d, self.host)
+
+        self.assertFalse(decision.admit)
+
+    def test_off(self):
+        d = multi_demand("-Xmx200g", 4)
+
+        self.assertTrue(self.controller("off").check(d, self.host).admit)
+
+    def test_queue_waits_for_memory(self):
+        hosts = [
+            HostResources(128 * GiB, 10 * GiB, 192),
+            HostResources(128 * GiB, 10 * GiB, 192),
+            HostResources(128 * GiB, 100 * GiB, 192),
+        ]
+        c = self.controller(
+            "queue", queue_interval=0, read_host=lambda: hosts.pop(0))
+
+        decision = c.admit(multi_demand("-Xmx29g", 2))
+
+        self.assertTrue(decision.admit)
+        self.assertEqual(hosts, [])
+
+    def test_queue_refuses_what_never_fits(self):
+        c = self.controller(
+            "queue", queue_interval=0, read_host=lambda: self.host)
+
+        decision = c.admit(multi_demand("-Xmx29g", 8))
+
+        self.assertFalse(decision.admit)
+
+    def test_queue_can_be_cancelled(self):
+        c = self.controller(
+            "queue",
+            queue_interval=0,
+            read_host=lambda: HostResources(128 * GiB, 10 * GiB, 192))
+
+        decision = c.admit(multi_demand("-Xmx29g", 2), lambda: True)
+
+        self.assertFalse(decision.admit)
+
+    def test_parallel_runs_reserve_memory(self):
+        c = self.controller("refuse", read_host=lambda: self.host)
+
+        first = c.admit(multi_demand("-Xmx29g", 2))
+        # the first run's JVMs haven't allocated their heaps yet
+        second = c.admit(multi_demand("-Xmx29g", 2))
+        self.assertTrue(first.admit)
+        self.assertFalse(second.admit)
+
+        c.release(first)
+        self.assertTrue(c.admit(multi_demand("-Xmx29g", 2)).admit)
+
+    def test_memory_in_use_isnt_counted_twice(self):
+        hosts = [self.host, HostResources(128 * GiB, 54 * GiB, 192)]
+        c = self.controller("refuse", read_host=lambda: hosts.pop(0))
+
+        self.assertTrue(c.admit(multi_demand("-Xmx21g", 2)).admit)
+        # the first run's heaps are allocated, and already missing from MemAvailable
+        self.assertTrue(c.admit(multi_demand("-Xmx21g", 2)).admit)
+
+    def test_gc_threads_of_runs_sharing_cpus_add_up(self):
+        d = multi_demand("-Xmx1g -XX:ParallelGCThreads=40", 2)
+        shared = self.controller("refuse", read_host=lambda: self.host)
+        pinned = self.controller(
+            "refuse", read_host=lambda: self.host, own_cpus=True)
+
+        self.assertTrue(shared.admit(d).admit)
+        self.assertTrue(shared.admit(d).admit)
+        self.assertIn("other runs", shared.admit(d).reason)
+        self.assertTrue(pinned.admit(d).admit)
+
+    def test_checks_dont_reserve(self):
+        c = self.controller("refuse", read_host=lambda: self.host)
+        c.check(multi_demand("-Xmx29g", 2))
+
+        self.assertEqual(self.reserved.runs, 0)
+        self.assertIsNone(c.admit(multi_demand("-Xmx200g", 2)).reserved)
+        self.assertEqual(self.reserved.runs, 0)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(Exception):
+            AdmissionController("maybe")
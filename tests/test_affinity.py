@@ -0,0 +1,108 @@
+import os
+import pickle
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from src.affinity import Binding, affinity_plan, describe, mempolicy_supported
+from src.topology import NumaNode, Topology
+
+
+def two_sockets():
+    # 8 cores per node, hyperthread siblings are n and n + 8
+    nodes = []
+    for n in range(2):
+        cores = [[n * 8 + c, 16 + n * 8 + c] for c in range(8)]
+        cpus = sorted(c for core in cores for c in core)
+        nodes.append(NumaNode(n, cpus, 2**30, cores))
+    return Topology(nodes)
+
+
+class TestAffinityPlan(unittest.TestCase):
+
+    def test_node_mode_pins_groups_to_their_node(self):
+        plan = affinity_plan(two_sockets(), 3, mode="node")
+
+        self.assertEqual([a.node.id for a in plan], [0, 1, 0])
+        self.assertEqual(plan[1].backend.cpus, two_sockets().node(1).cpus)
+        self.assertEqual(plan[1].injectors.cpus, plan[1].backend.cpus)
+
+    def test_core_mode_gives_groups_disjoint_cores(self):
+        plan = affinity_plan(two_sockets(), 4, mode="core")
+
+        used = []
+        for a in plan:
+            self.assertFalse(set(a.backend.cpus) & set(a.injectors.cpus))
+            used.extend(a.backend.cpus + a.injectors.cpus)
+        self.assertEqual(len(used), len(set(used)))
+        # hyperthread siblings stay together
+        for a in plan:
+            for c in a.injectors.cpus:
+                self.assertIn((c + 16) % 32, a.injectors.cpus)
+
+    def test_core_mode_on_one_node(self):
+        plan = affinity_plan(two_sockets(), 2, max_nodes=1, mode="core")
+
+        self.assertEqual([a.node.id for a in plan], [0, 0])
+        self.assertFalse(set(plan[0].backend.cpus) & set(plan[1].backend.cpus))
+
+    def test_only_hands_out_allowed_cpus(self):
+        allowed = [8, 9, 10, 11, 24, 25, 26, 27]
+        plan = affinity_plan(two_sockets(), 2, mode="node", cpus=allowed)
+
+        self.assertEqual([a.node.id for a in plan], [1, 1])
+        self.assertEqual(plan[0].backend.cpus, allowed)
+
+    def test_numactl_mode(self):
+        plan = affinity_plan(two_sockets(), 2, mode="numactl")
+
+        self.assertIsNone(plan[0].backend)
+        self.assertEqual(plan[1].numactl(),
+                         ["numactl", "--cpunodebind=1", "--localalloc"])
+        self.assertIn("numactl", describe(plan)[0])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(Exception):
+            affinity_plan(two_sockets(), 2, mode="socket")
+
+
+class TestBinding(unittest.TestCase):
+
+    def test_is_pickleable(self):
+        b = pickle.loads(pickle.dumps(Binding([1, 0], [0], "local")))
+
+        self.assertEqual(b.cpus, [0, 1])
+
+    def test_pins_child(self):
+        cpu = min(os.sched_getaffinity(0))
+        out = subprocess.check_output(
+            [
+                sys.executable, "-c",
+                "import os; print(sorted(os.sched_getaffinity(0)))"
+            ],
+            preexec_fn=Binding([cpu]),
+            universal_newlines=True)
+
+        self.assertEqual(out.strip(), str([cpu]))
+
+    @unittest.skipUnless(mempolicy_supported(), "no set_mempolicy")
+    def test_memory_policy_in_child(self):
+        subprocess.check_call(
+            [sys.executable, "-c", "pass"],
+            preexec_fn=Binding(sorted(os.sched_getaffinity(0)), [0],
+                               "preferred"))
+
+    @unittest.skipUnless(mempolicy_supported(), "no set_mempolicy")
+    def test_memory_policy_is_prepared_in_parent(self):
+        b = pickle.loads(pickle.dumps(
+            Binding(sorted(os.sched_getaffinity(0)), [0], "bind")))
+
+        # the child only makes the syscall
+        with mock.patch("ctypes.CDLL", side_effect=AssertionError):
+            subprocess.check_call([sys.executable, "-c", "pass"],
+                                  preexec_fn=b)
+
+    def test_unknown_memory_policy(self):
+        with self.assertRaises(Exception):
+            Binding([0], [0], "interleave")
@@ -0,0 +1,129 @@
+import csv
+import math
+import os
+import tempfile
+import unittest
+
+from src import aggregate
+from src.aggregate import AggregateHeader, bootstrap_ci, describe, repeats_needed
+from src.catalog import Catalog
+from src.rollup import RunAnalysis
+
+
+def analysis(max_jops, critical_jops):
+    return RunAnalysis([str(max_jops), str(critical_jops), "", ""], None,
+                       None, "", [])
+
+
+class TestStats(unittest.TestCase):
+
+    def test_describe(self):
+        s = describe([100, 102, 98, 100], seed=1)
+
+        self.assertEqual((s.n, s.mean), (4, 100))
+        self.assertAlmostEqual(s.stdev, math.sqrt(8 / 3))
+        self.assertAlmostEqual(s.cv, math.sqrt(8 / 3) / 100)
+        self.assertTrue(98 <= s.ci_low < 100 < s.ci_high <= 102)
+
+    def test_single_value(self):
+        s = describe([100])
+
+        self.assertTrue(math.isnan(s.stdev))
+        self.assertEqual((s.ci_low, s.ci_high), (100, 100))
+
+    def test_bootstrap_is_reproducible(self):
+        values = [5, 9, 7, 6, 8]
+
+        self.assertEqual(bootstrap_ci(values, seed=3), bootstrap_ci(values, seed=3))
+        low, high = bootstrap_ci(values, confidence=0.5, seed=3)
+        wide_low, wide_high = bootstrap_ci(values, confidence=0.99, seed=3)
+        self.assertLess(wide_low, low)
+        self.assertGreater(wide_high, high)
+
+    def test_repeats_needed(self):
+        s = aggregate.Stats(4, 100, 10, 0.1, 90, 110)
+
+        # (1.96 * 0.1 / 0.05) ** 2 = 15.4
+        self.assertEqual(repeats_needed(s, 0.05), 16)
+        self.assertEqual(repeats_needed(s, 0.5), 4)
+        self.assertIsNone(repeats_needed(s._replace(n=1), 0.05))
+
+
+class TestAggregate(unittest.TestCase):
+
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        self.catalog = Catalog(os.path.join(self.td.name, "results.db"))
+
+    def tearDown(self):
+        self.catalog.close()
+        self.td.cleanup()
+
+    def record(self, path, tag, threads, jops, port=24000, exit_code=0,
+               jdk=""):
+        self.catalog.record(
+            path,
+            tag=tag,
+            run_type="multi",
+            jdk=jdk,
+            jvm_options="-XX:ParallelGCThreads={}".format(threads),
+            props={
+                "specjbb.group.count": 2,
+                "specjbb.controller.port": port
+            },
+            exit_code=exit_code,
+            analysis=analysis(*jops))
+
+    def test_groups_by_configuration(self):
+        # repeats on different ports are the same configuration
+        self.record("a1", "a", 48, (100000, 50000), port=24000)
+        self.record("a2", "a", 48, (100100, 50100), port=24001)
+        self.record("a3", "a-again", 48, (99900, 49900))
+        self.record("a4", "a", 48, (10, 10), exit_code=-1)
+        self.record("b1", "b", 24, (80000, 30000))
+        self.record("c1", "c", 12, (70000, 20000))
+        self.record("c2", "c", 12, (90000, 40000))
+        self.record("c3", "c", 12, (50000, 10000))
+
+        result = aggregate.aggregate(self.catalog, seed=1)
+
+        by_tag = {a.tags[0]: a for a in result}
+        self.assertEqual(sorted(by_tag), ["a", "b", "c"])
+        a, b, c = by_tag["a"], by_tag["b"], by_tag["c"]
+        self.assertEqual(a.tags, ["a", "a-again"])
+        self.assertEqual(len(a.runs), 3)
+        self.assertAlmostEqual(a.stats["max_jops"].mean, 100000)
+        self.assertIsNone(a.needs_more)
+        self.assertEqual(a.repeats, 3)
+        self.assertEqual(a.config["props"], {"specjbb.group.count": "2"})
+
+        self.assertEqual(b.needs_more, "1 of at least 3 runs")
+        self.assertEqual(b.repeats, 3)
+        self.assertIn("interval", c.needs_more)
+        self.assertGreater(c.repeats, 3)
+        # the configurations needing more repeats come first
+        self.assertIs(result[-1], a)
+
+    def test_configurations_are_the_catalogs(self):
+        # like src.compare, runs before and after a JDK update share a configuration
+        self.record("a1", "a", 48, (100000, 50000), jdk='openjdk version "8"')
+        self.record("a2", "a", 48, (100100, 50100), jdk='openjdk version "11"')
+
+        result = aggregate.aggregate(self.catalog, seed=1)
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].key, self.catalog.find()[0]["config"])
+
+    def test_write_csv(self):
+        self.record("a1", "a", 48, (100000, 50000))
+        path = os.path.join(self.td.name, "aggregate.csv")
+
+        aggregate.write_csv(aggregate.aggregate(self.catalog), path)
+
+        with open(path) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], AggregateHeader)
+        self.assertEqual(len(rows[1]), len(AggregateHeader))
+        self.assertEqual(rows[1][1:5], ["a", "1", "1 of at least 3 runs", "3"])
+        # no stdev for one run
+        self.assertEqual(rows[1][6], "")
@@ -0,0 +1,120 @@
+import asyncio
+import sys
+import threading
+import time
+import unittest
+
+from src.task_runner import TaskRunner
+from src.async_supervisor import AsyncSupervisor, task_name
+from src.supervisor import group_members
+
+
+def python_task(script, **popen_kw):
+    return TaskRunner(sys.executable, "-c", script, **popen_kw)
+
+
+class TestAsyncSupervisor(unittest.TestCase):
+
+    def test_collects_output_and_exit_codes(self):
+        lines = []
+        s = AsyncSupervisor(handle=lambda name, line: lines.append((name, line)))
+
+        codes = s.run(
+            python_task("import time\ntime.sleep(5)"), [
+                python_task("print('hello')"),
+                python_task("import sys\nsys.exit(3)"),
+            ])
+
+        self.assertEqual(codes["task-0"], 0)
+        self.assertEqual(codes["task-1"], 3)
+        self.assertIn("controller", codes)
+        self.assertIn(("task-0", "hello\n"), lines)
+
+    def test_controller_is_stopped_when_agents_finish(self):
+        start = time.time()
+
+        AsyncSupervisor(handle=lambda name, line: None).run(
+            python_task("import time\ntime.sleep(30)"),
+            [python_task("pass")])
+
+        self.assertLess(time.time() - start, 10)
+
+    def test_agents_are_stopped_after_controller_exits(self):
+        start = time.time()
+
+        codes = AsyncSupervisor(handle=lambda name, line: None, grace=0.5).run(
+            python_task("pass"),
+            [python_task("import time\ntime.sleep(30)")])
+
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(codes["controller"], 0)
+
+    def test_abort_stops_everything(self):
+        start = time.time()
+
+        def handle(name, line):
+            if name == "controller" and "bad" in line:
+                s.abort("bad run")
+
+        s = AsyncSupervisor(handle=handle, grace=30)
+        codes = s.run(
+            python_task("import time\nprint('bad', flush=True)\ntime.sleep(30)"),
+            [python_task("import time\ntime.sleep(30)")])
+
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(s.aborted, "bad run")
+        self.assertNotEqual(codes["controller"], 0)
+
+    def interrupted(self, handle):
+        start = time.time()
+        s = AsyncSupervisor(handle=handle, grace=30)
+        with self.assertRaises(KeyboardInterrupt):
+            s.run(
+                python_task("import time\nprint('started', flush=True)\ntime.sleep(37)",
+                            start_new_session=True),
+                [python_task("import time\ntime.sleep(38)",
+                             start_new_session=True)])
+
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(s.aborted, "interrupted")
+        self.assertEqual(len(s._procs), 2)
+        for proc in s._procs:
+            self.assertIsNotNone(proc.returncode)
+            self.assertEqual(group_members(proc.pid), [])
+
+    def test_interrupt_stops_everything(self):
+        # e.g. Ctrl+C, which doesn't reach the processes' own sessions
+        def interrupt():
+            raise KeyboardInterrupt
+
+        self.interrupted(
+            lambda name, line: asyncio.get_event_loop().call_soon(interrupt))
+        # interrupted while handling output
+        self.interrupted(lambda name, line: interrupt())
+
+    def test_composite_runs_only_the_controller(self):
+        codes = AsyncSupervisor(handle=lambda name, line: None).run(
+            python_task("print('composite')"))
+
+        self.assertEqual(codes, {"controller": 0})
+
+    def test_runs_from_worker_threads(self):
+        # parallel runs each run their event loop in a RunScheduler thread
+        codes = []
+
+        def _run():
+            codes.append(AsyncSupervisor(handle=lambda name, line: None).run(
+                python_task("import sys\nsys.exit(3)"), []))
+
+        threads = [threading.Thread(target=_run) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([c["controller"] for c in codes], [3, 3, 3])
+
+    def test_task_names_use_component_type(self):
+        t = TaskRunner("java", "-jar", "specjbb2015.jar", "-m", "BACKEND")
+
+        self.assertEqual(task_name(t, 2), "backend-2")
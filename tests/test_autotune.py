@@ -0,0 +1,155 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src import autotune
+from src.autotune import Autotuner, Journal, Trial, coordinate_descent
+
+
+def peak(tiers, best=(40, 12, 6)):
+    """A max-jOPS surface with one peak at 'best'"""
+    return 100000 - sum(100 * (t - b)**2 for t, b in zip(tiers, best))
+
+
+def search(start, low, high, f, min_gain=0.0):
+    s = coordinate_descent(start, low, high, min_gain)
+    point = next(s)
+    seen = []
+    try:
+        while True:
+            seen.append(point)
+            point = s.send(f(point))
+    except StopIteration:
+        return seen
+
+
+class TestCoordinateDescent(unittest.TestCase):
+
+    def test_finds_the_peak(self):
+        seen = search((10, 10, 10), [1] * 3, [100] * 3, peak)
+
+        self.assertEqual(max(seen, key=peak), (40, 12, 6))
+        # far fewer than the 10^6 points of a full sweep
+        self.assertLess(len(seen), 100)
+
+    def test_stays_in_bounds(self):
+        seen = search((10, 10, 10), [1] * 3, [20, 20, 20], peak)
+
+        self.assertTrue(all(1 <= t <= 20 for p in seen for t in p))
+        self.assertEqual(max(seen, key=peak), (20, 12, 6))
+
+    def test_small_gains_are_noise(self):
+        seen = search((30, 12, 6), [1] * 3, [100] * 3, peak, min_gain=0.05)
+
+        self.assertEqual(seen[0], (30, 12, 6))
+        self.assertNotIn((40, 12, 6), seen)
+
+    def test_failures_are_not_moved_to(self):
+        seen = search((10, 10, 10), [1] * 3, [100] * 3,
+                      lambda p: None if p[0] > 10 else peak(p))
+
+        self.assertEqual(max((p for p in seen if p[0] <= 10), key=peak),
+                         (10, 12, 6))
+
+
+class TestCombine(unittest.TestCase):
+
+    def row(self, exit_code, max_jops, critical_jops):
+        return {
+            "exit_code": exit_code,
+            "max_jops": max_jops,
+            "critical_jops": critical_jops
+        }
+
+    def test_runs_are_averaged(self):
+        self.assertEqual(
+            autotune.combine([self.row(0, 100, 10), self.row(0, 200, None)]),
+            (0, 150, 10))
+
+    def test_a_failed_run_fails_the_trial(self):
+        self.assertEqual(
+            autotune.combine([self.row(0, 100, 10), self.row(1, None, None)]),
+            (1, 100, 10))
+
+    def test_nothing_recorded(self):
+        self.assertEqual(autotune.combine([]), (None, None, None))
+        self.assertEqual(
+            autotune.combine([self.row(None, None, None)]), (None, None, None))
+
+
+class TestAutotuner(unittest.TestCase):
+
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.td.name, "trials.jsonl")
+        with open("example_config.json") as f:
+            self.config = json.loads(f.read())
+        self.run = self.config["RunList"][0]
+        self.executed = []
+
+    def tearDown(self):
+        self.td.cleanup()
+
+    def execute(self, run):
+        tiers = tuple(run["props"][p] for p in autotune.TIER_PROPS)
+        self.executed.append((run["tag"], tiers))
+        return 0, peak(tiers, (6, 3, 2)), peak(tiers, (2, 2, 2)) // 2
+
+    def tuner(self, **kw):
+        return Autotuner(self.config["TemplateData"], self.run, self.journal,
+                         execute=self.execute, high=64, min_gain=0.0, **kw)
+
+    def test_tunes_and_records_every_trial(self):
+        best = self.tuner(budget=100).tune()
+
+        self.assertEqual(best.tiers, (6, 3, 2))
+        self.assertEqual(len(Journal(self.journal)), len(self.executed))
+        self.assertEqual(self.executed[0], ("TAG-T1-1-T2-2-T3-3", (1, 2, 3)))
+
+    def test_target(self):
+        best = self.tuner(budget=100, target="critical_jops").tune()
+
+        self.assertEqual(best.tiers, (2, 2, 2))
+
+    def test_resumes_from_the_journal(self):
+        self.tuner(budget=3).tune()
+        self.assertEqual(len(self.executed), 3)
+
+        # the trials in the journal aren't run again
+        tuner = self.tuner(budget=100)
+        best = tuner.tune()
+        self.assertEqual(best.tiers, (6, 3, 2))
+        tags = [tag for tag, _ in self.executed]
+        self.assertEqual(len(tags), len(set(tags)))
+        self.assertEqual(tuner.spent, len(self.executed) - 3)
+
+        # and a finished search runs nothing
+        done = self.tuner(budget=100)
+        self.assertEqual(done.tune(), best)
+        self.assertEqual(done.spent, 0)
+
+    def test_failed_runs_are_not_best(self):
+        with open(self.journal, "w") as f:
+            f.write(json.dumps(Trial([1, 2, 3], "x", -1, 10**9, 10**9, 0)._asdict()) + "\n")
+            # a line cut short
+            f.write('{"tiers": [1, 2')
+
+        best = self.tuner(budget=100).tune()
+        self.assertEqual(best.tiers, (6, 3, 2))
+
+    def test_tiers_default_to_the_template(self):
+        del self.run["args"]["T2"]
+        self.config["TemplateData"]["HBIR"]["prop_options"]["T2"] = 5
+        self.tuner(budget=1).tune()
+        self.assertEqual(self.executed, [("TAG-T1-1-T2-5-T3-3", (1, 5, 3))])
+
+        del self.config["TemplateData"]["HBIR"]["prop_options"]["T2"]
+        with self.assertRaises(Exception):
+            self.tuner()
+
+    def test_template_needs_tiers(self):
+        self.config["TemplateData"]["HBIR"]["translations"].pop("T2")
+
+        with self.assertRaises(Exception):
+            self.tuner()
@@ -5,9 +5,17 @@ import logging
 import testpath
 import tempfile
 import os
+import signal
+import threading
+import time
+from unittest import mock
 from contextlib import contextmanager
 
+from src.catalog import Catalog, DEFAULT_NAME
 from src.benchmark_run import SpecJBBRun, InvalidRunConfigurationException, JvmRunOptions, SpecJBBComponentOptions, SpecJBBComponentTypes, do
+from src.scheduler import RunSlot
+from src.admission import HostResources
+from src.supervisor import group_members
 
 
 @contextmanager
@@ -15,8 +23,10 @@ def temporary_directory():
     pwd = os.getcwd()
     with tempfile.TemporaryDirectory() as td:
         os.chdir(td)
-        yield
-        os.chdir(pwd)
+        try:
+            yield
+        finally:
+            os.chdir(pwd)
 
 
 class TestBenchmarkRun(unittest.TestCase):
@@ -160,6 +170,152 @@ class TestBenchmarkRun(unittest.TestCase):
                     filter(lambda line: "TXINJECTOR" in line,
                            component_invocations))
 
+    def test_run_multijvm_asyncio(self):
+        with temporary_directory():
+            r = SpecJBBRun(**{  # multijvm run with arguments
+                    "controller": {
+                        "type": "multi",
+                        "options": ["arg1", "arg2"],
+                    },
+                    "backends": 2,
+                    "java": "java",
+                    "jar": "env/Main.jar",
+                })
+
+            with testpath.MockCommand("java") as mock_java:
+                r.run(engine="asyncio")
+
+                components = [
+                    call["argv"][call["argv"].index("-m") + 1]
+                    for call in mock_java.get_calls()
+                ]
+
+                self.assertEqual(components.count("MULTI"), 1)
+                self.assertEqual(components.count("BACKEND"), 2)
+                self.assertEqual(components.count("TXINJECTOR"), 2)
+
+    def test_run_in_slot_uses_its_port_without_changing_directory(self):
+        with temporary_directory():
+            r = SpecJBBRun(**{
+                    "controller": {
+                        "type": "composite",
+                    },
+                    "java": "java",
+                    "jar": "env/Main.jar",
+                    "tag": "slotted",
+                })
+            pwd = os.getcwd()
+
+            with testpath.MockCommand("java"):
+                r.run(slot=RunSlot(1, None, 24010))
+
+            self.assertEqual(os.getcwd(), pwd)
+            with open(os.path.join("slotted", "specjbb2015.props")) as f:
+                self.assertIn("specjbb.controller.port = 24010", f.read())
+
+    def test_shrunk_runs_start_and_configure_fewer_groups(self):
+        with temporary_directory():
+            r = SpecJBBRun(**{
+                    "controller": {
+                        "type": "multi",
+                    },
+                    "backends": 4,
+                    "java": {"path": "java", "options": ["-Xmx1g"]},
+                    "jar": "env/Main.jar",
+                    "props": {"specjbb.group.count": 4},
+                    "tag": "shrunk",
+                })
+            # room for 5 JVMs of 1.25 GiB: the controller and 2 groups
+            host = HostResources(64 * 2**30, 8 * 2**30, 64)
+
+            with mock.patch.object(HostResources, "read", return_value=host), \
+                    testpath.MockCommand("java") as mock_java:
+                r.run(admission="shrink")
+                components = [
+                    call["argv"][call["argv"].index("-m") + 1]
+                    for call in mock_java.get_calls()
+                ]
+
+            self.assertEqual(components.count("BACKEND"), 2)
+            self.assertEqual(components.count("TXINJECTOR"), 2)
+            with open(os.path.join("shrunk", "specjbb2015.props")) as f:
+                self.assertIn("specjbb.group.count = 2", f.read())
+            # and it's its full size again for its next run
+            self.assertEqual(r.backends["count"], 4)
+            self.assertEqual(r.props["specjbb.group.count"], 4)
+
+    def test_jvm_options_are_only_read_for_admission(self):
+        r = SpecJBBRun(**{
+                "controller": {
+                    "type": "multi",
+                },
+                "java": {"path": "java", "options": ["-Xmx$HEAP"]},
+                "jar": "env/Main.jar",
+            })
+
+        with temporary_directory(), testpath.MockCommand("java"):
+            r.run(dry_run=True)
+            with self.assertRaises(Exception):
+                r.run(dry_run=True, admission="refuse")
+
+    def test_interrupted_pool_runs_stop_every_jvm(self):
+        with temporary_directory():
+            pids = os.path.abspath("pids")
+            os.mkdir(pids)
+            r = SpecJBBRun(**{
+                    "controller": {
+                        "type": "multi",
+                    },
+                    "java": "java",
+                    "jar": "env/Main.jar",
+                })
+            jvm = "import os, time\nopen(os.path.join({!r}, str(os.getpid())), 'w').close()\ntime.sleep(37)".format(pids)
+
+            def interrupt():
+                # Ctrl+C, once the controller, backend and injector started
+                while len(os.listdir(pids)) < 3:
+                    time.sleep(0.05)
+                os.kill(os.getpid(), signal.SIGINT)
+
+            start = time.time()
+            with testpath.MockCommand("java", python=jvm):
+                threading.Thread(target=interrupt, daemon=True).start()
+                with self.assertRaises(KeyboardInterrupt):
+                    r.run()
+
+            self.assertLess(time.time() - start, 30)
+            for pid in os.listdir(pids):
+                self.assertEqual(group_members(int(pid)), [])
+
+    def recorded_exit_code(self, engine, python):
+        with temporary_directory():
+            r = SpecJBBRun(**{
+                    "controller": {
+                        "type": "multi",
+                    },
+                    "java": "java",
+                    "jar": "env/Main.jar",
+                    "tag": "failing",
+                })
+
+            with testpath.MockCommand("java", python=python):
+                r.run(engine=engine)
+
+            with Catalog(DEFAULT_NAME) as c:
+                return c.find(tag="failing")[0]["exit_code"]
+
+    def test_failed_jvms_are_recorded(self):
+        backend_fails = "import sys\nsys.exit(3 if 'BACKEND' in sys.argv else 0)"
+        for engine in ("pool", "asyncio"):
+            self.assertEqual(self.recorded_exit_code(engine, backend_fails), 3)
+            self.assertEqual(self.recorded_exit_code(engine, ""), 0)
+
+    def test_run_with_unknown_engine_fails(self):
+        r = SpecJBBRun(**self.valid_props[1])
+
+        with self.assertRaises(Exception):
+            r.run(dry_run=True, engine="threads")
+
     def test_compliant_runs_need_kit_validation(self):
         ignore_kit_arguments = [{
                 "controller": {
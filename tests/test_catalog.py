@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+
+from src import catalog, gc_log
+from src.catalog import Catalog, parse_flags
+from src.controller_log import Summary
+from src.rollup import RunAnalysis
+
+NAN = float('nan')
+
+
+def analysis(max_jops=12345):
+    gc = gc_log.GcSummary(*([1.0] * len(gc_log.GcSummary._fields)))
+    gc = gc._replace(major_interval=NAN)
+    return RunAnalysis([str(max_jops), "6789", "190000", ""],
+                       Summary(960, 2000, 1500, 186315, 3, 1, None), gc,
+                       "-Xmx4g", [])
+
+
+class TestParseFlags(unittest.TestCase):
+
+    def test_flags(self):
+        self.assertEqual(
+            parse_flags(
+                "-XX:+UseG1GC -XX:-UseBiasedLocking -XX:ParallelGCThreads=48 "
+                "-Xmx4g -Dspec.prop=1 -server"),
+            [("UseG1GC", "true"), ("UseBiasedLocking", "false"),
+             ("ParallelGCThreads", "48"), ("Xmx", "4g"), ("Dspec.prop", "1"),
+             ("server", "")])
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        self.catalog = Catalog(os.path.join(self.td.name, "results.db"))
+
+    def tearDown(self):
+        self.catalog.close()
+        self.td.cleanup()
+
+    def record(self, path, controller_type, gc_threads, **kw):
+        return self.catalog.record(
+            path,
+            tag=os.path.basename(path),
+            run_type="multi",
+            jdk='openjdk version "11.0.2" 2019-01-15',
+            java="/usr/lib/jvm/java-11/bin/java",
+            jvm_options="-Xmx4g -XX:ParallelGCThreads={}".format(gc_threads),
+            props={
+                "specjbb.controller.type": controller_type,
+                "specjbb.group.count": 2
+            },
+            topology={
+                "groups": 2,
+                "numa_nodes": 2,
+                "binding": "core",
+                "cpus": [0, 1, 2, 3]
+            },
+            exit_code=0,
+            **kw)
+
+    def test_record(self):
+        run_id = self.record("/results/a", "HBIR_RT", 48, analysis=analysis())
+
+        run = self.catalog.get(run_id)
+        self.assertEqual((run["max_jops"], run["critical_jops"]), (12345, 6789))
+        self.assertIsNone(run["hbir_attempted"])
+        self.assertEqual((run["failure_point"], run["steady_end"]), (1500, 2000))
+        self.assertEqual(run["cpus"], "0-3")
+        self.assertEqual(self.catalog.props(run_id)["specjbb.group.count"], "2")
+        self.assertEqual(self.catalog.flags(run_id)["ParallelGCThreads"], "48")
+        gc = self.catalog.gc(run_id)
+        self.assertEqual(gc["pct"], 1.0)
+        self.assertIsNone(gc["major_interval"])
+
+    def test_record_without_analysis(self):
+        run_id = self.record("/results/a", "HBIR_RT", 48)
+
+        self.assertIsNone(self.catalog.get(run_id)["max_jops"])
+        self.assertIsNone(self.catalog.gc(run_id))
+
+    def test_recording_again_replaces(self):
+        self.record("/results/a", "HBIR_RT", 48)
+        run_id = self.record("/results/a", "HBIR", 24)
+
+        runs = self.catalog.find()
+        self.assertEqual([r["id"] for r in runs], [run_id])
+        self.assertEqual(self.catalog.flags(run_id)["ParallelGCThreads"], "24")
+
+    def test_find(self):
+        self.record("/results/a", "HBIR_RT", 48, finished=1)
+        self.record("/results/b", "HBIR_RT", 24, finished=2)
+        self.record("/results/c", "HBIR", 48, finished=3)
+
+        found = self.catalog.find(
+            props={"specjbb.controller.type": "HBIR_RT"},
+            flags={"ParallelGCThreads": 48},
+            jdk='%"11.0.2"%')
+        self.assertEqual([r["tag"] for r in found], ["a"])
+        self.assertEqual(
+            len(self.catalog.find(java="/usr/lib/jvm/java-11/bin/java")), 3)
+        # newest first
+        self.assertEqual(
+            [r["tag"] for r in self.catalog.find(flags={"ParallelGCThreads": 48})],
+            ["c", "a"])
+        self.assertEqual(len(self.catalog.find(limit=2)), 2)
+        self.assertEqual(self.catalog.find(tag="d"), [])
+
+    def test_lookups_use_indexes(self):
+        plan = self.catalog.db.execute(
+            "EXPLAIN QUERY PLAN SELECT run_id FROM props WHERE name = ? AND value = ?",
+            ("specjbb.controller.type", "HBIR_RT")).fetchall()
+
+        self.assertIn("props_lookup", " ".join(str(tuple(r)) for r in plan))
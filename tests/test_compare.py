@@ -0,0 +1,133 @@
+import os
+import tempfile
+import unittest
+
+from src import compare
+from src.catalog import Catalog, config_key
+from src.gc_log import GcSummary
+from src.rollup import RunAnalysis
+
+
+def analysis(max_jops, gc_avg=None):
+    gc = None
+    if gc_avg is not None:
+        gc = GcSummary(*([0] * len(GcSummary._fields)))._replace(
+            avg=gc_avg, pct=1.0, major_avg=gc_avg * 10)
+    return RunAnalysis([str(max_jops), str(max_jops // 2), "", ""], None, gc,
+                       "", [])
+
+
+class TestStudentT(unittest.TestCase):
+
+    def test_t_sf(self):
+        self.assertAlmostEqual(compare.t_sf(0, 5), 0.5)
+        # the 95th and 99th percentiles of t tables
+        self.assertAlmostEqual(compare.t_sf(2.015, 5), 0.05, places=4)
+        self.assertAlmostEqual(compare.t_sf(2.457, 30), 0.01, places=4)
+        self.assertAlmostEqual(compare.t_sf(-2.015, 5), 0.95, places=4)
+
+    def test_untestable(self):
+        *_, p = compare.test([100], (1, 100.0, 10000.0))
+
+        self.assertIsNone(p)
+
+
+class TestCompare(unittest.TestCase):
+
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        self.catalog = Catalog(os.path.join(self.td.name, "results.db"))
+
+    def tearDown(self):
+        self.catalog.close()
+        self.td.cleanup()
+
+    def record(self, path, jops, gc_avg=None, jdk="jdk8", exit_code=0):
+        return self.catalog.record(
+            os.path.join(self.td.name, path),
+            run_type="multi",
+            jdk=jdk,
+            jvm_options="-Xmx4g",
+            props={
+                "specjbb.group.count": 2,
+                "specjbb.controller.port": 24000 + len(path)
+            },
+            exit_code=exit_code,
+            analysis=analysis(jops, gc_avg))
+
+    def history(self):
+        for i, jops in enumerate([100000, 101000, 99000, 100500, 99500]):
+            self.record(os.path.join("old", str(i)), jops, gc_avg=20 + i % 2)
+
+    def baseline(self):
+        config = self.catalog.get(self.catalog.find()[0]['id'])['config']
+        return self.catalog.baseline(config)
+
+    def test_baseline_is_kept_up_to_date(self):
+        self.history()
+        self.record("failed", 10, exit_code=-1)
+
+        n, total, _ = self.baseline()['max_jops']
+        self.assertEqual((n, total), (5, 500000))
+        # recording a run again replaces it in the baseline
+        self.record(os.path.join("old", "0"), 90000, gc_avg=20)
+        n, total, _ = self.baseline()['max_jops']
+        self.assertEqual((n, total), (5, 490000))
+
+    def test_under(self):
+        self.history()
+        self.record("old-but-not-under", 100000)
+
+        under = self.catalog.under(os.path.join(self.td.name, "old") + os.sep)
+        self.assertEqual(len(under), 5)
+        self.assertEqual(
+            len(self.catalog.under(os.path.join(self.td.name, "old", "1"))), 1)
+
+    def test_regression(self):
+        self.history()
+        self.record(os.path.join("new", "0"), 90000, gc_avg=30, jdk="jdk11")
+        self.record(os.path.join("new", "1"), 90500, gc_avg=31, jdk="jdk11")
+
+        result = {
+            c.metric: c
+            for c in compare.compare(self.catalog,
+                                     [os.path.join(self.td.name, "new")])
+        }
+        self.assertEqual(result['max_jops'].baseline_n, 5)
+        self.assertAlmostEqual(result['max_jops'].baseline_mean, 100000)
+        self.assertTrue(result['max_jops'].regression)
+        # more time in GC is worse
+        self.assertTrue(result['gc_avg'].regression)
+        self.assertIn("REGRESSION", compare.describe(result['max_jops']))
+
+    def test_noise_is_not_a_regression(self):
+        self.history()
+        self.record(os.path.join("new", "0"), 99200, gc_avg=21)
+
+        result = compare.compare(self.catalog,
+                                 [os.path.join(self.td.name, "new")])
+        self.assertTrue(result)
+        self.assertFalse(any(c.regression for c in result))
+
+    def test_no_baseline(self):
+        self.record(os.path.join("new", "0"), 100000)
+
+        result = compare.compare(self.catalog,
+                                 [os.path.join(self.td.name, "new")])
+        self.assertEqual(result[0].baseline_n, 0)
+        self.assertFalse(result[0].regression)
+        self.assertIn("no baseline", compare.describe(result[0]))
+
+    def test_config_key(self):
+        a = config_key("multi", "-Xmx4g", 2, None, None, {
+            "a": 1,
+            "specjbb.controller.port": 1
+        })
+        b = config_key("multi", "-Xmx4g", "2", None, None, {
+            "a": "1",
+            "specjbb.controller.port": 2
+        })
+
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, config_key("multi", "-Xmx8g", 2, None, None,
+                                          {"a": 1}))
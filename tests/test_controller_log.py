@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+from src.controller_log import Failure, Phase, RtStep, parse_line, read, records, summarize, summarize_file
+
+CONTROLLER_OUT = """\
+    2s: Agent Group1.Backend.beJVM has attached to Controller
+   60s: Performing load levels
+  300s: Ramping up completed
+  960s: Building throughput-responsetime curve
+ 8702s: ( 96%)   IR = 184395 .............|........ (rIR:aIR:PR = 184395:179542:179401) (tPR = 5689513) [OK]
+ 8766s: Failed, 4 overall retries left, retrying 1 of 1
+ 8766s: (97%)   IR = 186315 ..........?....|.....?.. (rIR:aIR:PR = 186315:181365:180999) (tPR = 5748649) [OK]
+ 8830s: (98%)   IR = 188236 ..........?....|.....??? (rIR:aIR:PR = 188236:170011:169988) (tPR = 5330071) [fail]
+ 8831s: Failed, 3 overall retries left, retrying 1 of 1
+ 8900s: max-jOPS is presumably 186315
+ 8901s: Performing load levels
+"""
+
+
+class TestParseLine(unittest.TestCase):
+
+    def test_rt_step(self):
+        r = parse_line(CONTROLLER_OUT.splitlines()[4])
+
+        self.assertEqual(
+            r, RtStep(8702, 96, 184395, 184395, 179542, 179401, 5689513, "OK"))
+
+    def test_rt_step_without_optional_parts(self):
+        r = parse_line("12s: IR = 100 ... (rIR:aIR:PR = 100:99:98)")
+
+        self.assertEqual(r, RtStep(12, None, 100, 100, 99, 98, None, None))
+
+    def test_phases_and_failures(self):
+        self.assertEqual(
+            parse_line(" 8900s: max-jOPS is presumably 186315\n"),
+            Phase(8900, "max_jops", 186315))
+        self.assertEqual(
+            parse_line("300s: Ramping up completed"),
+            Phase(300, "ramp_up", None))
+        self.assertEqual(
+            parse_line("8766s: Failed, 4 overall retries left, retrying 1 of 1"),
+            Failure(8766, 4, 1, 1))
+
+    def test_other_lines(self):
+        self.assertIsNone(parse_line("2s: Agent has attached to Controller"))
+        self.assertIsNone(parse_line("IR = nothing to see"))
+        self.assertIsNone(parse_line(""))
+
+
+class TestSummarize(unittest.TestCase):
+
+    def test_rt_curve_window(self):
+        s = summarize(records(CONTROLLER_OUT.splitlines(True)))
+
+        # a load level after the curve doesn't move the window
+        self.assertEqual((s.start, s.end), (960, 8900))
+        self.assertEqual(s.first_failure, 8766)
+        self.assertEqual(s.max_jops, 186315)
+        self.assertEqual((s.steps, s.failures), (3, 2))
+        self.assertEqual(s.last_step.status, "fail")
+
+    def test_curve_without_max_jops(self):
+        s = summarize(records(["960s: Building throughput-responsetime curve"]))
+
+        self.assertEqual((s.start, s.end), (960, 6960))
+
+    def test_steady_state_window(self):
+        s = summarize(records(["60s: Performing load levels"]))
+
+        self.assertEqual((s.start, s.end, s.first_failure), (60, 960, None))
+
+    def test_defaults(self):
+        s = summarize([])
+
+        self.assertEqual((s.start, s.end, s.last_step), (1500, 8000, None))
+
+    def test_file_is_streamed(self):
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "controller.out")
+            with open(path, 'w') as f:
+                f.write(CONTROLLER_OUT)
+
+            it = read(path)
+            self.assertEqual(next(it), Phase(60, "load_levels", None))
+            self.assertEqual(summarize_file(path).max_jops, 186315)
+            it.close()
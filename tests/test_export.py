@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src import export
+from src.export import MISSING_INT, RunColumns, load
+from tests.test_rollup import make_run, write
+
+STEPS = """\
+  960s: Building throughput-responsetime curve
+ 1400s: (96%)   IR = 184395 ........ (rIR:aIR:PR = 184395:179542:179401) (tPR = 5689513) [OK]
+ 1500s: Failed, 4 overall retries left, retrying 1 of 1
+ 1600s: IR = 186315 ........ (rIR:aIR:PR = 186315:181365:180999)
+ 2000s: max-jOPS is presumably 186315
+"""
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.td.name, "results_2-runs_+18-03-01_120000")
+        self.out = os.path.join(self.td.name, "exported")
+        os.makedirs(self.root)
+        write(make_run(self.root, "+18-03-01_120001-a"), "controller.out",
+              STEPS)
+        make_run(self.root, "+18-03-01_120002-b", gc=False)
+
+    def tearDown(self):
+        self.td.cleanup()
+
+    def test_export(self):
+        self.assertEqual(export.export(self.root, self.out, lambda m: None, 1), 2)
+
+        runs = load(self.out, "runs")
+        self.assertEqual(set(runs), set(name for name, _ in RunColumns))
+        self.assertIsInstance(runs["max_jops"], np.memmap)
+        self.assertEqual(list(runs["name"]),
+                         ["+18-03-01_120001-a", "+18-03-01_120002-b"])
+        self.assertEqual(runs["max_jops"].dtype, np.int64)
+        self.assertEqual(list(runs["max_jops"]), [12345, 12345])
+        self.assertEqual(list(runs["failure_point"]), [1500, 1500])
+        self.assertEqual(list(runs["gc_events"]), [2, 0])
+        self.assertEqual(runs["gc_minor_count"][0], 2)
+        self.assertTrue(np.isnan(runs["gc_minor_count"][1]))
+        self.assertEqual(runs["jvm_options"][0], "-Xmx4g -XX:+UseParallelGC")
+
+        steps = load(self.out, "steps")
+        self.assertEqual(list(steps["run"]), [0, 0])
+        self.assertEqual(list(steps["ir"]), [184395, 186315])
+        self.assertEqual(list(steps["tpr"]), [5689513, MISSING_INT])
+        self.assertEqual(list(steps["status"]), ["OK", ""])
+
+        gc = load(self.out, "gc", ["run", "pause", "major"], mmap_mode=None)
+        self.assertEqual(set(gc), {"run", "pause", "major"})
+        self.assertEqual(list(gc["run"]), [0, 0])
+        self.assertEqual(list(gc["pause"]), [0.5, 1.0])
+        self.assertFalse(gc["major"].any())
+
+    def test_schema(self):
+        export.export([self.root], self.out, lambda m: None, 1)
+
+        with open(os.path.join(self.out, export.SCHEMA_FILE)) as f:
+            schema = json.load(f)
+        self.assertEqual(schema["tables"]["runs"]["rows"], 2)
+        self.assertEqual(schema["tables"]["gc"]["columns"]["major"], "|b1")
+        self.assertEqual(export.schema(self.out)["version"],
+                         export.SCHEMA_VERSION)
+
+    def test_empty_tree(self):
+        empty = os.path.join(self.td.name, "empty")
+        os.makedirs(empty)
+
+        self.assertEqual(export.export(empty, self.out, lambda m: None), 0)
+        self.assertEqual(len(load(self.out, "steps")["ir"]), 0)
+
+    def test_unknown_table(self):
+        export.export(self.root, self.out, lambda m: None, 1)
+
+        with self.assertRaises(Exception):
+            load(self.out, "nope")
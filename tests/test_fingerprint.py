@@ -0,0 +1,117 @@
+import os
+import stat
+import tempfile
+import unittest
+
+from src import fingerprint
+from src.admission import AdmissionDecision
+from src.benchmark_run import SpecJBBRun
+from src.catalog import Catalog, DEFAULT_NAME
+from src.fingerprint import Deduplicator
+
+
+class RunsMixin:
+
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        self.jar = self.write("specjbb2015.jar", "jar contents")
+        self.java = self.java_reporting("jdk-11.0.2")
+
+    def tearDown(self):
+        self.td.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.td.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def java_reporting(self, version, name="java"):
+        path = self.write(
+            os.path.join(version + "-" + name),
+            "#!/bin/sh\necho 'openjdk version \"{}\"' >&2\n".format(version))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def spec_run(self, tag="a", **kw):
+        args = dict(
+            controller={"type": "multi"},
+            backends=2,
+            java={"path": self.java, "options": ["-Xmx4g"]},
+            jar=self.jar,
+            tag=tag,
+            cwd=self.td.name,
+            props={"specjbb.group.count": 2, "specjbb.controller.port": 24000})
+        args.update(kw)
+        return SpecJBBRun(**args)
+
+
+class TestFingerprint(RunsMixin, unittest.TestCase):
+
+    def test_identical_runs_match(self):
+        a = self.spec_run("a")
+        b = self.spec_run("b", props={"specjbb.group.count": 2,
+                                 "specjbb.controller.port": 24010})
+
+        self.assertEqual(a.fingerprint(), b.fingerprint())
+        self.assertEqual(fingerprint.components(a)["jdk"],
+                         'openjdk version "jdk-11.0.2"')
+
+    def test_what_a_run_executes_changes_it(self):
+        a = self.spec_run().fingerprint()
+
+        self.assertNotEqual(a, self.spec_run(props={"specjbb.group.count": 4}).fingerprint())
+        self.assertNotEqual(a, self.spec_run(java={"path": self.java, "options": ["-Xmx8g"]}).fingerprint())
+        self.assertNotEqual(a, self.spec_run(backends=4).fingerprint())
+        self.assertNotEqual(a, self.spec_run(java={"path": self.java_reporting("jdk-17")}).fingerprint())
+        self.write("specjbb2015.jar", "a different jar")
+        self.assertNotEqual(a, self.spec_run().fingerprint())
+
+    def test_paths_of_the_same_jdk_match(self):
+        other = self.java_reporting("jdk-11.0.2", name="elsewhere")
+
+        self.assertEqual(self.spec_run().fingerprint(),
+                         self.spec_run(java={"path": other, "options": ["-Xmx4g"]}).fingerprint())
+
+    def test_shrunk_runs_are_fingerprinted_again(self):
+        s = self.spec_run()
+        before = s.fingerprint()
+        s._admitted(AdmissionDecision(True, 1, "shrunk"), s.demand(), True,
+                    "pool", None)
+
+        self.assertNotEqual(s.fingerprint(), before)
+        self.assertEqual(
+            s.fingerprint(),
+            self.spec_run(backends=1,
+                          props={"specjbb.group.count": 1,
+                                 "specjbb.controller.port": 24000}).fingerprint())
+
+class TestDeduplicator(RunsMixin, unittest.TestCase):
+
+    def test_duplicates_are_only_skipped_with_reuse(self):
+        warn = Deduplicator()
+        self.assertFalse(warn.skip(self.spec_run("a")))
+        self.assertFalse(warn.skip(self.spec_run("b")))
+        self.assertEqual(warn.duplicates, 1)
+        self.assertIn("--reuse", warn.report()[-1])
+
+        reuse = Deduplicator(reuse=True)
+        self.assertFalse(reuse.skip(self.spec_run("a")))
+        self.assertTrue(reuse.skip(self.spec_run("b")))
+        self.assertFalse(reuse.skip(self.spec_run("c", backends=4)))
+        self.assertEqual(reuse.report()[0], "skipped b: identical to a")
+
+    def test_completed_runs_are_skipped(self):
+        done = self.spec_run("done")
+        with Catalog(os.path.join(self.td.name, DEFAULT_NAME)) as c:
+            c.record(os.path.join(self.td.name, "done"), "done", exit_code=0,
+                     fingerprint=done.fingerprint(), duration=5400)
+            c.record(os.path.join(self.td.name, "aborted"), "aborted",
+                     exit_code=-1, fingerprint=self.spec_run(backends=4).fingerprint())
+
+        d = Deduplicator(reuse=True)
+        self.assertTrue(d.skip(self.spec_run("again")))
+        # an aborted run doesn't count
+        self.assertFalse(d.skip(self.spec_run("other", backends=4)))
+        self.assertEqual(d.saved(), (1.5, 0))
+        self.assertEqual(d.report()[-1], "skipped 1 runs, saving 1.50 machine-hours")
@@ -0,0 +1,95 @@
+import math
+import os
+import tempfile
+import unittest
+
+from src import gc_log
+from src.gc_log import analyze, detect_format, parse_bytes, rollup_row, summarize
+
+DETAILS = b"""\
+Java HotSpot(TM) 64-Bit Server VM (25.102-b14) for linux-amd64 JRE (1.8.0_102-b14)
+100.000: [GC (Allocation Failure) [PSYoungGen: 9000K->1000K(10000K)] 20000K->12000K(40000K), 0.5000000 secs] [Times: user=3.65 sys=0.00, real=0.50 secs]
+200.000: [GC (Allocation Failure) 200.100: [SoftReference, 0 refs, 0.0023880 secs]200.200: [WeakReference, 2 refs, 0.0055110 secs]200.300: [FinalReference, 3 refs, 0.0178740 secs]200.400: [PhantomReference, 0 refs, 0.0012550 secs]200.500: [JNI Weak Reference, 0.0000020 secs][PSYoungGen: 9000K->3000K(10000K)] 22000K->16000K(40000K), 1.0000000 secs] [Times: user=10.57 sys=0.02, real=1.00 secs]
+300.000: [Full GC (Ergonomics) [PSYoungGen: 3000K->0K(10000K)] [ParOldGen: 13000K->5000K(30000K)] 16000K->5000K(40000K), [Metaspace: 2000K->1500K(4000K/8000K)], 2.0000000 secs] [Times: user=136.97 sys=0.22, real=2.00 secs]
+2018-03-01T10:00:00.000+0000: 400.000: [GC (Allocation Failure) [PSYoungGen: 9000K->2000K(10000K)] 14000K->7000K(40000K), 0.2500000 secs]
+"""
+
+UNIFIED = b"""\
+[0.012s][info][gc] Using G1
+[10.000s][info][gc] GC(0) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 4.000ms
+[20.000s][info][gc] GC(1) Pause Full (System.gc()) 1G->2M(2G) 20.000ms
+[30.000s][info][gc] GC(2) Pause Remark 10M->10M(256M) 1.000ms
+[31.000s][info][gc] GC(2) Pause Cleanup 10M->10M(256M) 0.500ms
+[40.000s][info][gc] GC(3) Pause Young (Mixed) (G1 Evacuation Pause) 20M->8M(256M) 2.000ms
+"""
+
+JROCKIT = b"""\
+[INFO ][memory ] 191.937-192.682: GC 1063966K->1478956K (2478080K), sum of pauses 374.267 ms
+[memory ] 1389.600-1390.280: GC 6291456K->1638763K (6291456K), 679.662 ms
+"""
+
+
+class TestGcLog(unittest.TestCase):
+
+    def test_detects_format(self):
+        self.assertEqual(detect_format(DETAILS).name, "hotspot-details")
+        self.assertEqual(detect_format(UNIFIED).name, "unified")
+        self.assertEqual(detect_format(JROCKIT).name, "jrockit")
+        self.assertIsNone(detect_format(b"nothing to see\n"))
+
+    def test_parses_details(self):
+        e = parse_bytes(DETAILS)
+
+        self.assertEqual(list(e.when), [100, 200, 300, 400])
+        self.assertEqual(list(e.major), [False, False, True, False])
+        self.assertEqual(list(e.pause), [0.5, 1.0, 2.0, 0.25])
+        self.assertEqual(e.young[1], 3000)
+        self.assertEqual((e.old[2], e.perm[2]), (5000, 1500))
+        self.assertTrue(math.isnan(e.old[0]))
+
+    def test_parses_unified(self):
+        e = parse_bytes(UNIFIED)
+
+        # Remark and Cleanup aren't collections
+        self.assertEqual(list(e.when), [10, 20, 40])
+        self.assertEqual(list(e.before), [24 * 1024, 1024**2, 20 * 1024])
+        self.assertEqual(list(e.major), [False, True, False])
+        self.assertAlmostEqual(e.pause[0], 0.004)
+        self.assertEqual(summarize(e).minor_count, 2)
+
+    def test_summary(self):
+        s = summarize(parse_bytes(DETAILS))
+
+        self.assertEqual((s.minor_count, s.major_count), (3, 1))
+        self.assertEqual(s.minor_time, 1.75)
+        # gaps are measured from the end of a pause to the start of the next
+        self.assertAlmostEqual(s.interval, (99.5 + 99 + 98) / 3)
+        self.assertEqual(s.duration, 400.25)
+        self.assertAlmostEqual(s.pct, 100 * 3.75 / 400.25)
+        self.assertEqual(s.major_resident, 5000)
+        self.assertTrue(math.isnan(s.major_interval))
+
+        row = rollup_row(s)
+        self.assertEqual(len(row), len(gc_log.RollupColumns))
+        self.assertEqual(row[1], "")
+        self.assertEqual(row[-1], "5000")
+
+    def test_window(self):
+        s = summarize(parse_bytes(DETAILS), start=150, end=350)
+
+        self.assertEqual((s.minor_count, s.major_count), (1, 1))
+        self.assertEqual(s.duration, 152)
+
+        with self.assertRaises(Exception):
+            summarize(parse_bytes(DETAILS), start=1000)
+
+    def test_analyze_file(self):
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "GC.log")
+            with open(path, 'wb') as f:
+                f.write(UNIFIED)
+            empty = os.path.join(td, "empty.log")
+            open(empty, 'w').close()
+
+            self.assertEqual(analyze(path, end=25).major_count, 1)
+            self.assertEqual(len(gc_log.parse(empty)), 0)
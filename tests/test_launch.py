@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+
+from src.launch import launch_scheduler
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLaunchScheduler(unittest.TestCase):
+
+    def _scheduler(self, count, **kw):
+        clock = FakeClock()
+        s = launch_scheduler(clock=clock, **kw)
+        started = []
+        for g in range(count):
+            name = "{}.Backend.beJVM".format(g)
+            s.add(name, lambda name=name: started.append(name))
+        return s, clock, started
+
+    def test_no_waves_starts_everything_at_once(self):
+        s, clock, started = self._scheduler(3)
+
+        s.tick()
+
+        self.assertEqual(len(started), 3)
+        self.assertTrue(s.done())
+        self.assertEqual(s.waves(), 1)
+
+    def test_waits_for_controller_to_be_ready(self):
+        s, clock, started = self._scheduler(3, wave_size=2)
+
+        s.tick()
+        self.assertEqual(started, [])
+
+        s.controller_line("  1s: Binary log file is /tmp/x.data.gz\n")
+        s.tick()
+        self.assertEqual(started, ["0.Backend.beJVM", "1.Backend.beJVM"])
+
+    def test_ready_timeout(self):
+        s, clock, started = self._scheduler(1, wave_size=1, ready_timeout=10)
+
+        s.tick()
+        self.assertEqual(started, [])
+
+        clock.now += 10
+        s.tick()
+        self.assertEqual(started, ["0.Backend.beJVM"])
+
+    def test_next_wave_waits_for_handshakes(self):
+        s, clock, started = self._scheduler(3, wave_size=2)
+        s.controller_line("Waiting for agents\n")
+        s.tick()
+
+        clock.now += 1.5
+        a = s.controller_line("  5s: Agent 0.Backend.beJVM has attached\n")
+        self.assertEqual(a.name, "0.Backend.beJVM")
+        self.assertEqual(a.handshake_time(), 1.5)
+        s.tick()
+        self.assertEqual(len(started), 2)
+
+        clock.now += 1
+        s.controller_line("  6s: Agent 1.Backend.beJVM has attached\n")
+        s.tick()
+        self.assertEqual(len(started), 3)
+        self.assertEqual(s.waves(), 2)
+
+    def test_wave_timeout(self):
+        s, clock, started = self._scheduler(2, wave_size=1, wave_timeout=30)
+        s.controller_line("Waiting for agents\n")
+        s.tick()
+
+        clock.now += 29
+        s.tick()
+        self.assertEqual(len(started), 1)
+
+        clock.now += 1
+        s.tick()
+        self.assertEqual(len(started), 2)
+
+    def test_max_pending(self):
+        s, clock, started = self._scheduler(
+            4, wave_size=3, max_pending=2, wave_timeout=0)
+        s.controller_line("Waiting for agents\n")
+
+        s.tick()
+        self.assertEqual(len(started), 2)
+        s.tick()
+        self.assertEqual(len(started), 2)
+
+        s.controller_line("Agent 1.Backend.beJVM has attached\n")
+        s.tick()
+        self.assertEqual(len(started), 3)
+
+    def test_agent_names_must_match_exactly(self):
+        s, clock, started = self._scheduler(12)
+        s.tick()
+
+        s.controller_line("Agent 11.Backend.beJVM has attached\n")
+
+        attached = [a.name for a in s.agents if a.attached is not None]
+        self.assertEqual(attached, ["11.Backend.beJVM"])
+
+    def test_write_report(self):
+        s, clock, started = self._scheduler(2)
+        s.tick()
+        clock.now += 2
+        s.controller_line("Agent 0.Backend.beJVM has attached\n")
+
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "handshake.csv")
+            s.write_report(path)
+            with open(path) as f:
+                lines = f.read().splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1], "0.Backend.beJVM,1,0.0,2.0,2.0")
+        self.assertEqual(lines[2], "1.Backend.beJVM,1,0.0,,")
@@ -0,0 +1,104 @@
+import copy
+import io
+import os
+import tempfile
+import unittest
+
+from objects import props, propitem, default_props, spec_run, parse_abort_policy
+from src import rt_monitor
+from src.catalog import Catalog
+
+
+class TestProps(unittest.TestCase):
+
+    def test_only_overrides_are_kept(self):
+        p = props()
+        p.set('specjbb.group.count', 4)
+        p.root['specjbb.txi.pergroup.count'].value = 2
+
+        self.assertEqual(p.overrides, {
+            'specjbb.group.count': 4,
+            'specjbb.txi.pergroup.count': 2
+        })
+        self.assertEqual(p.root['specjbb.group.count'].value, 4)
+        self.assertEqual(
+            [x.prop for x in p.get_modified()],
+            ['specjbb.group.count', 'specjbb.txi.pergroup.count'])
+        self.assertEqual(len(p.get_all()), len(default_props))
+
+    def test_defaults_are_shared_and_unchanged(self):
+        a, b = props(), props()
+        a.set('specjbb.group.count', 4)
+
+        self.assertEqual(b.root['specjbb.group.count'].value, 1)
+        self.assertEqual(default_props['specjbb.group.count'].value, 1)
+        with self.assertRaises(TypeError):
+            default_props['specjbb.group.count'] = None
+
+    def test_setting_the_default_removes_the_override(self):
+        p = props()
+        p.set('specjbb.group.count', 4)
+        p.root['specjbb.group.count'].reset()
+
+        self.assertEqual(p.overrides, {})
+        self.assertEqual(p.get_modified(), [])
+
+    def test_copies_are_independent(self):
+        p = props()
+        p.set('specjbb.group.count', 4)
+        q = copy.deepcopy(p)
+        q.set('specjbb.group.count', 8)
+
+        self.assertEqual(p.root['specjbb.group.count'].value, 4)
+        self.assertEqual(q.root['specjbb.group.count'].value, 8)
+
+    def test_json_round_trip(self):
+        p = props()
+        p.set('specjbb.group.count', 4)
+        q = props(p._tojson())
+
+        self.assertEqual(q.overrides, p.overrides)
+        f = io.StringIO()
+        q.root['specjbb.group.count']._write(f)
+        self.assertEqual(f.getvalue(), "specjbb.group.count = 4")
+
+    def test_propitem_has_slots(self):
+        with self.assertRaises(AttributeError):
+            default_props['specjbb.group.count'].extra = 1
+        self.assertIsInstance(default_props['specjbb.group.count'], propitem)
+
+
+class TestRecord(unittest.TestCase):
+
+    def test_runs_record_the_props_they_set(self):
+        with tempfile.TemporaryDirectory() as td:
+            result_dir = os.path.join(td, "results", "run")
+            os.makedirs(result_dir)
+            r = spec_run()
+            r.jdk = os.path.join(td, "no-java")
+            r.properties.set('specjbb.group.count', 2)
+            errors = []
+
+            r._record(result_dir, 0, errors.append)
+
+            self.assertEqual(errors, [])
+            with Catalog(os.path.join(td, "results.db")) as c:
+                run = c.find()[0]
+                self.assertEqual(c.props(run["id"]),
+                                 {'specjbb.group.count': '2'})
+
+
+class TestParseAbortPolicy(unittest.TestCase):
+
+    def test_policies_are_parsed_as_json(self):
+        self.assertEqual(
+            parse_abort_policy('{"low_percent": 50, "baseline": "catalog"}'),
+            {"low_percent": 50, "baseline": "catalog"})
+        self.assertEqual(parse_abort_policy("  "), {})
+        # what rt_monitor.policy builds the AbortPolicy from
+        self.assertIsNotNone(rt_monitor.policy(parse_abort_policy('{"min_fraction": 0.5}')))
+
+    def test_invalid_policies_are_refused(self):
+        for text in ["low_percent=50", '"{}"', '{"min_fraction": 2}', '{"other": 1}']:
+            with self.assertRaises(Exception):
+                parse_abort_policy(text)
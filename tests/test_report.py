@@ -0,0 +1,87 @@
+import gzip
+import io
+import os
+import tempfile
+import unittest
+
+from src import report
+from src.report import RtPercentiles, percentile
+
+REPORT = """\
+<html><head>
+<title>SPECjbb2015 Report: 12345 SPECjbb2015-MultiJVM max-jOPS, 6789 SPECjbb2015-MultiJVM critical-jOPS</title>
+</head><body>
+<table>
+<tr><th>Metric</th><th>Value</th></tr>
+<tr><td>HBIR settled</td><td>190000</td></tr>
+<tr><td>HBIR attempted</td><td>200,000 jOPS</td></tr>
+</table>
+<h2>Response time percentiles (us)</h2>
+<table>
+<tr><th>IR %</th><th>min</th><th>p50</th><th>90-th percentile</th><th>99th percentile</th><th>max</th></tr>
+<tr><td>10%</td><td>200</td><td>1,500</td><td>3000</td><td>9000.5</td><td>12000</td>
+<tr><td>20%</td><td>210</td><td>1600</td><td>3100</td><td>-</td><td>13000</td></tr>
+</table>
+</body></html>
+"""
+
+
+class TestPercentile(unittest.TestCase):
+
+    def test_headers(self):
+        self.assertEqual(percentile("p99"), 99)
+        self.assertEqual(percentile("99.9th percentile"), 99.9)
+        self.assertEqual(percentile("50-th percentile"), 50)
+        self.assertEqual(percentile("Median"), 50)
+        self.assertEqual(percentile("max (us)"), 100)
+        self.assertIsNone(percentile("IR %"))
+        self.assertIsNone(percentile("p150"))
+
+
+class TestReport(unittest.TestCase):
+
+    def test_parse(self):
+        r = report.parse(io.StringIO(REPORT))
+
+        self.assertEqual((r.max_jops, r.critical_jops), (12345, 6789))
+        self.assertEqual((r.hbir_settled, r.hbir_attempted), (190000, 200000))
+        self.assertEqual(r.rt_percentiles, [
+            RtPercentiles("10%", {
+                0.0: 200.0,
+                50.0: 1500.0,
+                90.0: 3000.0,
+                99.0: 9000.5,
+                100.0: 12000.0
+            }),
+            RtPercentiles("20%", {
+                0.0: 210.0,
+                50.0: 1600.0,
+                90.0: 3100.0,
+                100.0: 13000.0
+            }),
+        ])
+
+    def test_any_chunk_size(self):
+        whole = report.parse(io.StringIO(REPORT))
+
+        for chunk in (1, 7, 100):
+            self.assertEqual(report.parse(io.StringIO(REPORT), chunk), whole)
+
+    def test_missing_values(self):
+        r = report.parse(io.StringIO("<html><body><p>nothing</p></body></html>"))
+
+        self.assertEqual(r, report.Report(None, None, None, None, []))
+
+    def test_gzip_and_find(self):
+        with tempfile.TemporaryDirectory() as td:
+            self.assertIsNone(report.find(td))
+            path = os.path.join(td, "report.html.gz")
+            with gzip.open(path, 'wt') as f:
+                f.write(REPORT)
+
+            self.assertEqual(report.find(td), path)
+            self.assertEqual(report.read(path).max_jops, 12345)
+
+            with open(os.path.join(td, "other.html"), 'w') as f:
+                f.write(REPORT)
+            self.assertEqual(report.find(td), os.path.join(td, "other.html"))
@@ -0,0 +1,144 @@
+import csv
+import os
+import tempfile
+import unittest
+
+from src import rollup
+from src.rollup import RollupHeader, rollup_dir, run_dirs
+
+CONTROLLER_OUT = """\
+  960s: Building throughput-responsetime curve
+ 1500s: Failed, 4 overall retries left, retrying 1 of 1
+ 2000s: max-jOPS is presumably 186315
+"""
+
+GC_LOG = """\
+1500.000: [GC (Allocation Failure) [PSYoungGen: 9000K->1000K(10000K)] 20000K->12000K(40000K), 0.5000000 secs]
+1600.000: [GC (Allocation Failure) [PSYoungGen: 9000K->3000K(10000K)] 22000K->16000K(40000K), 1.0000000 secs]
+"""
+
+REPORT = """\
+<title>SPECjbb2015 Report: 12345 SPECjbb2015-Composite max-jOPS, 6789 SPECjbb2015-Composite critical-jOPS</title>
+<td>HBIR settled at 190000</td>
+<td>HBIR attempted 200000</td>
+"""
+
+
+def write(path, name, text):
+    with open(os.path.join(path, name), 'w') as f:
+        f.write(text)
+
+
+def make_run(parent, name, gc=True):
+    path = os.path.join(parent, name)
+    os.makedirs(path)
+    write(path, "controller.out", CONTROLLER_OUT)
+    write(path, "report.html", REPORT)
+    write(path, "sut.txt", "All JVM options -Xmx4g -XX:+UseParallelGC\n")
+    if gc:
+        write(path, "Group1.Backend.beJVM.GC.log", GC_LOG)
+    return path
+
+
+class TestRollup(unittest.TestCase):
+
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.td.name, "results_3-runs_+18-03-01_120000")
+        os.makedirs(os.path.join(self.root, "config"))
+
+    def tearDown(self):
+        self.td.cleanup()
+
+    def test_run_dirs(self):
+        make_run(self.root, "+18-03-01_120002-b")
+        make_run(self.root, "+18-03-01_120001-a")
+
+        self.assertEqual(run_dirs(self.root),
+                         ["+18-03-01_120001-a", "+18-03-01_120002-b"])
+
+    def test_rollup_dir(self):
+        row, messages = rollup_dir(make_run(self.root, "+18-03-01_120001-a"))
+
+        self.assertEqual(messages, [])
+        self.assertEqual(len(row), len(RollupHeader))
+        self.assertEqual(row[:8], [
+            "+18-03-01_120001-a", "12345", "6789", "190000", "200000", "960",
+            "2000", "1040"
+        ])
+        # both pauses are in the last 600s of the steady state
+        self.assertEqual(row[RollupHeader.index("Avg secs between Young GC")],
+                         repr(99.5))
+        self.assertEqual(row[-1], "-Xmx4g -XX:+UseParallelGC")
+
+    def test_rollup_dir_without_gc_log(self):
+        row, messages = rollup_dir(
+            make_run(self.root, "+18-03-01_120001-a", gc=False))
+
+        self.assertEqual(messages, ["No GC log found"])
+        self.assertEqual(row[RollupHeader.index("GC End Time")], "2000")
+
+    def test_rows_are_in_directory_order(self):
+        names = ["+18-03-01_12000{}-r".format(i) for i in (3, 1, 2)]
+        for name in names:
+            make_run(self.root, name)
+        progress = []
+
+        result = rollup.rollup(self.root, progress.append, processes=2)
+
+        self.assertEqual(result,
+                         os.path.join(self.root,
+                                      os.path.basename(self.root) + ".csv"))
+        with open(result) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], RollupHeader)
+        self.assertEqual([r[0] for r in rows[1:]], sorted(names))
+        self.assertEqual(len(progress), 3)
+
+    def test_missing_directory(self):
+        with self.assertRaises(FileNotFoundError):
+            rollup.rollup(os.path.join(self.root, "missing"))
+
+
+class TestRollupCache(unittest.TestCase):
+
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.td.name, "results_2-runs_+18-03-01_120000")
+        self.runs = [
+            make_run(self.root, "+18-03-01_12000{}-r".format(i)) for i in (1, 2)
+        ]
+
+    def tearDown(self):
+        self.td.cleanup()
+
+    def test_unchanged_runs_are_not_analyzed_again(self):
+        rollup.rollup(self.root, lambda m: None, processes=1)
+        progress = []
+
+        result = rollup.rollup(self.root, progress.append, processes=1)
+
+        self.assertEqual(progress, ["Using the cached analysis of 2 of 2 runs"])
+        with open(result) as f:
+            self.assertEqual(len(list(csv.reader(f))), 3)
+
+    def test_changed_runs_are_analyzed_again(self):
+        rollup.rollup(self.root, lambda m: None, processes=1)
+        write(self.runs[1], "sut.txt", "All JVM options -Xmx8g\n")
+        make_run(self.root, "+18-03-01_120003-r")
+        progress = []
+
+        result = rollup.rollup(self.root, progress.append, processes=1)
+
+        self.assertEqual(progress[0], "Using the cached analysis of 1 of 3 runs")
+        self.assertEqual(len([m for m in progress if "Analyzed" in m]), 2)
+        with open(result) as f:
+            self.assertEqual(list(csv.reader(f))[2][-1], "-Xmx8g")
+
+    def test_cache_can_be_ignored(self):
+        rollup.rollup(self.root, lambda m: None, processes=1)
+        progress = []
+
+        rollup.rollup(self.root, progress.append, processes=1, cache=False)
+
+        self.assertEqual(len(progress), 2)
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+from src.catalog import Catalog
+from src.controller_log import Failure, RtStep
+from src.rt_monitor import AbortPolicy, RtMonitor, catalog_baseline, policy
+
+CURVE = [
+    "  960s: Building throughput-responsetime curve",
+    " 1000s: (20%)   IR = 40000 ........ (rIR:aIR:PR = 40000:39000:38900) (tPR = 100) [OK]",
+    " 1064s: (30%)   IR = 60000 ........ (rIR:aIR:PR = 60000:51000:50000) (tPR = 100) [fail]",
+    " 1065s: Failed, 4 overall retries left, retrying 1 of 1",
+    " 1130s: (31%)   IR = 62000 ........ (rIR:aIR:PR = 62000:52000:51000) (tPR = 100) [fail]",
+    " 1131s: Failed, 3 overall retries left, retrying 1 of 1",
+]
+
+
+def feed(monitor, lines):
+    for line in lines:
+        monitor.line(line)
+        if monitor.abort is not None:
+            return line
+    return None
+
+
+class TestRtMonitor(unittest.TestCase):
+
+    def test_state(self):
+        m = RtMonitor()
+
+        self.assertEqual(m.status(), "RT curve not started")
+        self.assertIsInstance(m.line(CURVE[1]), RtStep)
+        self.assertIsInstance(m.line(CURVE[3]), Failure)
+        self.assertIsNone(m.line("1100s: Agent attached"))
+        m = RtMonitor()
+        feed(m, CURVE)
+
+        self.assertEqual(m.phase, "rt_curve")
+        self.assertEqual((m.step.percent, m.step.rir, m.step.air, m.step.pr),
+                         (31, 62000, 52000, 51000))
+        self.assertEqual([s.percent for s in m.failed_steps], [30, 31])
+        self.assertEqual((m.failures, m.retries_left), (2, 3))
+        self.assertIn("IR 62000 (31%)", m.status())
+        self.assertIn("3 retries left", m.status())
+        self.assertIsNone(m.abort)
+
+    def test_low_failures(self):
+        m = RtMonitor(AbortPolicy(low_percent=50, max_low_failures=2))
+
+        self.assertEqual(feed(m, CURVE), CURVE[4])
+        self.assertIn("2 steps failed below 50%", m.abort)
+
+    def test_failures_above_low_percent_go_on(self):
+        m = RtMonitor(AbortPolicy(low_percent=25, max_low_failures=1))
+
+        self.assertIsNone(feed(m, CURVE))
+
+    def test_below_baseline(self):
+        m = RtMonitor(AbortPolicy(baseline=150000, min_fraction=0.5))
+
+        self.assertEqual(feed(m, CURVE), CURVE[2])
+        self.assertIn("failed at IR 60000", m.abort)
+
+    def test_max_jops_below_baseline(self):
+        m = RtMonitor(AbortPolicy(baseline=100000, min_fraction=0.9))
+
+        feed(m, ["2000s: max-jOPS is presumably 85000"])
+        self.assertIn("max-jOPS settled at 85000", m.abort)
+
+
+class TestPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.td.name, "results.db")
+
+    def tearDown(self):
+        self.td.cleanup()
+
+    def record(self, c, name, tag, max_jops, exit_code=0):
+        c.db.execute(
+            "INSERT INTO runs (path, tag, exit_code, max_jops, finished) VALUES (?, ?, ?, ?, ?)",
+            (name, tag, exit_code, max_jops, len(name)))
+
+    def test_catalog_baseline(self):
+        with Catalog(self.db) as c:
+            with c.db:
+                self.record(c, "a", "t", 100)
+                self.record(c, "bb", "t", 300)
+                self.record(c, "ccc", "t", 200)
+                self.record(c, "dddd", "t", 10, exit_code=-1)
+                self.record(c, "eeeee", "other", 10)
+
+        self.assertEqual(catalog_baseline(self.db, tag="t"), 200)
+        self.assertEqual(catalog_baseline(self.db, runs=2, tag="t"), 250)
+        self.assertIsNone(catalog_baseline(self.db, tag="none"))
+        self.assertIsNone(catalog_baseline(os.path.join(self.td.name, "no.db")))
+
+    def test_policy(self):
+        self.assertIsNone(policy({}))
+        self.assertIsNone(policy(None))
+        p = policy({"baseline": "catalog", "min_fraction": 0.8}, self.db, tag="t")
+        self.assertIsNone(p.baseline)
+        self.assertEqual(p.min_fraction, 0.8)
+        self.assertEqual(policy({"baseline": 1000}).baseline, 1000)
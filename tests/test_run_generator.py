@@ -17,3 +17,67 @@ class TestRunGenerator(unittest.TestCase):
 
         for run in rg.runs:
             self.assertTrue(run)
+
+    def sweep_config(self, sweep, **run):
+        with open("example_config.json", 'r') as f:
+            c = json.loads(f.read())
+        c["RunList"] = [dict(c["RunList"][0], sweep=sweep, **run)]
+        return c
+
+    def test_sweep_is_the_product_of_its_axes(self):
+        c = self.sweep_config([
+            {"args": {"T1": [1, 2]}},
+            {"args": {"T2": {"range": [10, 40, 10]}, "T3": ["a", "b", "c"]},
+             "props_extra": {"specjbb.group.count": {"range": [1, 4]}}},
+        ], tag="sweep")
+
+        rg = src.run_generator.RunGenerator(**c)
+        runs = list(rg.runs)
+
+        self.assertEqual(len(rg), 6)
+        self.assertEqual(len(runs), 6)
+        # the last axis changes fastest, the values of an axis are zipped
+        self.assertEqual(
+            [(r["props"]["specjbb.forkjoin.workers.Tier1"],
+              r["props"]["specjbb.forkjoin.workers.Tier2"],
+              r["props"]["specjbb.forkjoin.workers.Tier3"],
+              r["props"]["specjbb.group.count"]) for r in runs],
+            [(1, 10, "a", "1"), (1, 20, "b", "2"), (1, 30, "c", "3"),
+             (2, 10, "a", "1"), (2, 20, "b", "2"), (2, 30, "c", "3")])
+        self.assertEqual([r["tag"] for r in runs],
+                         ["sweep-{}".format(i) for i in range(6)])
+
+    def test_sweep_is_lazy(self):
+        c = self.sweep_config([{"args": {"T1": {"range": [10**6]}}},
+                               {"args": {"T2": {"range": [10**6]}}}])
+
+        rg = src.run_generator.RunGenerator(**c)
+        runs = rg.runs
+
+        self.assertEqual(len(rg), 10**12)
+        first, second = next(runs), next(runs)
+        self.assertEqual(first["props"]["specjbb.forkjoin.workers.Tier2"], 0)
+        self.assertEqual(second["props"]["specjbb.forkjoin.workers.Tier2"], 1)
+        self.assertNotEqual(first["tag"], second["tag"])
+
+    def test_sweep_axes_are_validated(self):
+        for sweep in [
+            # zipped values of different lengths
+            [{"args": {"T1": [1, 2], "T2": [1]}}],
+            [{"args": {"T1": []}}],
+            [{"args": {"T1": {"range": [0, 10, 0]}}}],
+            [{"props_extra": {"a": [1, 2]}}],
+            [{"args": {}}],
+        ]:
+            with self.assertRaises(Exception):
+                src.run_generator.RunGenerator(**self.sweep_config(sweep))
+
+    def test_tags_of_sweep_runs_are_taken(self):
+        c = self.sweep_config([{"args": {"T1": [1, 2]}}], tag="sweep")
+        c["RunList"].append(dict(c["RunList"][0], tag="sweep-1"))
+        del c["RunList"][1]["sweep"]
+
+        with self.assertRaises(Exception):
+            src.run_generator.RunGenerator(**c)
+        c["RunList"][1]["tag"] = "sweep-2"
+        self.assertEqual(len(src.run_generator.RunGenerator(**c)), 3)
@@ -0,0 +1,129 @@
+import threading
+import time
+import unittest
+
+from src.scheduler import RunScheduler, RunSlot, CpuPin
+
+
+class TestRunScheduler(unittest.TestCase):
+
+    def test_results_are_in_submission_order(self):
+        s = RunScheduler(parallel=3, cpus=range(6))
+        for i in range(5):
+            s.submit("run-{}".format(i),
+                     lambda slot, i=i: time.sleep(0.01 * (5 - i)) or i)
+
+        self.assertEqual(s.run(), [0, 1, 2, 3, 4])
+
+    def test_jobs_are_generated_as_slots_free_up(self):
+        generated = []
+
+        def _jobs():
+            for i in range(4):
+                generated.append(i)
+                yield "run-{}".format(i), lambda slot, i=i: (i, len(generated))
+
+        s = RunScheduler(parallel=1, cpus=range(2))
+        s.submit("submitted", lambda slot: time.sleep(0.05) or "first")
+        results = s.run(_jobs())
+
+        self.assertEqual(results[0], "first")
+        # the scheduler stays at most one run ahead of the one running
+        for i, seen in results[1:]:
+            self.assertLessEqual(seen, i + 2)
+        self.assertEqual(generated, [0, 1, 2, 3])
+
+    def test_never_exceeds_parallel(self):
+        lock = threading.Lock()
+        running = []
+        most = []
+
+        def _target(slot):
+            with lock:
+                running.append(slot)
+                most.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(slot)
+
+        s = RunScheduler(parallel=2, cpus=range(8))
+        for i in range(6):
+            s.submit("run-{}".format(i), _target)
+        s.run()
+
+        self.assertEqual(max(most), 2)
+
+    def test_running_slots_have_disjoint_cpus_and_ports(self):
+        lock = threading.Lock()
+        running = []
+        overlaps = []
+
+        def _target(slot):
+            with lock:
+                for other in running:
+                    if set(other.cpus) & set(slot.cpus) or other.port == slot.port:
+                        overlaps.append((other, slot))
+                running.append(slot)
+            time.sleep(0.02)
+            with lock:
+                running.remove(slot)
+
+        s = RunScheduler(parallel=4, cpus=range(8))
+        for i in range(8):
+            s.submit("run-{}".format(i), _target, cpus=2)
+        s.run()
+
+        self.assertEqual(overlaps, [])
+
+    def test_runs_wait_for_declared_cpus(self):
+        slots = []
+        s = RunScheduler(parallel=4, cpus=range(4))
+        s.submit("big", lambda slot: slots.append(slot), cpus=3)
+        s.submit("small", lambda slot: slots.append(slot), cpus=2)
+        s.run()
+
+        self.assertEqual(slots[0].cpus, [0, 1, 2])
+        self.assertEqual(len(slots[1].cpus), 2)
+
+    def test_oversized_run_gets_every_cpu(self):
+        slots = []
+        s = RunScheduler(parallel=2, cpus=range(4))
+        s.submit("huge", lambda slot: slots.append(slot), cpus=16)
+        s.run()
+
+        # a run using every CPU isn't pinned at all
+        self.assertIsNone(slots[0].cpus)
+        self.assertIsNone(slots[0].preexec_fn())
+
+    def test_ports_per_slot(self):
+        s = RunScheduler(parallel=2, cpus=range(2), base_port=30000)
+        slots = []
+        s.submit("a", lambda slot: time.sleep(0.05) or slots.append(slot))
+        s.submit("b", lambda slot: slots.append(slot))
+        s.run()
+
+        self.assertEqual(sorted(slot.port for slot in slots), [30000, 30010])
+
+    def test_failed_run_doesnt_stop_the_others(self):
+
+        def _fail(slot):
+            raise Exception("boom")
+
+        s = RunScheduler(parallel=2, cpus=range(2))
+        s.submit("a", _fail)
+        s.submit("b", lambda slot: 0)
+
+        self.assertEqual(s.run(), [None, 0])
+
+    def test_parallel_must_be_positive(self):
+        with self.assertRaises(Exception):
+            RunScheduler(parallel=0)
+
+
+class TestRunSlot(unittest.TestCase):
+
+    def test_preexec_fn_pins_cpus(self):
+        pin = RunSlot(0, [3, 1], 24000).preexec_fn()
+
+        self.assertIsInstance(pin, CpuPin)
+        self.assertEqual(pin.cpus, [1, 3])
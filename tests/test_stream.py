@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from src.stream import linebuffer, multiplexer
+
+
+class TestLineBuffer(unittest.TestCase):
+
+    def test_holds_partial_lines(self):
+        b = linebuffer()
+
+        self.assertEqual(b.feed(b"hello wo"), [])
+        self.assertEqual(b.feed(b"rld\nsecond"), ["hello world\n"])
+        self.assertEqual(b.flush(), ["second"])
+
+    def test_normalizes_line_endings(self):
+        b = linebuffer()
+
+        self.assertEqual(b.feed(b"a\r"), [])
+        self.assertEqual(b.feed(b"\nb\rc\n"), ["a\n", "b\n", "c\n"])
+        self.assertEqual(b.flush(), [])
+
+
+class TestMultiplexer(unittest.TestCase):
+
+    def _spawn(self, script):
+        return subprocess.Popen(
+            [sys.executable, "-c", script],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True)
+
+    def test_collects_lines_from_every_pipe(self):
+        procs = [
+            self._spawn("import sys\nfor i in range(100): print(i)"),
+            self._spawn(
+                "import sys\nfor i in range(50): print(i, file=sys.stderr)"),
+        ]
+        out, err = [], []
+        mux = multiplexer()
+        for p in procs:
+            mux.register(p.stdout, out.append)
+            mux.register(p.stderr, err.append)
+
+        while mux.active():
+            mux.poll(1)
+        mux.close()
+
+        for p in procs:
+            p.wait()
+
+        self.assertEqual(out, ["{}\n".format(i) for i in range(100)])
+        self.assertEqual(err, ["{}\n".format(i) for i in range(50)])
+
+    def test_poll_drains_every_chunk(self):
+        p = self._spawn("for i in range(100): print(i)")
+        p.wait()
+        lines = []
+        mux = multiplexer(chunk_size=16)
+        mux.register(p.stdout, lines.append)
+
+        self.assertEqual(mux.poll(0), 100)
+        self.assertEqual(mux.active(), 0)
+        mux.close()
+
+    def test_threaded_fallback_reaches_eof(self):
+        p = self._spawn("for i in range(10): print(i)")
+        lines = []
+        mux = multiplexer()
+        with mock.patch.object(mux._selector, 'register', side_effect=ValueError):
+            mux.register(p.stdout, lines.append)
+        self.assertEqual(mux.active(), 1)
+
+        deadline = time.time() + 10
+        while mux.active() and time.time() < deadline:
+            mux.poll(1)
+        self.assertEqual(mux.active(), 0)
+        mux.close()
+        p.wait()
+
+        self.assertEqual(lines, ["{}\n".format(i) for i in range(10)])
+
+    def test_poll_times_out_without_output(self):
+        p = self._spawn("import time\ntime.sleep(5)")
+        lines = []
+        mux = multiplexer()
+        mux.register(p.stdout, lines.append)
+
+        self.assertEqual(mux.poll(0.1), 0)
+        self.assertEqual(lines, [])
+
+        mux.close()
+        p.kill()
+        p.wait()
+
+    def test_follows_files_written_by_children(self):
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "child.log")
+            with open(path, 'w') as log:
+                p = subprocess.Popen(
+                    [sys.executable, "-c", "for i in range(10): print(i)"],
+                    stdout=log)
+            lines = []
+            mux = multiplexer()
+            mux.follow(path, lines.append)
+
+            p.wait()
+            mux.poll(0)
+            mux.close()
+
+            self.assertEqual(lines, ["{}\n".format(i) for i in range(10)])
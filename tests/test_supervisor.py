@@ -0,0 +1,113 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from src import supervisor
+from src.supervisor import ProcessSupervisor, group_members, process_groups, stop_process
+from src.task_runner import TaskRunner
+
+# ignores SIGTERM, and says so once it does
+STUBBORN = ("import signal, sys, time; "
+            "signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+            "print('ready'); sys.stdout.flush(); time.sleep(60)")
+
+
+def start(args, **kw):
+    return subprocess.Popen(args, start_new_session=True, **kw)
+
+
+class TestProcessSupervisor(unittest.TestCase):
+
+    def test_stops_the_whole_group(self):
+        # the shell's children are in its group, but not known to us
+        p = start(["sh", "-c", "sleep 60 & sleep 60 & wait"])
+        s = ProcessSupervisor(term_timeout=5, kill_timeout=5)
+        s.adopt(p)
+
+        self.assertEqual(s.stop(), [])
+        self.assertEqual(group_members(p.pid), [])
+        self.assertTrue(s.verify())
+        self.assertEqual(s.tracked(), [])
+
+    def test_kills_groups_ignoring_sigterm(self):
+        p = start([sys.executable, "-c", STUBBORN],
+                  stdout=subprocess.PIPE,
+                  universal_newlines=True)
+        p.stdout.readline()
+        s = ProcessSupervisor(term_timeout=0.2, kill_timeout=5)
+        s.adopt(p)
+
+        self.assertEqual(s.stop(), [])
+        self.assertEqual(p.returncode, -signal.SIGKILL)
+        p.stdout.close()
+
+    def test_stops_processes_without_a_group(self):
+        p = subprocess.Popen(["sleep", "60"])
+
+        self.assertTrue(stop_process(p, 5, 5))
+        self.assertEqual(p.returncode, -signal.SIGTERM)
+
+    def test_stopping_exited_processes(self):
+        p = start(["true"])
+        p.wait()
+
+        self.assertTrue(stop_process(p))
+
+
+class TestProcessGroups(unittest.TestCase):
+
+    def test_reads_every_group_at_once(self):
+        with tempfile.TemporaryDirectory() as proc:
+            # pid, command, state, ppid, pgrp
+            for pid, comm, state, pgrp in [(10, "java", "S", 10),
+                                           (11, "(sh) x", "R", 10),
+                                           (12, "java", "Z", 10),
+                                           (20, "java", "S", 20),
+                                           (30, "java", "S", 30)]:
+                os.mkdir(os.path.join(proc, str(pid)))
+                with open(os.path.join(proc, str(pid), "stat"), "w") as f:
+                    f.write("{} ({}) {} 1 {} 0\n".format(pid, comm, state, pgrp))
+            os.mkdir(os.path.join(proc, "self"))
+
+            groups = process_groups([10, 20, 40], proc)
+            self.assertEqual({g: sorted(pids) for g, pids in groups.items()},
+                             {10: [10, 11], 20: [20], 40: []})
+            self.assertEqual(sorted(group_members(10, proc)), [10, 11])
+
+    def test_supervisor_scans_proc_once_per_pass(self):
+        procs = [start(["true"]) for _ in range(5)]
+        for p in procs:
+            p.wait()
+        s = ProcessSupervisor()
+        for p in procs:
+            s.adopt(p)
+
+        with mock.patch.object(supervisor.os, "listdir",
+                               wraps=os.listdir) as listdir:
+            self.assertTrue(s.verify())
+        self.assertEqual(listdir.call_count, 1)
+
+
+class TestTaskRunnerStop(unittest.TestCase):
+
+    def test_stop_escalates(self):
+        t = TaskRunner(
+            sys.executable,
+            "-c",
+            STUBBORN,
+            start_new_session=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True)
+        t.start()
+        t.proc.stdout.readline()
+
+        self.assertTrue(t.stop(timeout=0.2))
+        self.assertEqual(t.proc.returncode, -signal.SIGKILL)
+        t.proc.stdout.close()
+
+    def test_stop_before_start(self):
+        self.assertTrue(TaskRunner("true").stop())
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from src import topology
+from src.topology import binding_plan, format_cpulist, parse_cpulist, probe
+
+
+def fake_sysfs(root, nodes):
+    """nodes: a list of (cpulist, memory in kB, distances)"""
+    for i, (cpus, memory, distance) in enumerate(nodes):
+        path = os.path.join(root, "node{}".format(i))
+        os.makedirs(path)
+        with open(os.path.join(path, "cpulist"), 'w') as f:
+            f.write(cpus + "\n")
+        with open(os.path.join(path, "meminfo"), 'w') as f:
+            f.write("Node {} MemTotal:       {} kB\n".format(i, memory))
+            f.write("Node {} MemFree:        1 kB\n".format(i))
+        with open(os.path.join(path, "distance"), 'w') as f:
+            f.write(distance + "\n")
+    with open(os.path.join(root, "online"), 'w') as f:
+        f.write("0-{}\n".format(len(nodes) - 1))
+
+
+class TestCpuList(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_cpulist("0-3,8-9,12\n"), [0, 1, 2, 3, 8, 9, 12])
+        self.assertEqual(parse_cpulist("\n"), [])
+
+    def test_format(self):
+        self.assertEqual(format_cpulist([12, 0, 1, 2, 3, 8, 9]), "0-3,8-9,12")
+
+
+class TestTopology(unittest.TestCase):
+
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        fake_sysfs(self.td.name, [
+            ("0-3", 1024, "10 21 21"),
+            ("4-7", 2048, "21 10 21"),
+            ("", 4096, "21 21 10"),
+        ])
+        topology.clear_cache()
+
+    def tearDown(self):
+        topology.clear_cache()
+        self.td.cleanup()
+
+    def test_probe(self):
+        t = probe(self.td.name)
+
+        self.assertEqual([n.id for n in t.nodes], [0, 1, 2])
+        self.assertEqual(t.node(1).cpus, [4, 5, 6, 7])
+        self.assertEqual(t.node(1).memory, 2048 * 1024)
+        # memory-only nodes can't run JVMs
+        self.assertEqual([n.id for n in t.usable()], [0, 1])
+
+    def test_probe_without_numa(self):
+        t = probe(os.path.join(self.td.name, "missing"))
+
+        self.assertEqual(len(t.nodes), 1)
+        self.assertTrue(t.nodes[0].cpus)
+
+    def test_topology_is_cached(self):
+        first = topology.topology(self.td.name)
+        fake_sysfs(os.path.join(self.td.name, "more"), [("0", 1, "10")])
+
+        self.assertIs(topology.topology(self.td.name), first)
+
+    def test_plan_spreads_groups_from_node_0(self):
+        plan = binding_plan(probe(self.td.name), 5)
+
+        self.assertEqual([b.node.id for b in plan], [0, 1, 0, 1, 0])
+
+    def test_plan_with_max_nodes(self):
+        plan = binding_plan(probe(self.td.name), 3, max_nodes=1)
+
+        self.assertEqual([b.node.id for b in plan], [0, 0, 0])
@@ -1,7 +1,7 @@
 from schema import SchemaError
 from unittest import TestCase
 import json
-from src.validate import validate, TemplateDataSchema, random_run_id
+from src.validate import validate, TemplateDataSchema, RunConfigSchema, SpectateConfig, CompiledSchema, random_run_id
 
 
 class TestSpectateConfigValidator(TestCase):
@@ -178,6 +178,53 @@ class TestSpectateConfigValidator(TestCase):
         self.assertEqual(v["RunList"][0]["times"], 1)
         self.assertEqual(v["RunList"][1]["times"], 2)
 
+    def test_RunList_with_abort_policy_validates(self):
+        policy = {"low_percent": 40, "max_low_failures": 2, "baseline": "catalog"}
+        v = validate({
+            "TemplateData": {
+                "HBIR": self.sample_hbir_template,
+            },
+            "RunList": [{
+                "template_type": "HBIR",
+                "args": self.sample_args,
+                "abort_policy": policy,
+            }]
+        })
+
+        self.assertEqual(v["RunList"][0]["abort_policy"], policy)
+
+        with self.assertRaises(SchemaError):
+            validate({
+                "TemplateData": {
+                    "HBIR": self.sample_hbir_template,
+                },
+                "RunList": [{
+                    "template_type": "HBIR",
+                    "args": self.sample_args,
+                    "abort_policy": {"min_fraction": 2},
+                }]
+            })
+
+    def test_swept_args_need_to_be_in_the_template(self):
+        args = dict(self.sample_args)
+        del args["T1"]
+        config = {
+            "TemplateData": {
+                "HBIR": self.sample_hbir_template,
+            },
+            "RunList": [{
+                "template_type": "HBIR",
+                "args": args,
+                "sweep": [{"args": {"T1": [1, 2, 4]}}],
+            }]
+        }
+
+        # a swept arg doesn't need a default
+        self.assertTrue(validate(config))
+        config["RunList"][0]["sweep"].append({"args": {"T4": [1]}})
+        with self.assertRaises(Exception):
+            validate(config)
+
     def test_runs_have_default_tags(self):
         v = validate({
             "TemplateData": {
@@ -225,3 +272,99 @@ class TestSpectateConfigValidator(TestCase):
                     "tag": custom_tag,
                 }]
             })
+
+    def test_duplicate_tags_are_listed(self):
+        runs = [{
+            "template_type": "HBIR",
+            "args": self.sample_args,
+            "tag": tag,
+        } for tag in ["a", "b", "a", "c", "a"]]
+
+        with self.assertRaises(Exception) as e:
+            validate({
+                "TemplateData": {
+                    "HBIR": self.sample_hbir_template,
+                },
+                "RunList": runs,
+            })
+        self.assertEqual(
+            str(e.exception),
+            "Duplicate custom run IDs provided to different configured runs: ['a', 'a', 'a']"
+        )
+
+    def test_tags_of_sweep_runs_are_taken(self):
+        runs = [{
+            "template_type": "HBIR",
+            "args": self.sample_args,
+            "tag": "x",
+            "sweep": [{"args": {"T1": [1, 2]}}, {"props_extra": {"p": {"range": [3]}}}],
+        }] + [{
+            "template_type": "HBIR",
+            "args": self.sample_args,
+            "tag": tag,
+        } for tag in ["x-6", "x-5", "x-05", "y-0"]]
+        config = {
+            "TemplateData": {
+                "HBIR": self.sample_hbir_template,
+            },
+            "RunList": runs,
+        }
+
+        with self.assertRaises(Exception) as e:
+            validate(config)
+        self.assertEqual(
+            str(e.exception),
+            "Custom run IDs taken by the runs of a sweep: ['x-5']")
+        runs[2]["tag"] = "x-7"
+        self.assertTrue(validate(config))
+
+
+class TestCompiledSchema(TestCase):
+
+    def assertSameAsSchema(self, schema, data):
+        """The compiled schema returns what the schema does, or raises the same error"""
+        try:
+            expected = schema.validate(data)
+        except SchemaError as e:
+            with self.assertRaises(SchemaError) as compiled:
+                CompiledSchema(schema).validate(data)
+            self.assertEqual(str(compiled.exception), str(e))
+            return
+        self.assertEqual(CompiledSchema(schema).validate(data), expected)
+
+    def test_examples(self):
+        for example in TestSpectateConfigValidator.examples:
+            with open(example) as f:
+                self.assertSameAsSchema(SpectateConfig, json.loads(f.read()))
+
+    def test_runs(self):
+        args = {"T1": 1}
+        for run in [
+            {"template_type": "HBIR", "args": args},
+            {"template_type": "HBIR", "args": args, "times": 3, "cpus": 8,
+             "binding": "core", "props_extra": {"a": "b"}},
+            {"template_type": "HBIR", "args": {}, "abort_policy": {"baseline": 5000.0}},
+            {"template_type": "HBIR", "args": args, "times": True},
+            {"template_type": "HBIR", "args": args, "cpus": -1},
+            {"template_type": "HBIR", "args": args, "binding": "socket"},
+            {"template_type": "HBIR", "args": args, "unknown": 1},
+            {"template_type": "HBIR", "args": {1: 2}},
+            {"template_type": 5, "args": args},
+            {"args": args},
+            {"template_type": "HBIR", "args": args, "abort_policy": {"baseline": "nope"}},
+            {"template_type": "HBIR", "args": args, "props_extra": {"a": 1}},
+            None,
+        ]:
+            self.assertSameAsSchema(RunConfigSchema, run)
+
+    def test_templates(self):
+        for template in [
+            {"args": ["a"]},
+            {"args": ["a"], "run_type": "MULTI", "prop_options": {"x": [1]}},
+            {"args": ["a"], "run_type": "hbir"},
+            {"args": ["a"], "prop_options": {}},
+            {"args": [1]},
+            {"args": "a"},
+            {},
+        ]:
+            self.assertSameAsSchema(TemplateDataSchema, template)